@@ -11,6 +11,37 @@ import random
 from PIL import Image
 import io
 import base64
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from core.indexer import open_index
+from core.audio_transcriber import AudioTranscriptionPipeline, get_transcriber
+from core.index_jobs import IndexJobScheduler, COMPLETED, RESUMABLE, FILES
+from core.connectors import find_browser_histories
+from core.governor import ResourceGovernor
+from core.topics import TopicIndex
+from core.autocomplete import Autocomplete
+from core.content_store import ContentStore, tier_memories, content_excerpt
+from core.memory_budget import memory_budget
+from core.encoders import HashEncoder
+from core.entity_extractor import EntityExtractionStage, load_gazetteer
+from core.near_duplicates import NearDuplicateIndex
+from core.image_hashes import ImageHashStage, ImageHashIndex, collapse_similar_images
+from core.positional_index import PositionalIndex, is_structured
+from core.live_scan import LiveScanner, indexed_file_times
+from core import views
+from core.views import run_search
+from core.synthetic import (MEMORY_TYPES, TITLES, CONTENT_TEMPLATES, TOPICS, PEOPLE, ORGANIZATIONS, LOCATIONS,
+                            MONTHS, ACTIVITIES, PURPOSES, IMAGE_SUBJECTS, SOURCES, TYPE_TEMPLATES)
+from config import (DATABASE_PATH, TRANSCRIPTION_BACKEND, AUDIO_WINDOW_SECONDS,
+                    AUDIO_TRANSCRIPTION_WORKERS, INDEX_JOB_WORKERS, GAZETTEER_PATH, ENTITY_WORKERS,
+                    ENTITY_BATCH_SIZE, ENTITY_USE_SPACY, DEDUP_THRESHOLD, MINHASH_PERMUTATIONS,
+                    LSH_BANDS, COLLAPSE_DUPLICATES, EMBED_DUPLICATES, IMAGE_HASH_ALGORITHM, IMAGE_HASH_WORKERS,
+                    SIMILAR_IMAGE_DISTANCE, INDEX_READ_BYTES_PER_SEC, INDEX_MAX_WORKERS,
+                    INDEX_WORKER_NICENESS, SEARCH_LATENCY_TARGET, INDEX_MAX_BACKOFF, WARM_UP_BATCH_SIZE, TOPIC_COUNT,
+                    TOPIC_REFIT_EVERY, QUERY_LOG_PATH, SEARCH_SUGGESTIONS,
+                    CONTENT_STORE_PATH, CONTENT_BLOCK_SIZE, CONTENT_CACHE_BLOCKS, CONTENT_CODEC,
+                    CONTENT_EXCERPT_CHARS, TOPIC_SPILL_PATH, LIVE_SCAN_DIRECTORIES,
+                    LIVE_SCAN_WORKERS, LIVE_SCAN_MAX_FILE_BYTES, LIVE_SCAN_REFRESH)
 
 # Set page configuration
 st.set_page_config(
@@ -111,96 +142,8 @@ st.markdown("""
 # Functions for search and indexing
 # ---------------------------------
 
-def simple_search(query, memories, top_k=10):
-    """Simple keyword-based search"""
-    query_terms = query.lower().split()
-    results = []
-    
-    for memory in memories:
-        score = 0
-        
-        # Check title
-        if 'title' in memory:
-            title = memory['title'].lower()
-            for term in query_terms:
-                if term in title:
-                    score += 10  # Higher weight for title matches
-        
-        # Check content
-        if 'content' in memory:
-            content = memory['content'].lower()
-            for term in query_terms:
-                score += content.count(term) * 2
-        
-        # Check entities
-        if 'entities' in memory and memory['entities']:
-            for entity in memory['entities']:
-                if isinstance(entity, dict):
-                    entity_text = entity.get('text', '').lower()
-                else:
-                    entity_text = str(entity).lower()
-                    
-                for term in query_terms:
-                    if term in entity_text:
-                        score += 5  # Higher weight for entity matches
-        
-        if score > 0:
-            results.append((memory, score))
-    
-    # Sort by score
-    results.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top k memories
-    return [memory for memory, _ in results[:top_k]]
-
 def generate_sample_data(num_items=50):
     """Generate sample data for demonstration"""
-    memory_types = ['document', 'image', 'audio', 'web']
-    entity_types = ['person', 'location', 'organization', 'date']
-    
-    sample_titles = [
-        "Meeting with Marketing Team", "Project Proposal Draft", 
-        "Vacation Photos from Hawaii", "Research Notes on AI", 
-        "Birthday Party Recording", "Tax Documents 2023",
-        "Home Renovation Plans", "Recipe Collection", 
-        "Travel Itinerary - Europe Trip", "Podcast Interview",
-        "Family Reunion Photos", "Book Notes - Think Again",
-        "Website Design Mockups", "Personal Budget Spreadsheet",
-        "Medical Records", "Conference Presentation",
-        "Wine Tasting Notes", "Hiking Trip Photos",
-        "Car Maintenance Records", "Movie Reviews"
-    ]
-    
-    sample_content_templates = [
-        "This document contains {topic} that I worked on in {timeframe}.",
-        "Notes from my research about {topic} that I found very interesting.",
-        "Collection of {topic} that I want to remember for future reference.",
-        "Important information about {topic} that I need for {purpose}.",
-        "Ideas and thoughts about {topic} that came up during {activity}."
-    ]
-    
-    sample_topics = [
-        "artificial intelligence", "renewable energy", "digital photography",
-        "home improvement", "financial planning", "machine learning",
-        "nutrition and diet", "travel destinations", "productivity techniques",
-        "web development", "mental health", "sustainability practices"
-    ]
-    
-    sample_people = [
-        "John Smith", "Emma Johnson", "Michael Brown", "Lisa Davis",
-        "Robert Wilson", "Sarah Miller", "David Anderson", "Jennifer Thomas"
-    ]
-    
-    sample_organizations = [
-        "Acme Corp", "TechNova", "Global Solutions", "Evergreen Industries",
-        "Summit Enterprises", "Horizon Healthcare", "Pinnacle Partners", "Quantum Research"
-    ]
-    
-    sample_locations = [
-        "New York", "San Francisco", "Tokyo", "London", "Paris",
-        "Sydney", "Toronto", "Berlin", "Singapore", "Barcelona"
-    ]
-    
     # Create sample memories
     memories = []
     end_date = datetime.now()
@@ -213,17 +156,17 @@ def generate_sample_data(num_items=50):
         )
         
         # Random memory type
-        memory_type = random.choice(memory_types)
+        memory_type = random.choice(MEMORY_TYPES)
         
         # Random title or combination of titles
-        title = random.choice(sample_titles)
+        title = random.choice(TITLES)
         
         # Generate content
-        content_template = random.choice(sample_content_templates)
-        topic = random.choice(sample_topics)
-        timeframe = f"{random.choice(['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'])} {memory_date.year}"
-        activity = random.choice(["a meeting", "my research", "a workshop", "a conversation", "my travels"])
-        purpose = random.choice(["work", "personal projects", "planning", "reference", "learning"])
+        content_template = random.choice(CONTENT_TEMPLATES)
+        topic = random.choice(TOPICS)
+        timeframe = f"{random.choice(MONTHS)} {memory_date.year}"
+        activity = random.choice(ACTIVITIES)
+        purpose = random.choice(PURPOSES)
         
         content = content_template.format(
             topic=topic,
@@ -233,28 +176,23 @@ def generate_sample_data(num_items=50):
         )
         
         # Add more specific content based on type
-        if memory_type == 'document':
-            content += f" This document is {random.randint(1, 20)} pages long and covers key points about {topic}."
-        elif memory_type == 'image':
-            content += f" This image captures {random.choice(['an important moment', 'a beautiful scene', 'a key diagram', 'a memorable event'])} related to {topic}."
-        elif memory_type == 'audio':
-            content += f" This audio recording is {random.randint(1, 120)} minutes long and includes discussions about {topic}."
-        elif memory_type == 'web':
-            content += f" This webpage contains valuable information about {topic} that I bookmarked for future reference."
+        details = {'document': random.randint(1, 20), 'image': random.choice(IMAGE_SUBJECTS),
+                   'audio': random.randint(1, 120), 'web': None}
+        content += TYPE_TEMPLATES[memory_type].format(topic=topic, detail=details[memory_type])
         
         # Generate random entities
         entities = []
         # Add 1-3 random people
         for _ in range(random.randint(1, 3)):
-            entities.append({"type": "person", "text": random.choice(sample_people)})
+            entities.append({"type": "person", "text": random.choice(PEOPLE)})
         
         # Add 0-2 random organizations
         for _ in range(random.randint(0, 2)):
-            entities.append({"type": "organization", "text": random.choice(sample_organizations)})
+            entities.append({"type": "organization", "text": random.choice(ORGANIZATIONS)})
         
         # Add 0-2 random locations
         for _ in range(random.randint(0, 2)):
-            entities.append({"type": "location", "text": random.choice(sample_locations)})
+            entities.append({"type": "location", "text": random.choice(LOCATIONS)})
         
         # Create the memory object
         memory = {
@@ -265,7 +203,7 @@ def generate_sample_data(num_items=50):
             "content": content,
             "entities": entities,
             "sentiment": random.uniform(-1, 1),  # Random sentiment score
-            "source": random.choice(["Local Drive", "Cloud Storage", "Email", "Browser", "Mobile Device"]),
+            "source": random.choice(SOURCES),
             "file_size": random.randint(10, 10000) if memory_type != 'web' else None
         }
         
@@ -273,10 +211,45 @@ def generate_sample_data(num_items=50):
     
     return memories
 
+# ---------------------------------
+# View models
+# ---------------------------------
+#
+# View models hold the data each view needs, separate from the Streamlit
+# calls that draw it. They are memoized with st.cache_data on view_key, which
+# changes whenever the result set or filters do, so memory lists are never
+# hashed and a rerun that only switches views reuses them.
+
+@st.cache_data(max_entries=32)
+def timeline_view_model(_memories, view_key, _snippets=None):
+    """Monthly counts per type and the most recent memories"""
+    return views.timeline_view_model(_memories, _snippets)
+
+@st.cache_data(max_entries=32)
+def connections_view_model(_memories, view_key, _topics=None):
+    """Nodes and links for the connection network"""
+    return views.connections_view_model(_memories, _topics)
+
+@st.cache_data(max_entries=32)
+def filtered_ordinals(_memories, view_key, _filters, _topics=None):
+    """Positions of the memories that pass the sidebar filters"""
+    # Positions rather than memories, so the cached value stays small to copy
+    return views.filtered_ordinals(_memories, _filters, _topics)
+
+@st.cache_data(max_entries=32)
+def analytics_view_model(_memories, view_key):
+    """Type, sentiment and entity aggregates for the analytics view"""
+    return views.analytics_view_model(_memories)
+
 # ---------------------------------
 # UI Components
 # ---------------------------------
 
+def use_suggestion(suggestion):
+    """Put a suggestion in the search box and search for it"""
+    st.session_state.search_box = suggestion
+    st.session_state.suggested_query = suggestion
+
 def render_search_box():
     """Render search box and return query"""
     col1, col2 = st.columns([5,1])
@@ -285,17 +258,32 @@ def render_search_box():
         search_query = st.text_input("", 
                                      placeholder="Ask me anything about your digital memories...", 
                                      label_visibility="collapsed", 
+                                     help='Use "quoted phrases", AND, OR, NOT or -word, and NEAR/5 for proximity',
                                      key="search_box")
     
     with col2:
         search_button = st.button("🔍 Search")
     
+    # Suggestions for what's been typed; the search box reruns the app on Enter
+    suggestions = get_autocomplete().suggest(search_query, SEARCH_SUGGESTIONS) if search_query else []
+    if suggestions and not search_button:
+        columns = st.columns(len(suggestions))
+        for i, (column, suggestion) in enumerate(zip(columns, suggestions)):
+            column.button(suggestion, key=f"suggestion_{i}", on_click=use_suggestion, args=(suggestion,),
+                          use_container_width=True)
+    
+    st.checkbox("Include files not indexed yet", key="live_scan",
+                help="Also scan new and changed text files in indexed folders, without waiting for indexing")
+    
+    if 'suggested_query' in st.session_state:
+        return st.session_state.pop('suggested_query')
+    
     if search_button and search_query:
         return search_query
     
     return None
 
-def render_timeline(memories):
+def render_timeline(memories, view_key):
     """Render a visual timeline of memories"""
     st.markdown("<h2 class='timeline-header'>Your Memory Timeline</h2>", unsafe_allow_html=True)
     
@@ -303,30 +291,10 @@ def render_timeline(memories):
         st.info("No memories to display in timeline. Try indexing some content or modifying your search.")
         return
     
-    # Group memories by month
-    memory_df = pd.DataFrame(memories)
+    view_model = timeline_view_model(memories, view_key, st.session_state.get('snippets'))
     
-    # Convert date strings to datetime objects if needed
-    if 'date' in memory_df.columns:
-        if memory_df['date'].dtype == 'object':
-            memory_df['date'] = pd.to_datetime(memory_df['date'])
-        
-        # Create month column
-        memory_df['month'] = memory_df['date'].dt.strftime('%Y-%m')
-        
-        # Sort by date
-        memory_df = memory_df.sort_values('date')
-        
-        # Group by month and count
-        monthly_counts = memory_df.groupby(['month', 'type']).size().reset_index(name='count')
-        
-        # Pivot to get types as columns
-        timeline_data = monthly_counts.pivot_table(
-            index='month', 
-            columns='type', 
-            values='count',
-            fill_value=0
-        ).reset_index()
+    if view_model is not None:
+        timeline_data, recent = view_model
         
         # Create a bar chart
         fig = px.bar(
@@ -355,27 +323,20 @@ def render_timeline(memories):
         
         # Show a more detailed view of recent memories
         st.subheader("Recent Memories")
-        recent_df = memory_df.sort_values('date', ascending=False).head(5)
         
-        for _, memory in recent_df.iterrows():
-            memory_type = memory['type']
-            memory_class = f"memory-card memory-{memory_type}"
+        for memory in recent:
+            memory_class = f"memory-card memory-{memory['type']}"
             
             st.markdown(f"<div class='{memory_class}'>", unsafe_allow_html=True)
             st.markdown(f"#### {memory['title']}")
-            st.markdown(f"*{memory['date'].strftime('%B %d, %Y')}*")
-            
-            # Truncate content if too long
-            content = memory['content']
-            if len(content) > 150:
-                content = content[:150] + "..."
-            st.markdown(content)
+            st.markdown(f"*{memory['date']}*")
+            st.markdown(memory['content'])
             
             st.markdown("</div>", unsafe_allow_html=True)
     else:
         st.error("No date information available in memories.")
 
-def render_connections(memories):
+def render_connections(memories, view_key):
     """Render a network graph of memory connections"""
     st.markdown("<h2 class='timeline-header'>Memory Connections</h2>", unsafe_allow_html=True)
     
@@ -383,60 +344,8 @@ def render_connections(memories):
         st.info("No memories to display in connections view. Try indexing some content or modifying your search.")
         return
     
-    # Create a simplified network graph based on memory types and entities
-    memory_df = pd.DataFrame(memories)
-    
-    # Create nodes for visualization
-    nodes = []
-    for i, memory in enumerate(memories[:20]):  # Limit to 20 for performance
-        x = random.uniform(-10, 10)
-        y = random.uniform(-10, 10)
-        
-        color = '#3E7CB9'  # Default color (document)
-        if memory['type'] == 'image':
-            color = '#FF924C'
-        elif memory['type'] == 'audio':
-            color = '#8867CA'
-        elif memory['type'] == 'web':
-            color = '#71D999'
-            
-        nodes.append({
-            'index': i,
-            'id': memory.get('id', i),
-            'title': memory.get('title', f"Memory {i}"),
-            'type': memory.get('type', 'document'),
-            'x': x,
-            'y': y,
-            'color': color
-        })
-    
-    # Create links between memories that share entities or are close in time
-    links = []
-    for i in range(len(nodes)):
-        for j in range(i+1, len(nodes)):
-            memory_i = memories[i]
-            memory_j = memories[j]
-            
-            # Connect if same type
-            if memory_i['type'] == memory_j['type']:
-                links.append({
-                    'source': i,
-                    'target': j,
-                    'value': 1
-                })
-            
-            # Connect if they share entities
-            if ('entities' in memory_i and 'entities' in memory_j 
-                    and memory_i['entities'] and memory_j['entities']):
-                entities_i = [e['text'] if isinstance(e, dict) else e for e in memory_i['entities']]
-                entities_j = [e['text'] if isinstance(e, dict) else e for e in memory_j['entities']]
-                
-                if set(entities_i) & set(entities_j):  # If there's an intersection
-                    links.append({
-                        'source': i,
-                        'target': j,
-                        'value': 2  # Stronger connection for shared entities
-                    })
+    topics = get_topic_index()
+    nodes, links = connections_view_model(memories, view_key, topics)
     
     # Create a Plotly figure for the network graph
     node_trace = px.scatter(
@@ -447,7 +356,8 @@ def render_connections(memories):
             'document': '#3E7CB9',
             'image': '#FF924C',
             'audio': '#8867CA',
-            'web': '#71D999'
+            'web': '#71D999',
+            'topic': '#FFCC47'
         }
     )
     
@@ -484,13 +394,73 @@ def render_connections(memories):
     st.plotly_chart(fig, use_container_width=True)
     
     # Show a legend explaining the connections
-    st.markdown("""
-    **Connection Types:**
-    - **Same Type:** Memories of the same type (document, image, etc.)
-    - **Shared Entities:** Memories that mention the same people, places, or organizations
-    """)
+    if any(node['type'] == 'topic' for node in nodes):
+        st.markdown("""
+        **Connection Types:**
+        - **Same Topic:** Memories linked to the topic they were clustered into
+        - **Shared Entities:** Memories that mention the same people, places, or organizations
+        """)
+    else:
+        st.markdown("""
+        **Connection Types:**
+        - **Same Type:** Memories of the same type (document, image, etc.)
+        - **Shared Entities:** Memories that mention the same people, places, or organizations
+        """)
 
-def render_gallery(memories):
+def render_analytics(memories, view_key):
+    """Render charts summarizing memories"""
+    st.markdown("<h2 class='timeline-header'>Memory Analytics</h2>", unsafe_allow_html=True)
+    
+    if not memories:
+        st.info("No data available for analytics. Try indexing some content or performing a search.")
+        return
+    
+    type_counts, monthly_sentiment, entity_type_counts = analytics_view_model(memories, view_key)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Memory types distribution
+        if type_counts is not None:
+            fig = px.pie(type_counts, values='Count', names='Type', 
+                       title='Memory Type Distribution',
+                       color='Type', 
+                       color_discrete_map={
+                           'document': '#3E7CB9',
+                           'image': '#FF924C',
+                           'audio': '#8867CA',
+                           'web': '#71D999'
+                       })
+            fig.update_traces(textposition='inside', textinfo='percent+label')
+            st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        # Sentiment over time
+        if monthly_sentiment is not None:
+            fig = px.bar(monthly_sentiment, x='month', y='sentiment',
+                       title='Average Sentiment By Month',
+                       color='sentiment',
+                       color_continuous_scale=['#FF5852', '#FFCC47', '#71D999'])
+            st.plotly_chart(fig, use_container_width=True)
+    
+    # Entity distribution
+    if entity_type_counts is not None:
+        st.subheader("Entity Distribution")
+        
+        if len(entity_type_counts):
+            fig = px.bar(entity_type_counts, x='Entity Type', y='Count',
+                       title='Entity Types Distribution',
+                       color='Entity Type',
+                       color_discrete_map={
+                           'person': '#C9184A',
+                           'location': '#0077B6',
+                           'organization': '#457B9D',
+                           'date': '#EA526F',
+                           'unknown': '#666666'
+                       })
+            st.plotly_chart(fig, use_container_width=True)
+
+def render_gallery(memories, image_index=None):
     """Render gallery view of memories"""
     st.markdown("<h2 class='timeline-header'>Memory Gallery</h2>", unsafe_allow_html=True)
     
@@ -498,6 +468,19 @@ def render_gallery(memories):
         st.info("No memories to display in gallery. Try indexing some content or modifying your search.")
         return
     
+    similar_to = st.session_state.get('similar_to')
+    if image_index is not None and similar_to is not None:
+        # Show the selected photo and the photos that look like it
+        similar_ids = {similar_to} | {memory_id for memory_id, _ in image_index.similar_to(similar_to)}
+        memories = [memory for memory in memories if memory.get('id') in similar_ids]
+        st.caption(f"{len(memories)} visually similar photos")
+        if st.button("Show all photos", key="clear_similar"):
+            del st.session_state.similar_to
+            st.rerun(scope="fragment")
+    else:
+        # One photo per burst or set of visual duplicates
+        memories = collapse_similar_images(memories, SIMILAR_IMAGE_DISTANCE, limit=9)
+    
     # Display memories in a grid
     memory_limit = min(9, len(memories))  # Limit to 9 for the gallery view
     
@@ -527,12 +510,23 @@ def render_gallery(memories):
                 except (ValueError, AttributeError):
                     pass
             
-            # Show content excerpt
-            content = memory.get('content', '')
-            if content:
+            # Show content excerpt, around the search match when there is one
+            content = st.session_state.get('snippets', {}).get(memory.get('id'))
+            if content is None:
+                content = content_excerpt(memory, 151)
                 if len(content) > 150:
                     content = content[:150] + "..."
+            if st.session_state.get('opened_memory') == memory.get('id'):
+                # Full text is fetched from the content store only when opened
+                st.markdown(memory.get('content', ''))
+                if st.button("Close", key=f"close_{memory.get('id', i)}"):
+                    del st.session_state.opened_memory
+                    st.rerun(scope="fragment")
+            elif content:
                 st.markdown(content)
+                if content.endswith("...") and st.button("Open", key=f"open_{memory.get('id', i)}"):
+                    st.session_state.opened_memory = memory.get('id')
+                    st.rerun(scope="fragment")
             
             # Display entity tags if available
             if 'entities' in memory and memory['entities']:
@@ -554,11 +548,16 @@ def render_gallery(memories):
                 ax.add_patch(plt.Rectangle((0, 0), 1, 1, color=color))
                 ax.axis('off')
                 st.pyplot(fig)
+                
+                if image_index is not None and memory.get('image_hash') is not None:
+                    if st.button("Find similar", key=f"similar_{memory.get('id', i)}"):
+                        st.session_state.similar_to = memory['id']
+                        st.rerun(scope="fragment")
             
             st.markdown("</div>", unsafe_allow_html=True)
 
 def render_sidebar(memories):
-    """Render sidebar with filters and stats"""
+    """Render sidebar with filters and stats, and return the selected filters"""
     st.sidebar.title("Memory Filters")
     
     # Extract date range from memories
@@ -612,6 +611,16 @@ def render_sidebar(memories):
                                              options=sorted(list(entities)),
                                              default=[])
     
+    # Topic filter; labels come from per-topic term counts, so this is O(k)
+    topic_labels = get_topic_index().labels()
+    topic_filter = []
+    if topic_labels:
+        topic_sizes = get_topic_index().sizes()
+        topic_filter = st.sidebar.multiselect("Topics",
+                                              options=sorted(topic_labels),
+                                              format_func=lambda topic: f"{topic_labels[topic]} ({topic_sizes.get(topic, 0)})",
+                                              default=[])
+    
     # Index new content
     st.sidebar.markdown("---")
     st.sidebar.subheader("Index New Content")
@@ -621,15 +630,64 @@ def render_sidebar(memories):
         ["Local Files", "Browser History", "Photos", "Notes"]
     )
     
+    scheduler = get_index_scheduler()
+    
     if source_type == "Local Files":
         folder_path = st.sidebar.text_input("Folder Path", "")
         if st.sidebar.button("Index Folder"):
             if folder_path:
-                with st.spinner(f"Indexing files in {folder_path}..."):
-                    time.sleep(2)  # Simulate indexing
-                    st.sidebar.success("Indexing complete!")
+                # Indexing runs in the background; progress is polled below
+                scheduler.submit(folder_path)
+                st.sidebar.success(f"Started indexing {folder_path}")
             else:
                 st.sidebar.error("Please provide a folder path")
+    elif source_type == "Browser History":
+        histories = find_browser_histories()
+        history_path = st.sidebar.selectbox("History Database", histories) if histories else \
+            st.sidebar.text_input("History Database", "")
+        if st.sidebar.button("Import History"):
+            if history_path:
+                scheduler.submit(history_path, source='browser_history')
+                st.sidebar.success(f"Started importing {history_path}")
+            else:
+                st.sidebar.error("Please provide a history database path")
+    else:
+        source = 'photos' if source_type == "Photos" else 'notes'
+        folder_path = st.sidebar.text_input(f"{source_type} Folder", "")
+        if st.sidebar.button(f"Import {source_type}"):
+            if folder_path:
+                # Only files changed since the last import of this folder are read
+                scheduler.submit(folder_path, source=source)
+                st.sidebar.success(f"Started importing {folder_path}")
+            else:
+                st.sidebar.error("Please provide a folder path")
+    
+    # Indexing job progress
+    for job in scheduler.jobs()[:5]:
+        st.sidebar.caption(
+            f"**{job['directory']}**: {job['status']} · {job['files_parsed']}/{job['files_seen']} files · "
+            f"{job['bytes_per_sec'] / 1024:.0f} KB/s" if job['source'] == FILES else
+            f"**{job['directory']}**: {job['status']} · {job['files_parsed']} {job['source'].replace('_', ' ')} "
+            f"records imported"
+        )
+        if job['status'] in ('pending', 'running'):
+            if st.sidebar.button("Cancel", key=f"cancel_job_{job['id']}"):
+                scheduler.cancel(job['id'])
+        elif job['status'] in RESUMABLE:
+            if st.sidebar.button("Resume", key=f"resume_job_{job['id']}"):
+                scheduler.resume(job['id'])
+    
+    if scheduler.active_jobs():
+        backoff = get_governor().status()['backoff']
+        if backoff:
+            st.sidebar.caption(f"Indexing is pausing {backoff:.2f}s between files to keep search responsive")
+        st.sidebar.button("Refresh progress")
+    
+    # Background audio transcription progress
+    if 'audio_pipeline' in st.session_state:
+        pending = st.session_state.audio_pipeline.pending()
+        if pending:
+            st.sidebar.caption(f"Transcribing {pending} audio file(s) in the background...")
     
     # Memory statistics
     st.sidebar.markdown("---")
@@ -652,21 +710,240 @@ def render_sidebar(memories):
     col1.metric("Audio", type_counts.get('audio', 0))
     col2.metric("Web", type_counts.get('web', 0))
     
+    # Memory held by caches and vectors, against the configured budget
+    budget = memory_budget.status()
+    used_mb = budget['used'] / 2**20
+    if budget['limit']:
+        limit_mb = budget['limit'] / 2**20
+        st.sidebar.progress(min(used_mb / limit_mb, 1.0), text=f"Cache memory: {used_mb:.1f} / {limit_mb:.0f} MB")
+    else:
+        st.sidebar.caption(f"Cache memory: {used_mb:.1f} MB (no budget)")
+    breakdown = ", ".join(f"{name} {size / 2**20:.1f} MB" for name, size in budget['consumers'].items() if size)
+    if budget['rss'] is not None:
+        breakdown = f"Process {budget['rss'] / 2**20:.0f} MB" + (f"; {breakdown}" if breakdown else "")
+    if breakdown:
+        st.sidebar.caption(breakdown)
+    
     # Information about the app
     st.sidebar.markdown("---")
     st.sidebar.info("This is your Personal Memory Search Engine. It helps you organize and search through your digital life.")
+    
+    return {
+        # The date input holds a single date while a range is being picked
+        'date_range': tuple(date_range) if len(date_range) == 2 else None,
+        'memory_types': tuple(memory_type_filter),
+        'entity_types': tuple(entity_filter) if entities else (),
+        'topics': tuple(topic_filter),
+    }
+
+# ---------------------------------
+# Background workers
+# ---------------------------------
+
+@st.cache_resource
+def get_audio_pipeline():
+    """Shared background audio transcription pipeline, writing segments to the memory index"""
+    from core.serach_engine import embed_memory
+    pipeline = AudioTranscriptionPipeline(get_transcriber(TRANSCRIPTION_BACKEND),
+                                          window_seconds=AUDIO_WINDOW_SECONDS,
+                                          max_workers=AUDIO_TRANSCRIPTION_WORKERS, index=get_memory_index(),
+                                          embed=embed_memory)
+    # Recordings still pending when the last process exited start over
+    pipeline.resume()
+    return pipeline
+
+@st.cache_resource
+def get_memory_index():
+    """Shared on-disk segmented memory index, recording change sets for replicas"""
+    return open_index()
+
+@st.cache_resource
+def get_entity_stage():
+    """Shared entity extraction stage, seeded with entities already in the index"""
+    # The index is read on the first indexing batch, not while the page loads
+    return EntityExtractionStage(load_gazetteer(GAZETTEER_PATH), workers=ENTITY_WORKERS,
+                                 batch_size=ENTITY_BATCH_SIZE, use_spacy=ENTITY_USE_SPACY,
+                                 loader=get_memory_index().memories)
+
+@st.cache_resource
+def get_dedup_index():
+    """Shared near-duplicate index over the memories already indexed"""
+    dedup = NearDuplicateIndex(DEDUP_THRESHOLD, num_perm=MINHASH_PERMUTATIONS, bands=LSH_BANDS)
+    # Until the warm-up gets to them, existing memories just aren't collapsed
+    warm_up(dedup.update, get_memory_index().memories)
+    return dedup
+
+@st.cache_resource
+def get_image_stage():
+    """Shared perceptual image hashing stage"""
+    return ImageHashStage(workers=IMAGE_HASH_WORKERS, batch_size=ENTITY_BATCH_SIZE,
+                          algorithm=IMAGE_HASH_ALGORITHM)
+
+@st.cache_resource
+def get_image_index():
+    """Shared perceptual hash index over the indexed images; indexing jobs keep it up to date"""
+    image_index = ImageHashIndex(max_distance=SIMILAR_IMAGE_DISTANCE)
+    image_index.update(get_memory_index().memories())
+    return image_index
+
+@st.cache_resource
+def get_positional_index():
+    """Shared positional index for phrase, boolean and proximity queries; indexing jobs keep it up to date"""
+    # Loaded from the memory index on the first such query, so plain searches never pay for it
+    index = get_memory_index()
+    positional_index = PositionalIndex(loader=index.memories, lookup=index.get)
+    # Dropping it costs a reload on the next structured query
+    memory_budget.register('phrase index', positional_index, priority=25)
+    return positional_index
+
+@st.cache_resource
+def get_governor():
+    """Shared resource governor that keeps indexing from slowing down search"""
+    return ResourceGovernor(read_bytes_per_sec=INDEX_READ_BYTES_PER_SEC, max_workers=INDEX_MAX_WORKERS,
+                            niceness=INDEX_WORKER_NICENESS, latency_target=SEARCH_LATENCY_TARGET,
+                            max_backoff=INDEX_MAX_BACKOFF)
+
+@st.cache_resource
+def get_warm_up():
+    """Shared background thread that fills in-memory indexes from memories already indexed"""
+    # A single thread, so updates to the same index never race each other
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="warm-up",
+                              initializer=get_governor().lower_priority)
+
+def warm_up(update, load):
+    """
+    Feed loaded memories to update on the warm-up thread, yielding to searches between batches.
+
+    Args:
+        update (callable): Takes a list of memories and adds the ones it hasn't seen
+        load (callable): Returns the memories, called on the warm-up thread
+    """
+    governor = get_governor()
+
+    def run():
+        memories = load()
+        for start in range(0, len(memories), WARM_UP_BATCH_SIZE):
+            with governor.worker_slot():
+                update(memories[start:start + WARM_UP_BATCH_SIZE])
+            governor.pause()
+
+    return get_warm_up().submit(run)
+
+@st.cache_resource
+def get_content_store():
+    """Shared cold tier holding the full content of in-memory memories"""
+    store = ContentStore(CONTENT_STORE_PATH, block_size=CONTENT_BLOCK_SIZE, cache_blocks=CONTENT_CACHE_BLOCKS,
+                         codec=CONTENT_CODEC)
+    # Decompressed blocks are the cheapest thing to rebuild, so they go first
+    memory_budget.register('content blocks', store, priority=0)
+    return store
+
+def hot_memories(memories):
+    """Keep only excerpts of memory content in RAM, with full text in the content store"""
+    return tier_memories(memories, get_content_store(), CONTENT_EXCERPT_CHARS)
+
+@st.cache_resource
+def get_autocomplete():
+    """Shared type-ahead suggestions over titles, entities and the query log"""
+    return Autocomplete(QUERY_LOG_PATH)
+
+@st.cache_resource
+def get_topic_index():
+    """Shared incremental topic model over memory embeddings"""
+    # Imported here so the embedding model only loads once, when topics are first needed
+    from core.serach_engine import model, score_cache
+    if model is None:
+        # Without a model, topics come from hashed word features
+        model = HashEncoder()
+    topics = TopicIndex(lambda texts: np.asarray(score_cache.encode(model, texts)), k=TOPIC_COUNT,
+                        refit_every=TOPIC_REFIT_EVERY, spill_path=TOPIC_SPILL_PATH)
+    # Spilled last: topic vectors are memory-mapped rather than dropped
+    memory_budget.register('topic vectors', topics, priority=30)
+    warm_up(topics.update, get_memory_index().memories)
+    return topics
+
+@st.cache_resource
+def get_live_scanner():
+    """Shared scanner for files changed since they were indexed"""
+    return LiveScanner(workers=LIVE_SCAN_WORKERS, max_file_bytes=LIVE_SCAN_MAX_FILE_BYTES,
+                       refresh_interval=LIVE_SCAN_REFRESH)
+
+def live_scan(query):
+    """Scan the files in watched and indexed folders that the index doesn't have up to date"""
+    if st.session_state.get('indexed_files_memories') is not st.session_state.memories:
+        st.session_state.indexed_files = indexed_file_times(st.session_state.memories)
+        st.session_state.indexed_files_memories = st.session_state.memories
+    directories = set(LIVE_SCAN_DIRECTORIES) | {job['directory'] for job in get_index_scheduler().jobs()
+                                                if job['source'] == FILES}
+    return get_live_scanner().search(query, sorted(directories), st.session_state.indexed_files)
+
+@st.cache_resource
+def get_index_scheduler():
+    """Shared background indexing job scheduler"""
+    from core.serach_engine import embed_memory
+    return IndexJobScheduler(DATABASE_PATH, max_workers=INDEX_JOB_WORKERS, embed=embed_memory,
+                             audio_pipeline=get_audio_pipeline(), index=get_memory_index(),
+                             entity_stage=get_entity_stage(), batch_size=ENTITY_BATCH_SIZE,
+                             dedup=get_dedup_index(), image_stage=get_image_stage(),
+                             governor=get_governor(), topics=get_topic_index(), image_index=get_image_index(),
+                             positional_index=get_positional_index(), embed_duplicates=EMBED_DUPLICATES)
 
 # ---------------------------------
 # Main Application
 # ---------------------------------
 
+def new_results_generation():
+    """Mark the memories or current results as changed, invalidating view models"""
+    st.session_state.results_key = uuid.uuid4().hex
+
 # Main header
 st.markdown("<h1 class='main-header'>Personal Memory Search Engine</h1>", unsafe_allow_html=True)
 
 # Initialize session state
 if 'memories' not in st.session_state:
-    # Generate sample data for demonstration
-    st.session_state.memories = generate_sample_data(50)
+    if len(get_memory_index()):
+        # Load the indexed memories lazily from the on-disk segments
+        st.session_state.memories = hot_memories(get_memory_index().memories())
+    else:
+        # Generate sample data for demonstration
+        st.session_state.memories = hot_memories(generate_sample_data(50))
+    new_results_generation()
+
+# Pick up memories from finished indexing jobs
+finished_jobs = {job['id'] for job in get_index_scheduler().jobs() if job['status'] == COMPLETED}
+if 'merged_jobs' not in st.session_state:
+    # Jobs finished before this session started are already in the index
+    st.session_state.merged_jobs = finished_jobs
+
+if finished_jobs - st.session_state.merged_jobs:
+    # The index already holds the new, updated and deleted memories
+    st.session_state.memories = hot_memories(get_memory_index().memories())
+    st.session_state.merged_jobs |= finished_jobs
+    new_results_generation()
+
+# Assign any memories the topic model hasn't seen; indexing jobs add theirs as they go
+if st.session_state.get('topic_memories') is not st.session_state.memories:
+    warm_up(get_topic_index().update, lambda memories=st.session_state.memories: memories)
+    st.session_state.topic_memories = st.session_state.memories
+
+# Suggest titles and entities of memories that are new since the last run
+if st.session_state.get('autocomplete_memories') is not st.session_state.memories:
+    get_autocomplete().add(st.session_state.memories)
+    st.session_state.autocomplete_memories = st.session_state.memories
+
+# Background indexing grows the shared caches and vectors between searches
+memory_budget.enforce()
+
+# Pick up transcript segments the background audio pipeline wrote to the index
+if 'audio_pipeline' not in st.session_state:
+    st.session_state.audio_pipeline = get_audio_pipeline()
+    st.session_state.audio_writes = st.session_state.audio_pipeline.writes
+
+if st.session_state.audio_pipeline.writes != st.session_state.audio_writes:
+    st.session_state.audio_writes = st.session_state.audio_pipeline.writes
+    st.session_state.memories = hot_memories(get_memory_index().memories())
+    get_positional_index().update(st.session_state.memories)
+    new_results_generation()
 
 # Render search box and get query
 query = render_search_box()
@@ -674,108 +951,67 @@ query = render_search_box()
 # Process search if query exists
 if query:
     with st.spinner('Searching your memories...'):
-        search_results = simple_search(query, st.session_state.memories)
+        search_started = time.perf_counter()
+        dedup = get_dedup_index() if COLLAPSE_DUPLICATES else None
+        live = None
+        if st.session_state.get('live_scan'):
+            try:
+                live = live_scan(query)
+            except Exception as e:
+                # Indexed results are still worth showing
+                st.warning(f"Couldn't scan files that aren't indexed yet: {e}")
+        from core.serach_engine import embed_query
+        # Once anything is indexed, the session's memories are the index's
+        index = get_memory_index() if len(get_memory_index()) else None
+        query_vector = embed_query(query) if index is not None else None
+        positional_index = None
+        if is_structured(query):
+            # Sample data isn't in the index, and is small enough to index per query
+            positional_index = get_positional_index() if index is not None \
+                else PositionalIndex(st.session_state.memories)
+        search_results, st.session_state.snippets = run_search(query, st.session_state.memories,
+                                                               positional_index, dedup=dedup, live=live,
+                                                               index=index, query_vector=query_vector)
+        # Background indexing backs off while searches are slow
+        get_governor().record_query_latency(time.perf_counter() - search_started)
+        get_autocomplete().record_query(query)
         st.session_state.current_results = search_results
+        new_results_generation()
         st.success(f'Found {len(search_results)} results')
 
-# Main content tabs
-tabs = st.tabs(["Timeline", "Connections", "Analytics", "Gallery"])
-
-# Render different views in tabs
-with tabs[0]:
-    render_timeline(st.session_state.get('current_results', st.session_state.memories))
+# Render sidebar; its filters apply to every view
+filters = render_sidebar(st.session_state.memories)
+filters_key = repr(sorted(filters.items()))
+if st.session_state.get('filters_key') != filters_key:
+    st.session_state.filters_key = filters_key
+    st.session_state.filters = filters
 
-with tabs[1]:
-    render_connections(st.session_state.get('current_results', st.session_state.memories))
-
-with tabs[2]:
-    # Analytics tab
-    st.markdown("<h2 class='timeline-header'>Memory Analytics</h2>", unsafe_allow_html=True)
-    
-    memories_to_analyze = st.session_state.get('current_results', st.session_state.memories)
-    
-    # Create a DataFrame for analysis
-    if memories_to_analyze:
-        df = pd.DataFrame(memories_to_analyze)
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Memory types distribution
-            if 'type' in df.columns:
-                type_counts = df['type'].value_counts().reset_index()
-                type_counts.columns = ['Type', 'Count']
-                
-                fig = px.pie(type_counts, values='Count', names='Type', 
-                           title='Memory Type Distribution',
-                           color='Type', 
-                           color_discrete_map={
-                               'document': '#3E7CB9',
-                               'image': '#FF924C',
-                               'audio': '#8867CA',
-                               'web': '#71D999'
-                           })
-                fig.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Sentiment over time
-            if 'sentiment' in df.columns and 'date' in df.columns:
-                df['month'] = pd.to_datetime(df['date']).dt.strftime('%B %Y')
-                monthly_sentiment = df.groupby('month')['sentiment'].mean().reset_index()
-                
-                fig = px.bar(monthly_sentiment, x='month', y='sentiment',
-                           title='Average Sentiment By Month',
-                           color='sentiment',
-                           color_continuous_scale=['#FF5852', '#FFCC47', '#71D999'])
-                st.plotly_chart(fig, use_container_width=True)
-        
-        # Entity distribution
-        if 'entities' in df.columns:
-            st.subheader("Entity Distribution")
-            
-            # Extract entities
-            all_entities = []
-            entity_types = []
-            
-            for memory in memories_to_analyze:
-                if 'entities' in memory and memory['entities']:
-                    for entity in memory['entities']:
-                        if isinstance(entity, dict):
-                            all_entities.append(entity.get('text', 'Unknown'))
-                            entity_types.append(entity.get('type', 'unknown'))
-            
-            if all_entities:
-                # Create DataFrame for entities
-                entity_df = pd.DataFrame({
-                    'text': all_entities,
-                    'type': entity_types
-                })
-                
-                # Count by type
-                entity_type_counts = entity_df['type'].value_counts().reset_index()
-                entity_type_counts.columns = ['Entity Type', 'Count']
-                
-                # Plot
-                fig = px.bar(entity_type_counts, x='Entity Type', y='Count',
-                           title='Entity Types Distribution',
-                           color='Entity Type',
-                           color_discrete_map={
-                               'person': '#C9184A',
-                               'location': '#0077B6',
-                               'organization': '#457B9D',
-                               'date': '#EA526F',
-                               'unknown': '#666666'
-                           })
-                st.plotly_chart(fig, use_container_width=True)
+@st.fragment
+def render_active_view():
+    """
+    Render only the selected view.
+    
+    Running as a fragment means switching views reruns just this function
+    rather than the search, indexing and sidebar code above it.
+    """
+    view = st.radio("View", ["Timeline", "Connections", "Analytics", "Gallery"],
+                    horizontal=True, label_visibility="collapsed", key="active_view")
+    
+    view_key = (st.session_state.results_key, st.session_state.filters_key)
+    results = st.session_state.get('current_results', st.session_state.memories)
+    memories = [results[i] for i in filtered_ordinals(results, view_key, st.session_state.filters,
+                                                       get_topic_index())]
+    
+    if view == "Timeline":
+        render_timeline(memories, view_key)
+    elif view == "Connections":
+        render_connections(memories, view_key)
+    elif view == "Analytics":
+        render_analytics(memories, view_key)
     else:
-        st.info("No data available for analytics. Try indexing some content or performing a search.")
-
-with tabs[3]:
-    render_gallery(st.session_state.get('current_results', st.session_state.memories))
+        render_gallery(memories, get_image_index())
 
-# Render sidebar
-render_sidebar(st.session_state.memories)
+render_active_view()
 
 # Footer
 st.markdown("---")
@@ -11,6 +11,10 @@ IMAGES_DIR = os.path.join(DATA_DIR, "images")
 AUDIO_DIR = os.path.join(DATA_DIR, "audio")
 EMBEDDINGS_DIR = os.path.join(DATA_DIR, "embeddings")
 DATABASE_PATH = os.path.join(DATA_DIR, "database.sqlite")
+GAZETTEER_PATH = os.path.join(DATA_DIR, "gazetteer.json")  # {"person": [...], "location": [...], ...}
+SEGMENTS_DIR = os.path.join(DATA_DIR, "segments")
+CONTENT_STORE_PATH = os.path.join(DATA_DIR, "content.blocks")
+QUERY_LOG_PATH = os.path.join(DATA_DIR, "query_log.json")  # {"query": times run, ...}
 
 # Ensure directories exist
 for directory in [DATA_DIR, DOCUMENTS_DIR, IMAGES_DIR, AUDIO_DIR, EMBEDDINGS_DIR]:
@@ -19,6 +23,78 @@ for directory in [DATA_DIR, DOCUMENTS_DIR, IMAGES_DIR, AUDIO_DIR, EMBEDDINGS_DIR
 # Search settings
 DEFAULT_SEARCH_RESULTS = 10
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"  # Can be changed to other models
+EMBEDDING_BACKEND = "sentence-transformers"  # "sentence-transformers", "onnx", "onnx-int8" or "hash"
+EMBEDDING_THREADS = None  # CPU threads for embedding inference; None uses the library default
+SEARCH_SUGGESTIONS = 5  # Type-ahead suggestions shown under the search box
+
+# Re-ranking settings
+RERANK_BACKEND = None  # "cross-encoder", "stub" or None to rank by embedding similarity alone
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_TOP_N = 20  # First-stage candidates re-scored per query
+RERANK_BATCH_SIZE = 8
+RERANK_LATENCY_BUDGET = 0.2  # Seconds per query; over budget, results keep the first-stage order
+RERANK_CACHE_SIZE = 10000  # Cached (query, memory) scores
+
+# Storage settings
+SNAPSHOT_COMPRESS_CONTENT = True  # zlib-compress content in memory snapshots
+SEGMENT_FLUSH_THRESHOLD = 1000  # Memories buffered in RAM before a segment is written
+SEGMENT_MERGE_FACTOR = 4  # Similar-sized segments merged together
+SEGMENT_MAX_COUNT = 16  # Upper bound on segments a query fans out over
+JOURNAL_SYNC_INTERVAL = 0.2  # Seconds an unflushed index write may wait for fsync
+JOURNAL_SYNC_RECORDS = 256  # Journaled writes that trigger an fsync on their own
+CONTENT_EXCERPT_CHARS = 200  # Content characters kept in RAM; the rest goes to the content store
+CONTENT_BLOCK_SIZE = 16 * 1024  # Uncompressed bytes compressed together in the content store
+CONTENT_CACHE_BLOCKS = 64  # Decompressed content blocks kept in memory
+CONTENT_CODEC = "zstd"  # "zstd" (with a trained dictionary) or "zlib"; zstd needs the zstandard package
+
+# Audio transcription settings
+TRANSCRIPTION_BACKEND = "whisper"  # "whisper" or "stub"
+AUDIO_WINDOW_SECONDS = 30
+AUDIO_TRANSCRIPTION_WORKERS = 2
+
+# Indexing job settings
+INDEX_JOB_WORKERS = 1  # Number of indexing jobs that run at once
+INDEX_READ_BYTES_PER_SEC = 32 * 1024 * 1024  # Read limit for indexing; None for unlimited
+INDEX_MAX_WORKERS = 2  # Parse/embed sections that may run at once across jobs
+INDEX_WORKER_NICENESS = 10  # Nice value for indexing threads; 0 leaves them alone
+SEARCH_LATENCY_TARGET = 0.25  # Seconds; indexing backs off while search p95 is above this
+INDEX_MAX_BACKOFF = 2.0  # Longest pause between files, in seconds
+WARM_UP_BATCH_SIZE = 500  # Memories added to the topic and duplicate indexes between pauses at startup
+
+# Entity extraction settings
+ENTITY_WORKERS = 2  # Processes used for entity extraction; 0 runs it inline
+ENTITY_BATCH_SIZE = 64
+ENTITY_USE_SPACY = False  # Also run spaCy NER when it is installed
+
+# Near-duplicate settings
+DEDUP_THRESHOLD = 0.8  # Estimated Jaccard similarity of word shingles
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16  # Must divide MINHASH_PERMUTATIONS
+COLLAPSE_DUPLICATES = True  # Show one result per near-duplicate cluster
+EMBED_DUPLICATES = False  # Also embed near-duplicates; off saves embedding time and vector space
+
+# Image similarity settings
+IMAGE_HASH_ALGORITHM = "phash"  # "ahash", "dhash" or "phash"
+IMAGE_HASH_WORKERS = 2  # Processes used for image hashing; 0 runs it inline
+SIMILAR_IMAGE_DISTANCE = 10  # Largest Hamming distance between similar images
+
+# Topic settings
+TOPIC_COUNT = 12  # Number of k-means topics
+TOPIC_REFIT_EVERY = 2000  # New memories between background refits
+
+# Memory budget settings
+MEMORY_BUDGET_MB = 512  # Caches, embedding vectors and cached content; None disables the budget
+TOPIC_SPILL_PATH = os.path.join(EMBEDDINGS_DIR, "topic_vectors")  # Topic vectors move here under pressure
+
+# Live scan settings
+LIVE_SCAN_DIRECTORIES = [DOCUMENTS_DIR]  # Scanned along with every folder indexed before
+LIVE_SCAN_WORKERS = 2  # Processes used for scanning; 0 scans inline
+LIVE_SCAN_MAX_FILE_BYTES = 64 * 1024 * 1024  # Bytes scanned from the start of each file
+LIVE_SCAN_REFRESH = 2.0  # Seconds a directory listing is reused between searches
+
+# Replication settings
+CHANGESET_DIR = os.path.join(DATA_DIR, "changesets")  # One change set per index flush; None turns it off
+CHANGESET_RETAIN = 200  # Change sets kept; replicas further behind are reseeded from a copy
 
 # UI settings
 THEME_COLOR = "#3E7CB9"
@@ -0,0 +1 @@
+# Puts the repository root on sys.path, so tests import config and core as app.py does
@@ -0,0 +1,326 @@
+import os
+import wave
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Optional decoders for formats the standard library can't read
+try:
+    import soundfile as sf
+except ImportError:
+    sf = None
+
+TARGET_SAMPLE_RATE = 16000
+
+class UnsupportedAudioFormat(Exception):
+    """Raised when no available decoder can read an audio file."""
+
+def _pcm_to_float(frames, sample_width, channels):
+    """Convert interleaved PCM bytes to mono float32 in [-1, 1]."""
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise UnsupportedAudioFormat(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples
+
+def _resample(samples, sample_rate):
+    """Linearly resample to TARGET_SAMPLE_RATE."""
+    if sample_rate == TARGET_SAMPLE_RATE or len(samples) == 0:
+        return samples
+    duration = len(samples) / sample_rate
+    target_length = max(int(round(duration * TARGET_SAMPLE_RATE)), 1)
+    positions = np.linspace(0, len(samples) - 1, target_length)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def iter_audio_windows(file_path, window_seconds=30):
+    """
+    Stream an audio file as fixed-length mono windows.
+
+    Only one window is held in memory at a time, so long recordings don't
+    need to be decoded up front.
+
+    Args:
+        file_path (str): Path to the audio file
+        window_seconds (float): Window length in seconds
+
+    Yields:
+        tuple: (start_seconds, samples) with samples as float32 at 16 kHz
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+
+    if ext == '.wav':
+        with wave.open(file_path, 'rb') as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            window_frames = max(int(window_seconds * sample_rate), 1)
+            position = 0
+            while True:
+                frames = wav.readframes(window_frames)
+                if not frames:
+                    break
+                samples = _pcm_to_float(frames, sample_width, channels)
+                yield position / sample_rate, _resample(samples, sample_rate)
+                position += len(frames) // (sample_width * channels)
+        return
+
+    if sf is None:
+        raise UnsupportedAudioFormat(f"Install soundfile to read {ext} files")
+
+    try:
+        info = sf.info(file_path)
+    except RuntimeError as e:
+        raise UnsupportedAudioFormat(str(e))
+
+    window_frames = max(int(window_seconds * info.samplerate), 1)
+    position = 0
+    for block in sf.blocks(file_path, blocksize=window_frames, dtype='float32', always_2d=True):
+        yield position / info.samplerate, _resample(block.mean(axis=1), info.samplerate)
+        position += len(block)
+
+class StubTranscriber:
+    """
+    Deterministic stand-in for a speech-to-text model.
+
+    Emits one segment per window whose text is derived from a hash of the
+    samples, and nothing for silent windows, so tests get stable output
+    without model weights.
+    """
+
+    WORDS = [
+        "meeting", "project", "budget", "travel", "family", "research",
+        "notes", "plan", "review", "idea", "schedule", "call",
+    ]
+
+    def __init__(self, silence_threshold=1e-3):
+        self.silence_threshold = silence_threshold
+
+    def transcribe(self, samples, sample_rate=TARGET_SAMPLE_RATE):
+        if len(samples) == 0 or np.sqrt(np.mean(np.square(samples))) < self.silence_threshold:
+            return []
+        digest = hashlib.sha1(np.ascontiguousarray(samples).tobytes()).digest()
+        text = " ".join(self.WORDS[b % len(self.WORDS)] for b in digest[:6])
+        return [(0.0, len(samples) / sample_rate, text)]
+
+class WhisperTranscriber:
+    """Local speech-to-text using faster-whisper on the CPU."""
+
+    def __init__(self, model_size="base", compute_type="int8", cpu_threads=2):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type,
+                                  cpu_threads=cpu_threads)
+
+    def transcribe(self, samples, sample_rate=TARGET_SAMPLE_RATE):
+        segments, _ = self.model.transcribe(samples, vad_filter=True)
+        return [(segment.start, segment.end, segment.text.strip()) for segment in segments]
+
+def get_transcriber(backend="whisper"):
+    """
+    Create a transcription backend by name.
+
+    Falls back to the stub backend when the requested one can't be loaded.
+
+    Args:
+        backend (str): "whisper" or "stub"
+
+    Returns:
+        object: Backend with a transcribe(samples, sample_rate) method
+    """
+    if backend == "whisper":
+        try:
+            return WhisperTranscriber()
+        except Exception:
+            # Fallback for demo purposes
+            pass
+    return StubTranscriber()
+
+def _format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+class AudioTranscriptionPipeline:
+    """
+    Transcribes audio files in a bounded background thread pool.
+
+    Each file is streamed window by window, and every transcript segment is
+    turned into its own searchable memory as soon as it is produced. With an
+    index, segments and the audio memory's final transcription_status are
+    written to it and synced, so they survive a restart and every session
+    sees them; without one, callers collect segments with drain().
+    """
+
+    def __init__(self, transcriber=None, window_seconds=30, max_workers=2, index=None, embed=None):
+        """
+        Args:
+            transcriber: Backend with a transcribe(samples, sample_rate) method
+            window_seconds (float): Audio decoded and transcribed at a time
+            max_workers (int): Files transcribed at once
+            index (SegmentedIndex, optional): Index that receives segments
+            embed (callable, optional): Returns the embedding stored in the
+                index with each segment, or None
+        """
+        self.transcriber = transcriber or StubTranscriber()
+        self.window_seconds = window_seconds
+        self.index = index
+        self.embed = embed
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcribe")
+        self._lock = threading.Lock()
+        self._ready = deque()
+        self._status = {}
+        self._progress = {}
+        self._cancelled = set()
+        # Counts writes to the index, so sessions can tell when to reload
+        self.writes = 0
+
+    def submit(self, memory):
+        """
+        Queue an audio memory for transcription.
+
+        Args:
+            memory (dict): Audio memory with 'id' and 'file_path'
+
+        Returns:
+            concurrent.futures.Future: Completes when the file is fully processed
+        """
+        with self._lock:
+            self._status[memory['id']] = 'pending'
+            self._progress[memory['id']] = 0.0
+        parent = {key: memory.get(key) for key in ('id', 'title', 'file_path', 'date', 'source')}
+        return self._executor.submit(self._process, parent)
+
+    def submit_pending(self, memories):
+        """
+        Queue the memories waiting for transcription that aren't queued yet.
+
+        Call this once the memories are in the index, so the final status
+        has a memory to update.
+
+        Returns:
+            int: Number of memories queued
+        """
+        queued = 0
+        for memory in memories:
+            if memory.get('transcription_status') != 'pending':
+                continue
+            with self._lock:
+                if self._status.get(memory['id']) in ('pending', 'running'):
+                    continue
+            self.submit(memory)
+            queued += 1
+        return queued
+
+    def resume(self):
+        """Queue the audio memories in the index whose transcription never finished."""
+        if self.index is None:
+            return 0
+        return self.submit_pending(self.index.memories())
+
+    def _write(self, memories=(), parent_id=None, status=None):
+        """Add segments and update the parent's status in the index, durably."""
+        if self.index is None:
+            with self._lock:
+                self._ready.extend(memories)
+            return
+        for memory in memories:
+            self.index.add(memory, self.embed(memory) if self.embed is not None else None)
+        if status is not None:
+            self.index.update(parent_id, {'transcription_status': status})
+        self.index.sync()
+        with self._lock:
+            self.writes += 1
+
+    def _set_status(self, memory_id, status):
+        with self._lock:
+            self._status[memory_id] = status
+        self._write(parent_id=memory_id, status=status)
+
+    def _process(self, parent):
+        memory_id = parent['id']
+        with self._lock:
+            cancelled = memory_id in self._cancelled
+            if not cancelled:
+                self._status[memory_id] = 'running'
+        if cancelled:
+            self._set_status(memory_id, 'cancelled')
+            return
+
+        try:
+            for start, samples in iter_audio_windows(parent['file_path'], self.window_seconds):
+                if memory_id in self._cancelled:
+                    self._set_status(memory_id, 'cancelled')
+                    return
+
+                segments = self.transcriber.transcribe(samples, TARGET_SAMPLE_RATE)
+                window_end = start + len(samples) / TARGET_SAMPLE_RATE
+                new_memories = [self._segment_memory(parent, start + s, start + e, text)
+                                for s, e, text in segments if text]
+
+                self._write(new_memories)
+                with self._lock:
+                    self._progress[memory_id] = window_end
+        except Exception as e:
+            self._set_status(memory_id, f"error: {e}")
+            return
+
+        self._set_status(memory_id, 'done')
+
+    def _segment_memory(self, parent, start, end, text):
+        return {
+            'id': f"{parent['id']}:{int(start * 1000)}",
+            'parent_id': parent['id'],
+            'title': f"{parent['title']} [{_format_timestamp(start)}]",
+            'type': 'audio',
+            'date': parent['date'],
+            'content': text,
+            'file_path': parent['file_path'],
+            'start_time': start,
+            'end_time': end,
+            'source': parent['source'],
+        }
+
+    def drain(self):
+        """Return and clear the segments produced since the last call, when there is no index."""
+        with self._lock:
+            ready = list(self._ready)
+            self._ready.clear()
+        return ready
+
+    def status(self, memory_id):
+        """Return the transcription status for a memory id, or None if unknown."""
+        with self._lock:
+            return self._status.get(memory_id)
+
+    def progress(self, memory_id):
+        """Return how many seconds of the recording have been transcribed."""
+        with self._lock:
+            return self._progress.get(memory_id, 0.0)
+
+    def pending(self):
+        """Return the number of files that are queued or still running."""
+        with self._lock:
+            return sum(1 for status in self._status.values() if status in ('pending', 'running'))
+
+    def cancel(self, memory_id):
+        """Stop transcribing a file after its current window."""
+        with self._lock:
+            self._cancelled.add(memory_id)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,203 @@
+import re
+import json
+import os
+import threading
+from bisect import bisect_left
+import numpy as np
+
+_WORD = re.compile(r'\w+')
+_SPACE = re.compile(r'\s+')
+
+def normalize(text):
+    """Lowercase text and collapse whitespace, as completion keys are stored."""
+    return _SPACE.sub(' ', text or '').strip().lower()
+
+class PrefixIndex:
+    """
+    Weighted completions kept in a sorted array.
+
+    The keys sharing a prefix form one contiguous run of the array, found
+    with two binary searches; the heaviest entries of the run are picked
+    with a partial sort of its weights. New keys go into a small unsorted
+    delta that is merged into the array once it reaches merge_threshold,
+    so adding entries doesn't re-sort the array every time.
+    """
+
+    def __init__(self, merge_threshold=1024):
+        self.merge_threshold = merge_threshold
+        self._keys = []
+        self._texts = []
+        self._weights = np.zeros(0, dtype=np.float64)
+        self._delta = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys) + len(self._delta)
+
+    def add(self, text, weight=1.0):
+        """Add weight to a completion, creating it if it's new."""
+        key = normalize(text)
+        if not key:
+            return
+        with self._lock:
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                self._weights[i] += weight
+                return
+            entry = self._delta.get(key)
+            self._delta[key] = (entry[0] if entry else text.strip(), (entry[1] if entry else 0.0) + weight)
+            # Growing the threshold with the array keeps merges cheap per key, and
+            # the cap bounds the delta that every completion scans
+            if len(self._delta) >= max(self.merge_threshold, min(len(self._keys) // 8, 8192)):
+                self._merge()
+
+    def _merge(self):
+        keys = self._keys + list(self._delta)
+        texts = self._texts + [text for text, _ in self._delta.values()]
+        weights = np.concatenate([self._weights, [weight for _, weight in self._delta.values()]])
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = [keys[i] for i in order]
+        self._texts = [texts[i] for i in order]
+        self._weights = weights[order]
+        self._delta = {}
+
+    def complete(self, prefix, limit=8):
+        """
+        Return the heaviest completions of a prefix.
+
+        Args:
+            prefix (str): Text typed so far
+            limit (int): Number of completions to return
+
+        Returns:
+            list: Up to limit (text, weight) pairs, heaviest first
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + '\U0010ffff', lo)
+            rows = np.arange(lo, hi)
+            if len(rows) > limit:
+                rows = lo + np.argpartition(-self._weights[lo:hi], limit - 1)[:limit]
+            matches = [(self._texts[i], float(self._weights[i]), self._keys[i]) for i in rows]
+            matches.extend((text, weight, key) for key, (text, weight) in self._delta.items()
+                           if key.startswith(prefix))
+        matches.sort(key=lambda match: (-match[1], match[2]))
+        return [(text, weight) for text, weight, _ in matches[:limit]]
+
+class Autocomplete:
+    """
+    Type-ahead suggestions from memory titles, entity names and past queries.
+
+    Whole titles, entity names and queries are completed from the start of
+    what has been typed. When those run out, the last word typed is
+    completed from the vocabulary of titles and entities instead. Past
+    queries weigh the most, and more so the more often they were run.
+    """
+
+    def __init__(self, query_log_path=None, title_weight=1.0, entity_weight=2.0, query_weight=5.0,
+                 max_logged_queries=5000):
+        """
+        Args:
+            query_log_path (str, optional): JSON file the query counts are kept in
+            title_weight (float): Weight a memory title adds to its completion
+            entity_weight (float): Weight each mention of an entity adds
+            query_weight (float): Weight each run of a query adds
+            max_logged_queries (int): Most frequent queries kept in the log
+        """
+        self.query_log_path = query_log_path
+        self.title_weight = title_weight
+        self.entity_weight = entity_weight
+        self.query_weight = query_weight
+        self.max_logged_queries = max_logged_queries
+        self.phrases = PrefixIndex()
+        self.words = PrefixIndex()
+        self.queries = {}
+        self._seen = set()
+        self._lock = threading.Lock()
+
+        if query_log_path and os.path.exists(query_log_path):
+            try:
+                with open(query_log_path, encoding='utf-8') as f:
+                    self.queries = {query: int(count) for query, count in json.load(f).items()}
+            except (OSError, ValueError, AttributeError):
+                self.queries = {}
+            for query, count in self.queries.items():
+                self.phrases.add(query, count * query_weight)
+
+    def add(self, memories):
+        """
+        Add the titles and entities of memories not seen before.
+
+        Args:
+            memories (list): List of memory dictionaries
+        """
+        for memory in memories:
+            key = memory.get('id') or id(memory)
+            with self._lock:
+                if key in self._seen:
+                    continue
+                self._seen.add(key)
+
+            title = memory.get('title') or ''
+            self.phrases.add(title, self.title_weight)
+            for word in _WORD.findall(title):
+                if len(word) > 2:
+                    self.words.add(word.lower(), self.title_weight)
+            for entity in memory.get('entities') or []:
+                text = (entity.get('text') if isinstance(entity, dict) else entity) or ''
+                self.phrases.add(text, self.entity_weight)
+                for word in _WORD.findall(text):
+                    if len(word) > 2:
+                        self.words.add(word.lower(), self.entity_weight)
+
+    def record_query(self, query):
+        """Count a query that was run and save the query log."""
+        query = _SPACE.sub(' ', query or '').strip()
+        if not query:
+            return
+        self.phrases.add(query, self.query_weight)
+        with self._lock:
+            self.queries[query] = self.queries.get(query, 0) + 1
+            if len(self.queries) > self.max_logged_queries:
+                # Keep the log bounded; dropped queries stay suggestable until restart
+                kept = sorted(self.queries.items(), key=lambda item: -item[1])[:self.max_logged_queries]
+                self.queries = dict(kept)
+            queries = dict(self.queries)
+        if self.query_log_path:
+            temp_path = self.query_log_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(queries, f)
+            os.replace(temp_path, self.query_log_path)
+
+    def suggest(self, text, limit=8):
+        """
+        Suggest completions for partially typed text.
+
+        Args:
+            text (str): Text typed so far
+            limit (int): Number of suggestions to return
+
+        Returns:
+            list: Up to limit suggested queries, best first
+        """
+        typed = normalize(text)
+        if not typed:
+            return []
+        suggestions = [completion for completion, _ in self.phrases.complete(typed, limit)
+                       if normalize(completion) != typed]
+
+        # Complete the last word, keeping the words typed before it
+        head, _, last = (text or '').strip().rpartition(' ')
+        if len(suggestions) < limit and last:
+            seen = {normalize(suggestion) for suggestion in suggestions} | {typed}
+            for word, _ in self.words.complete(last, limit):
+                suggestion = f"{head} {word}".strip() if head else word
+                if normalize(suggestion) not in seen:
+                    seen.add(normalize(suggestion))
+                    suggestions.append(suggestion)
+                if len(suggestions) >= limit:
+                    break
+        return suggestions[:limit]
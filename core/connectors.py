@@ -0,0 +1,342 @@
+import os
+import re
+import glob
+import shutil
+import hashlib
+import sqlite3
+import tempfile
+from datetime import datetime
+
+# Connectors stream memories from a source in batches. Each batch comes with
+# a high-water-mark cursor that is saved once the batch is indexed, so a
+# re-sync only reads records past the cursor. Cursors are small JSON values:
+#
+#   browser history  {'visit_id': last visit row id}
+#   photos, notes    {'mtime': newest modification time, 'paths': [files at that time]}
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.heic', '.webp')
+NOTE_EXTENSIONS = ('.md', '.markdown', '.txt')
+
+# Microseconds from Chrome's 1601 epoch to the Unix epoch
+_CHROME_EPOCH_OFFSET = 11_644_473_600_000_000
+
+def _memory_id(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+def find_browser_histories():
+    """
+    Return the history databases of locally installed Chrome-family browsers
+    and Firefox profiles.
+
+    Returns:
+        list: Paths of history SQLite files that exist
+    """
+    home = os.path.expanduser('~')
+    patterns = [
+        # Chrome, Chromium, Edge and Brave on Linux, macOS and Windows
+        '.config/*/Default/History',
+        '.config/*/*/Default/History',
+        'Library/Application Support/Google/Chrome/*/History',
+        'Library/Application Support/*/*/Default/History',
+        'AppData/Local/*/*/User Data/*/History',
+        # Firefox
+        '.mozilla/firefox/*/places.sqlite',
+        'Library/Application Support/Firefox/Profiles/*/places.sqlite',
+        'AppData/Roaming/Mozilla/Firefox/Profiles/*/places.sqlite',
+    ]
+    paths = set()
+    for pattern in patterns:
+        paths.update(glob.glob(os.path.join(home, pattern)))
+    return sorted(path for path in paths if os.path.isfile(path))
+
+class BrowserHistoryConnector:
+    """
+    Imports page visits from a Chrome-family History or Firefox places.sqlite file.
+
+    Visits are read in row id order, so the cursor is simply the last visit
+    id imported. A running browser locks its history and keeps recent
+    visits in the write-ahead log, so the database and its -wal file are
+    copied and the copy is read.
+    """
+
+    source = 'browser_history'
+
+    def __init__(self, history_path):
+        self.location = history_path
+
+    def _connect(self, directory):
+        if not os.path.isfile(self.location):
+            raise FileNotFoundError(f"History database not found: {self.location}")
+        copy = os.path.join(directory, os.path.basename(self.location))
+        shutil.copyfile(self.location, copy)
+        if os.path.isfile(self.location + '-wal'):
+            # Opening the copy folds the copied log into it
+            shutil.copyfile(self.location + '-wal', copy + '-wal')
+        return sqlite3.connect(copy)
+
+    def iter_batches(self, cursor=None, batch_size=500):
+        """
+        Yield batches of visit memories newer than the cursor.
+
+        Args:
+            cursor (dict, optional): Cursor saved after an earlier batch
+            batch_size (int): Visits per batch
+
+        Yields:
+            tuple: (list of memories, cursor after this batch)
+        """
+        last_id = (cursor or {}).get('visit_id', 0)
+        directory = tempfile.mkdtemp(prefix='history-')
+        db = None
+        try:
+            db = self._connect(directory)
+            tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if 'moz_historyvisits' in tables:
+                browser = 'firefox'
+                sql = ("SELECT v.id, p.url, p.title, v.visit_date FROM moz_historyvisits v "
+                       "JOIN moz_places p ON p.id = v.place_id WHERE v.id > ? ORDER BY v.id LIMIT ?")
+            elif 'visits' in tables and 'urls' in tables:
+                browser = 'chrome'
+                sql = ("SELECT v.id, u.url, u.title, v.visit_time FROM visits v "
+                       "JOIN urls u ON u.id = v.url WHERE v.id > ? ORDER BY v.id LIMIT ?")
+            else:
+                raise ValueError(f"{self.location} is not a browser history database")
+
+            while True:
+                rows = db.execute(sql, (last_id, batch_size)).fetchall()
+                if not rows:
+                    return
+                memories = [self._memory(browser, *row) for row in rows]
+                last_id = rows[-1][0]
+                yield memories, {'visit_id': last_id}
+        finally:
+            if db is not None:
+                db.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def _memory(self, browser, visit_id, url, title, timestamp):
+        # Chrome counts UTC microseconds from 1601, Firefox from the Unix epoch;
+        # dates are shown in local time like every other memory's
+        if browser == 'chrome' and timestamp:
+            timestamp -= _CHROME_EPOCH_OFFSET
+        date = datetime.fromtimestamp((timestamp or 0) / 1_000_000)
+        title = title or url
+        return {
+            'id': _memory_id(self.source, self.location, visit_id),
+            'title': title,
+            'content': f"{title}\n{url}",
+            'url': url,
+            'date': date,
+            'type': 'web',
+            'source': self.source,
+        }
+
+def _changed_files(directory, extensions, cursor):
+    """
+    List files modified after a cursor, oldest first.
+
+    Only the file metadata is read here; files at the cursor's exact
+    modification time are skipped if the cursor already lists them.
+
+    Returns:
+        list: (mtime, path) pairs sorted by modification time and path
+    """
+    if not os.path.isdir(directory):
+        raise FileNotFoundError(f"Directory not found: {directory}")
+    since = (cursor or {}).get('mtime', float('-inf'))
+    seen_at_since = set((cursor or {}).get('paths', ()))
+
+    changed = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if os.path.splitext(file)[1].lower() not in extensions:
+                continue
+            path = os.path.join(root, file)
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                continue
+            if mtime > since or (mtime == since and path not in seen_at_since):
+                changed.append((mtime, path))
+    return sorted(changed)
+
+def _iter_file_batches(directory, extensions, cursor, batch_size, build):
+    """Yield (memories, cursor) batches for the files changed since a cursor."""
+    changed = _changed_files(directory, extensions, cursor)
+    mtime = (cursor or {}).get('mtime')
+    paths = list((cursor or {}).get('paths', ()))
+
+    for start in range(0, len(changed), batch_size):
+        memories = []
+        for file_mtime, path in changed[start:start + batch_size]:
+            try:
+                memory = build(path, file_mtime)
+            except OSError:
+                # Removed or unreadable since it was listed
+                memory = None
+            if memory is not None:
+                memories.append(memory)
+            # Remember every path at the newest time to break mtime ties
+            if file_mtime != mtime:
+                mtime, paths = file_mtime, []
+            paths.append(path)
+        yield memories, {'mtime': mtime, 'paths': list(paths)}
+
+def _file_memory(path, mtime):
+    file = os.path.basename(path)
+    return {
+        # Same id as the local file indexer, so both sources update one memory
+        'id': hashlib.md5(path.encode()).hexdigest(),
+        'file_path': path,
+        'file_name': file,
+        'file_extension': os.path.splitext(file)[1].lower(),
+        'file_size': os.path.getsize(path),
+        'file_mtime': mtime,
+        'date': datetime.fromtimestamp(mtime),
+    }
+
+_EXIF_IFD = 0x8769
+_EXIF_DATE_ORIGINAL = 36867
+_EXIF_DATE = 306
+_EXIF_MODEL = 272
+
+def read_exif(path):
+    """
+    Read the capture date and camera model from an image's EXIF data.
+
+    Returns:
+        tuple: (datetime or None, camera model or None)
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            exif = image.getexif()
+    except (ImportError, OSError, ValueError):
+        return None, None
+
+    taken = exif.get_ifd(_EXIF_IFD).get(_EXIF_DATE_ORIGINAL) or exif.get(_EXIF_DATE)
+    try:
+        date = datetime.strptime(str(taken).strip('\x00 '), '%Y:%m:%d %H:%M:%S') if taken else None
+    except ValueError:
+        date = None
+    model = exif.get(_EXIF_MODEL)
+    return date, str(model).strip('\x00 ') if model else None
+
+class PhotoLibraryConnector:
+    """Imports photos from a library folder, dated by their EXIF capture time."""
+
+    source = 'photos'
+
+    def __init__(self, directory):
+        self.location = directory
+
+    def iter_batches(self, cursor=None, batch_size=500):
+        """Yield (memories, cursor) batches for photos added or changed since the cursor."""
+        return _iter_file_batches(self.location, IMAGE_EXTENSIONS, cursor, batch_size, self._memory)
+
+    def _memory(self, path, mtime):
+        memory = _file_memory(path, mtime)
+        taken, camera = read_exif(path)
+        file = memory['file_name']
+        memory.update({
+            'title': file,
+            'content': f"Photo: {file}" + (f", taken with {camera}" if camera else ""),
+            'date': taken or memory['date'],
+            'type': 'image',
+            'source': self.source,
+        })
+        if camera:
+            memory['camera'] = camera
+        return memory
+
+_FRONT_MATTER = re.compile(r'\A---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+_HEADING = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+
+def parse_note(text):
+    """
+    Split a Markdown note into its metadata and body.
+
+    Simple 'key: value' YAML front matter is supported; list values may be
+    written as [a, b]. The title falls back to the first '# ' heading.
+
+    Returns:
+        tuple: (metadata dict, body text)
+    """
+    metadata = {}
+    match = _FRONT_MATTER.match(text)
+    if match:
+        for line in match.group(1).splitlines():
+            key, sep, value = line.partition(':')
+            if not sep:
+                continue
+            value = value.strip().strip('"\'')
+            if value.startswith('[') and value.endswith(']'):
+                value = [item.strip().strip('"\'') for item in value[1:-1].split(',') if item.strip()]
+            metadata[key.strip().lower()] = value
+        text = text[match.end():]
+
+    if 'title' not in metadata:
+        heading = _HEADING.search(text)
+        if heading:
+            metadata['title'] = heading.group(1).strip()
+    return metadata, text.strip()
+
+class NotesConnector:
+    """Imports Markdown and plain-text notes exported from a notes app."""
+
+    source = 'notes'
+
+    def __init__(self, directory):
+        self.location = directory
+
+    def iter_batches(self, cursor=None, batch_size=500):
+        """Yield (memories, cursor) batches for notes added or changed since the cursor."""
+        return _iter_file_batches(self.location, NOTE_EXTENSIONS, cursor, batch_size, self._memory)
+
+    def _memory(self, path, mtime):
+        try:
+            with open(path, encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError:
+            return None
+
+        memory = _file_memory(path, mtime)
+        metadata, body = parse_note(text)
+        memory.update({
+            'title': metadata.get('title') or os.path.splitext(memory['file_name'])[0],
+            'content': body,
+            'type': 'document',
+            'source': self.source,
+        })
+        if metadata.get('date'):
+            try:
+                date = datetime.fromisoformat(str(metadata['date']))
+                # Every other date is naive local time, and the two don't compare
+                memory['date'] = date.astimezone().replace(tzinfo=None) if date.tzinfo else date
+            except ValueError:
+                pass
+        tags = metadata.get('tags')
+        if tags:
+            memory['tags'] = tags if isinstance(tags, list) else [tags]
+        return memory
+
+CONNECTORS = {
+    BrowserHistoryConnector.source: BrowserHistoryConnector,
+    PhotoLibraryConnector.source: PhotoLibraryConnector,
+    NotesConnector.source: NotesConnector,
+}
+
+def get_connector(source, location):
+    """
+    Create the connector for a source.
+
+    Args:
+        source (str): 'browser_history', 'photos' or 'notes'
+        location (str): History database or folder to import from
+
+    Returns:
+        A connector with an iter_batches(cursor, batch_size) method
+    """
+    if source not in CONNECTORS:
+        raise ValueError(f"Unknown import source: {source}")
+    return CONNECTORS[source](location)
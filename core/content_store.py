@@ -0,0 +1,296 @@
+import os
+import struct
+import hashlib
+import threading
+import zlib
+from collections.abc import Mapping
+from functools import lru_cache
+
+# Memories are split into two tiers:
+#
+#   hot   every field except content, plus a short excerpt, kept in RAM
+#   cold  the full content, packed into blocks that are compressed together
+#         and appended to one file
+#
+# Reading a cold memory's content decompresses its whole block, so the
+# decompressed blocks are kept in a small LRU; neighbouring memories are
+# usually read together and share blocks.
+
+_BLOCK = struct.Struct('<QI?')  # file offset, compressed length, compressed with the dictionary
+
+def _zstd():
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+class ContentStore:
+    """
+    Append-only file of compressed content blocks.
+
+    Texts are buffered until block_size bytes have accumulated and are then
+    compressed as one block. With the zstandard package installed, blocks
+    are zstd-compressed, and once dictionary_samples bytes of text have
+    been written a dictionary is trained on them and used for every later
+    block, which compresses small blocks much better; without it blocks are
+    zlib-compressed.
+
+    The store is scratch space for one process: opening it replaces the
+    file with an empty one. A store opened earlier on the same path keeps
+    reading the old file through its open handle, so memories tiered into
+    it stay readable.
+
+    Texts put under a key, such as a memory id, are stored once: putting the
+    same text under the same key again returns the first reference, so
+    tiering the same memories repeatedly doesn't grow the file.
+    """
+
+    def __init__(self, path, block_size=16 * 1024, cache_blocks=64, codec='zstd',
+                 dictionary_size=16 * 1024, dictionary_samples=128 * 1024, level=3):
+        """
+        Args:
+            path (str): Block file to write
+            block_size (int): Uncompressed bytes per block
+            cache_blocks (int): Decompressed blocks kept in the LRU
+            codec (str): "zstd" or "zlib"; zstd falls back to zlib when not installed
+            dictionary_size (int): Size of the trained zstd dictionary in bytes
+            dictionary_samples (int): Bytes of text to train the dictionary on;
+                blocks written before that are compressed without it
+            level (int): Compression level
+        """
+        self.path = path
+        self.block_size = block_size
+        self.dictionary_size = dictionary_size
+        self.dictionary_samples = dictionary_samples
+        self.level = level
+        self.codec = 'zstd' if codec == 'zstd' and _zstd() is not None else 'zlib'
+        self._cached_block = lru_cache(maxsize=cache_blocks)(self._read_block)
+        self.dictionary = None
+        self._compressor = None
+        # By whether a block was compressed with the dictionary
+        self._decompressors = {}
+        # Texts kept for training until there are enough; None once trained or given up
+        self._samples = [] if self.codec == 'zstd' else None
+        self._sample_bytes = 0
+        self._index = []
+        self._refs = {}
+        self._pending = bytearray()
+        self._pending_texts = []
+        self._raw_bytes = 0
+        self._stored_bytes = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        try:
+            # Unlinked rather than truncated, since an earlier store may still read it
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self._file = open(path, 'w+b')
+
+    def __len__(self):
+        return len(self._index)
+
+    def put(self, text, key=None):
+        """
+        Add a text to the store.
+
+        Args:
+            text (str): Text to store
+            key (optional): Owner of the text, such as a memory id; the text
+                is only stored again under a key if it changed
+
+        Returns:
+            tuple: (block, start, end) reference used to read the text back
+        """
+        data = text.encode('utf-8')
+        digest = hashlib.blake2b(data, digest_size=16).digest() if key is not None else None
+        with self._lock:
+            if key is not None:
+                stored = self._refs.get(key)
+                if stored is not None and stored[0] == digest:
+                    return stored[1]
+            start = len(self._pending)
+            ref = (len(self._index), start, start + len(data))
+            if key is not None:
+                self._refs[key] = (digest, ref)
+            self._pending.extend(data)
+            if self._samples is not None:
+                self._pending_texts.append(data)
+            if len(self._pending) >= self.block_size:
+                self._flush()
+        return ref
+
+    def get(self, ref):
+        """Return the text stored under a reference."""
+        block, start, end = ref
+        with self._lock:
+            if block == len(self._index):
+                # Still in the block being filled
+                return bytes(self._pending[start:end]).decode('utf-8')
+        return self._cached_block(block)[start:end].decode('utf-8')
+
+    def flush(self):
+        """Compress and write the block being filled, even if it isn't full."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        if self._compressor is None:
+            self._init_codec()
+        data = bytes(self._pending)
+        if self._samples is not None:
+            self._samples.extend(self._pending_texts)
+            self._sample_bytes += len(data)
+            if self._sample_bytes >= self.dictionary_samples:
+                self._train_dictionary()
+        compressed = self._compressor(data)
+
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        self._file.write(compressed)
+        self._index.append(_BLOCK.pack(offset, len(compressed), self.dictionary is not None))
+        self._raw_bytes += len(data)
+        self._stored_bytes += len(compressed)
+        self._pending = bytearray()
+        self._pending_texts = []
+
+    def _init_codec(self):
+        if self.codec == 'zstd':
+            zstandard = _zstd()
+            self._compressor = zstandard.ZstdCompressor(level=self.level).compress
+            self._decompressors[False] = zstandard.ZstdDecompressor().decompress
+        else:
+            level = self.level
+            self._compressor = lambda data: zlib.compress(data, level)
+            self._decompressors[False] = zlib.decompress
+
+    def _train_dictionary(self):
+        zstandard = _zstd()
+        try:
+            self.dictionary = zstandard.train_dictionary(self.dictionary_size, self._samples)
+        except Exception:
+            # Too few or too similar samples; keep compressing without a dictionary
+            self.dictionary = None
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self.dictionary).compress
+            self._decompressors[True] = zstandard.ZstdDecompressor(dict_data=self.dictionary).decompress
+        self._samples = None
+        self._sample_bytes = 0
+
+    def _read_block(self, block):
+        with self._lock:
+            offset, length, with_dictionary = _BLOCK.unpack(self._index[block])
+            self._file.seek(offset)
+            compressed = self._file.read(length)
+            decompress = self._decompressors[with_dictionary]
+        return decompress(compressed)
+
+    def memory_usage(self):
+        """Approximate bytes of decompressed blocks cached, text waiting to be compressed and dictionary samples."""
+        return self._cached_block.cache_info().currsize * self.block_size + len(self._pending) + self._sample_bytes
+
+    def shrink(self, target_bytes):
+        """
+        Drop the decompressed block cache if usage exceeds target_bytes.
+
+        Returns:
+            int: Bytes freed
+        """
+        used = self.memory_usage()
+        if used <= target_bytes:
+            return 0
+        self._cached_block.cache_clear()
+        return used - self.memory_usage()
+
+    def stats(self):
+        """Return block counts, compression ratio and cache hit rate."""
+        cache = self._cached_block.cache_info()
+        lookups = cache.hits + cache.misses
+        return {
+            'codec': self.codec + ('+dictionary' if self.dictionary is not None else ''),
+            'blocks': len(self._index),
+            'raw_bytes': self._raw_bytes,
+            'stored_bytes': self._stored_bytes,
+            'ratio': self._raw_bytes / self._stored_bytes if self._stored_bytes else None,
+            'cache_hit_rate': cache.hits / lookups if lookups else None,
+        }
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class TieredMemory(Mapping):
+    """
+    Read-only memory whose content lives in a ContentStore.
+
+    Every other field is held in RAM along with the first characters of
+    the content, so listing and excerpting memories never touches the store;
+    reading 'content' fetches the full text from it.
+    """
+
+    __slots__ = ('_fields', '_store', '_ref', 'excerpt')
+
+    def __init__(self, fields, store, ref, excerpt):
+        self._fields = fields
+        self._store = store
+        self._ref = ref
+        self.excerpt = excerpt
+
+    def __getitem__(self, key):
+        if key == 'content':
+            return self._store.get(self._ref)
+        return self._fields[key]
+
+    def __contains__(self, key):
+        return key == 'content' or key in self._fields
+
+    def __iter__(self):
+        yield from self._fields
+        yield 'content'
+
+    def __len__(self):
+        return len(self._fields) + 1
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+def tier_memories(memories, store, excerpt_chars=200):
+    """
+    Move the content of plain memory dictionaries into a content store.
+
+    Memories whose content fits in the excerpt are left as they are, as are
+    memories that are already backed by a file, such as snapshot records.
+    Content is stored under the memory's id, so tiering a memory again
+    reuses its stored copy unless the content changed.
+
+    Args:
+        memories (list): List of memories
+        store (ContentStore): Where full content is kept
+        excerpt_chars (int): Content characters kept in RAM
+
+    Returns:
+        list: The memories, with long-content dictionaries replaced by TieredMemory
+    """
+    tiered = []
+    for memory in memories:
+        content = memory.get('content') if isinstance(memory, dict) else None
+        if isinstance(content, str) and len(content) > excerpt_chars:
+            fields = {key: value for key, value in memory.items() if key != 'content'}
+            memory = TieredMemory(fields, store, store.put(content, memory.get('id')), content[:excerpt_chars])
+        tiered.append(memory)
+    store.flush()
+    return tiered
+
+def content_excerpt(memory, length=200):
+    """
+    Return the first length characters of a memory's content.
+
+    Answered from RAM for tiered memories when the excerpt is long enough.
+    """
+    if isinstance(memory, TieredMemory) and length <= len(memory.excerpt):
+        return memory.excerpt[:length]
+    return (memory.get('content') or '')[:length]
@@ -0,0 +1,249 @@
+import os
+import re
+import time
+import zlib
+import numpy as np
+from config import EMBEDDINGS_DIR
+
+# Every encoder has encode(texts) -> float32 array of shape (len(texts), dimension).
+# The ONNX backend reproduces the sentence-transformers pipeline for
+# all-MiniLM-L6-v2 style models (mean pooling followed by L2 normalisation),
+# so embeddings from the two are interchangeable up to quantisation error.
+
+_WORD = re.compile(r'\w+')
+
+class SentenceTransformerEncoder:
+    """The sentence-transformers PyTorch model."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", threads=None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        self.name = "sentence-transformers"
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size=32):
+        return np.asarray(self.model.encode(list(texts), batch_size=batch_size), dtype=np.float32)
+
+def export_onnx(model_name, directory, quantize=True):
+    """
+    Export a sentence-transformers model to ONNX, optionally int8-quantized.
+
+    Needs torch and transformers, but only once; the exported files are all
+    OnnxEncoder needs at runtime.
+
+    Args:
+        model_name (str): Hugging Face model name, e.g. "all-MiniLM-L6-v2"
+        directory (str): Where to write model.onnx, model-int8.onnx and the tokenizer
+        quantize (bool): Also write a dynamically quantized int8 model
+
+    Returns:
+        str: Path of the model to load
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(directory, exist_ok=True)
+    repo = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(repo)
+    model = AutoModel.from_pretrained(repo).eval()
+    tokenizer.save_pretrained(directory)
+
+    path = os.path.join(directory, "model.onnx")
+    sample = tokenizer(["export"], return_tensors="pt")
+    axes = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (sample["input_ids"], sample["attention_mask"], sample["token_type_ids"]), path,
+            input_names=["input_ids", "attention_mask", "token_type_ids"],
+            output_names=["last_hidden_state"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "token_type_ids": axes,
+                          "last_hidden_state": axes},
+            opset_version=14)
+
+    if not quantize:
+        return path
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantized = os.path.join(directory, "model-int8.onnx")
+    quantize_dynamic(path, quantized, weight_type=QuantType.QInt8)
+    return quantized
+
+class OnnxEncoder:
+    """
+    ONNX Runtime encoder, with dynamically quantized int8 weights by default.
+
+    The model is exported to directory on first use if it isn't there yet.
+    """
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", directory=None, quantize=True, threads=None,
+                 max_length=256):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        directory = directory or os.path.join(EMBEDDINGS_DIR, "onnx", model_name.replace('/', '--'))
+        path = os.path.join(directory, "model-int8.onnx" if quantize else "model.onnx")
+        if not os.path.exists(path):
+            path = export_onnx(model_name, directory, quantize)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {node.name for node in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length)
+        self.tokenizer.enable_padding()
+        self.name = "onnx-int8" if quantize else "onnx"
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            feed = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feed.items() if k in self.inputs})[0]
+
+            # Mean pooling over real tokens, then L2 normalisation
+            mask = feed["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            batches.append(pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12))
+        if not batches:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32)
+
+class HashEncoder:
+    """
+    Deterministic stand-in for an embedding model.
+
+    Words and character trigrams are hashed into a fixed number of signed
+    buckets and the result is L2-normalised, so texts sharing words get
+    similar vectors. Needs no model weights and is stable across runs, which
+    makes it suitable for tests.
+    """
+
+    def __init__(self, dimension=384):
+        self.name = "hash"
+        self.dimension = dimension
+
+    def _features(self, text):
+        words = _WORD.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = zlib.crc32(feature.encode())
+                # The top bit picks the sign so collisions tend to cancel out
+                vectors[row, digest % self.dimension] += 1.0 if digest & 0x80000000 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8", "hash")
+
+def get_encoder(backend="sentence-transformers", model_name="all-MiniLM-L6-v2", threads=None):
+    """
+    Create an embedding backend by name.
+
+    Args:
+        backend (str): "sentence-transformers", "onnx", "onnx-int8" or "hash"
+        model_name (str): Model to load for the model-based backends
+        threads (int, optional): CPU threads for inference; library default when omitted
+
+    Returns:
+        object: Encoder with an encode(texts) method and a dimension attribute
+    """
+    if backend == "sentence-transformers":
+        return SentenceTransformerEncoder(model_name, threads)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(model_name, quantize=backend == "onnx-int8", threads=threads)
+    if backend == "hash":
+        return HashEncoder()
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+def _benchmark_sentences(count, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["meeting", "project", "budget", "travel", "photos", "research", "notes", "recipe",
+             "tokyo", "london", "family", "draft", "review", "plan", "birthday", "invoice",
+             "flight", "hotel", "doctor", "garden", "presentation", "quarterly", "report"]
+    return [" ".join(rng.choice(words, size=rng.integers(4, 20))) for _ in range(count)]
+
+def benchmark(backends=BACKENDS, sentences=None, count=1000, model_name="all-MiniLM-L6-v2",
+              threads=None, reference="sentence-transformers", batch_size=32):
+    """
+    Compare encoder throughput and fidelity on the same sentences.
+
+    Fidelity is the mean cosine similarity between each backend's embedding
+    and the reference backend's embedding of the same sentence. Backends that
+    fail to load are reported with their error.
+
+    Args:
+        backends (iterable): Backend names to run
+        sentences (list, optional): Texts to encode; synthetic ones when omitted
+        count (int): Number of synthetic sentences
+        model_name (str): Model for the model-based backends
+        threads (int, optional): CPU threads per backend
+        reference (str): Backend whose embeddings the others are compared to
+        batch_size (int): Texts per encode batch
+
+    Returns:
+        list: One dict per backend with sentences_per_sec and fidelity
+    """
+    sentences = sentences or _benchmark_sentences(count)
+    embeddings = {}
+    results = []
+    # Run the reference first so every other backend can be compared to it
+    for backend in sorted(backends, key=lambda name: name != reference):
+        try:
+            encoder = get_encoder(backend, model_name, threads)
+        except Exception as e:
+            results.append({'backend': backend, 'error': str(e)})
+            continue
+        encoder.encode(sentences[:batch_size], batch_size)  # Warm up
+        start = time.perf_counter()
+        embeddings[backend] = encoder.encode(sentences, batch_size)
+        elapsed = time.perf_counter() - start
+
+        fidelity = None
+        base = embeddings.get(reference)
+        if base is not None and base.shape == embeddings[backend].shape:
+            a = base / np.maximum(np.linalg.norm(base, axis=1, keepdims=True), 1e-12)
+            b = embeddings[backend] / np.maximum(np.linalg.norm(embeddings[backend], axis=1, keepdims=True), 1e-12)
+            fidelity = float(np.mean(np.sum(a * b, axis=1)))
+        results.append({
+            'backend': backend,
+            'sentences_per_sec': len(sentences) / elapsed if elapsed > 0 else float('inf'),
+            'fidelity': fidelity,
+        })
+    return results
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--sentences', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--model', default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+    for result in benchmark(args.backends, count=args.sentences, model_name=args.model, threads=args.threads):
+        if 'error' in result:
+            print(f"{result['backend']:>22}  unavailable: {result['error']}")
+        else:
+            fidelity = "n/a" if result['fidelity'] is None else f"{result['fidelity']:.4f}"
+            print(f"{result['backend']:>22}  {result['sentences_per_sec']:10.1f} sentences/s  fidelity {fidelity}")
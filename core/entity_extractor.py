@@ -0,0 +1,283 @@
+import os
+import re
+import json
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher over lowercase text.
+
+    All patterns are found in a single pass over the text, regardless of how
+    many there are. Matches must start and end on word boundaries.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (dict): Pattern text -> payload returned with each match
+        """
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for pattern, payload in patterns.items():
+            pattern = pattern.lower()
+            if not pattern:
+                continue
+            node = 0
+            for char in pattern:
+                if char not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][char] = len(self._goto) - 1
+                node = self._goto[node][char]
+            self._output[node].append((len(pattern), payload))
+
+        # Breadth-first pass to build failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    fail = self._fail[node]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def iter_matches(self, text):
+        """
+        Yield every whole-word pattern occurrence in text.
+
+        Yields:
+            tuple: (start, end, payload)
+        """
+        lowered = text.lower()
+        node = 0
+        for i, char in enumerate(lowered):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, payload in self._output[node]:
+                start = i - length + 1
+                end = i + 1
+                if (start == 0 or not lowered[start - 1].isalnum()) and \
+                        (end == len(lowered) or not lowered[end].isalnum()):
+                    yield start, end, payload
+
+    def find(self, text):
+        """
+        Return leftmost-longest, non-overlapping matches.
+
+        Returns:
+            list: (start, end, payload) tuples in text order
+        """
+        matches = sorted(self.iter_matches(text), key=lambda m: (m[0], m[0] - m[1]))
+        selected = []
+        position = 0
+        for start, end, payload in matches:
+            if start >= position:
+                selected.append((start, end, payload))
+                position = end
+        return selected
+
+_MONTHS = r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|" \
+          r"sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)"
+_DATE_PATTERN = re.compile(
+    r"\b(?:\d{4}-\d{2}-\d{2}"
+    r"|\d{1,2}/\d{1,2}/\d{2,4}"
+    rf"|{_MONTHS}\.? \d{{1,2}}(?:st|nd|rd|th)?,? \d{{4}}"
+    rf"|\d{{1,2}} {_MONTHS}\.? \d{{4}}"
+    rf"|{_MONTHS} \d{{4}})\b",
+    re.IGNORECASE)
+
+def date_recognizer(text):
+    """Lightweight regex recognizer for common date formats."""
+    return [{'type': 'date', 'text': match.group(0)} for match in _DATE_PATTERN.finditer(text)]
+
+_SPACY_TYPES = {'PERSON': 'person', 'ORG': 'organization', 'GPE': 'location', 'LOC': 'location',
+                'DATE': 'date'}
+
+def spacy_recognizer(model_name="en_core_web_sm"):
+    """
+    Build a recognizer backed by a spaCy pipeline.
+
+    Returns:
+        callable: Recognizer, or None when spaCy or the model isn't installed
+    """
+    try:
+        import spacy
+        nlp = spacy.load(model_name, disable=['parser', 'lemmatizer'])
+    except (ImportError, OSError):
+        return None
+
+    def recognize(text):
+        return [{'type': _SPACY_TYPES[ent.label_], 'text': ent.text}
+                for ent in nlp(text).ents if ent.label_ in _SPACY_TYPES]
+    return recognize
+
+def load_gazetteer(path):
+    """
+    Load known entity names from a JSON file of {type: [names]}.
+
+    Returns:
+        dict: Entity type -> list of names; empty if the file doesn't exist
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def gazetteer_from_memories(memories, gazetteer=None):
+    """
+    Extend a gazetteer with the entities already attached to memories.
+
+    Args:
+        memories (list): List of memory dictionaries
+        gazetteer (dict, optional): Existing {type: [names]} to extend
+
+    Returns:
+        dict: Entity type -> sorted list of names
+    """
+    names = {entity_type: set(values) for entity_type, values in (gazetteer or {}).items()}
+    for memory in memories:
+        for entity in memory.get('entities') or []:
+            if isinstance(entity, dict) and entity.get('text'):
+                names.setdefault(entity.get('type', 'unknown'), set()).add(entity['text'])
+    return {entity_type: sorted(values) for entity_type, values in names.items()}
+
+class EntityExtractor:
+    """
+    Combines a gazetteer automaton with pluggable recognizers.
+
+    A recognizer is any callable taking text and returning a list of
+    {"type", "text"} dicts.
+    """
+
+    def __init__(self, gazetteer=None, recognizers=None):
+        patterns = {}
+        for entity_type, names in (gazetteer or {}).items():
+            for name in names:
+                patterns.setdefault(name.lower(), (entity_type, name))
+        self.matcher = AhoCorasick(patterns)
+        self.recognizers = [date_recognizer] if recognizers is None else list(recognizers)
+
+    def extract(self, text):
+        """
+        Find entities in text.
+
+        Returns:
+            list: Unique {"type", "text"} dicts in order of first appearance
+        """
+        entities = [{'type': entity_type, 'text': name}
+                    for _, _, (entity_type, name) in self.matcher.find(text)]
+        for recognizer in self.recognizers:
+            entities.extend(recognizer(text))
+        return merge_entities([], entities)
+
+def merge_entities(existing, new):
+    """Append new entities that aren't already present (case-insensitive)."""
+    merged = list(existing or [])
+    seen = {(e.get('type'), e.get('text', '').lower()) for e in merged if isinstance(e, dict)}
+    for entity in new:
+        key = (entity['type'], entity['text'].lower())
+        if key not in seen:
+            seen.add(key)
+            merged.append(entity)
+    return merged
+
+def memory_text(memory):
+    return f"{memory.get('title', '')}\n{memory.get('content', '')}"
+
+# Per-process extractor, built once by the pool initializer
+_worker_extractor = None
+
+def _init_worker(gazetteer, use_spacy):
+    global _worker_extractor
+    recognizers = [date_recognizer]
+    if use_spacy:
+        recognizer = spacy_recognizer()
+        if recognizer is not None:
+            recognizers.append(recognizer)
+    _worker_extractor = EntityExtractor(gazetteer, recognizers)
+
+def _extract_batch(texts):
+    return [_worker_extractor.extract(text) for text in texts]
+
+class EntityExtractionStage:
+    """
+    Indexing stage that attaches entities to memories.
+
+    Memories are processed in batches on a process pool. Each worker builds
+    the automaton once, so only the texts and results cross the process
+    boundary. With workers=0, everything runs in the calling process.
+    Extractors are built on the first batch, so a loader that extends the
+    gazetteer from existing memories runs on the indexing thread.
+    """
+
+    def __init__(self, gazetteer=None, workers=2, batch_size=64, use_spacy=False, loader=None):
+        """
+        Args:
+            gazetteer (dict, optional): Entity type -> list of names
+            workers (int): Extraction processes; 0 runs inline
+            batch_size (int): Texts sent to a worker at a time
+            use_spacy (bool): Also run spaCy NER when it is installed
+            loader (callable, optional): Returns memories whose entities extend the gazetteer
+        """
+        self.gazetteer = gazetteer or {}
+        self.workers = workers
+        self.batch_size = batch_size
+        self.use_spacy = use_spacy
+        self.loader = loader
+        self._pool = None
+        self._local = None
+        self._started = False
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self.loader is not None:
+                self.gazetteer = gazetteer_from_memories(self.loader(), self.gazetteer)
+            if self.workers > 0:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                 initargs=(self.gazetteer, self.use_spacy))
+            else:
+                _init_worker(self.gazetteer, self.use_spacy)
+                self._local = _worker_extractor
+            self._started = True
+
+    def process(self, memories):
+        """
+        Add extracted entities to each memory in place.
+
+        Args:
+            memories (list): List of memory dictionaries
+
+        Returns:
+            list: The same memories
+        """
+        self._start()
+        texts = [memory_text(memory) for memory in memories]
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if self._pool is not None:
+            results = [entities for batch in self._pool.map(_extract_batch, batches) for entities in batch]
+        else:
+            results = [self._local.extract(text) for text in texts]
+
+        for memory, entities in zip(memories, results):
+            memory['entities'] = merge_entities(memory.get('entities'), entities)
+        return memories
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Tokens refill at rate per second up to capacity. Taking more tokens than
+    are available blocks until the deficit has refilled, so the long-run
+    rate never exceeds rate even for requests larger than the bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second; None or 0 disables the limit
+            capacity (float, optional): Burst size; one second's worth by default
+        """
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount, cancel_event=None):
+        """
+        Take tokens, sleeping while the bucket is in deficit.
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            if cancel_event is not None:
+                cancel_event.wait(wait)
+            else:
+                time.sleep(wait)
+        return wait
+
+class LatencyMonitor:
+    """Keeps the query latencies recorded over a recent time window."""
+
+    def __init__(self, window_seconds=30.0, max_samples=1000):
+        self.window_seconds = window_seconds
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append((time.monotonic(), seconds))
+
+    def percentile(self, q=95):
+        """Return the q-th percentile latency in the window, or None without samples."""
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            latencies = sorted(latency for _, latency in self._samples)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q / 100))]
+
+def lower_thread_priority(niceness):
+    """
+    Raise the nice value of the calling thread.
+
+    On Linux, nice values apply per thread, and the default I/O priority
+    follows them. Elsewhere this falls back to the whole process, which
+    is only done once.
+
+    Returns:
+        bool: True if the priority was changed
+    """
+    if not niceness:
+        return False
+    try:
+        if sys.platform.startswith('linux'):
+            tid = threading.get_native_id()
+            current = os.getpriority(os.PRIO_PROCESS, tid)
+            os.setpriority(os.PRIO_PROCESS, tid, max(current, min(19, niceness)))
+            return True
+        if hasattr(os, 'nice') and os.nice(0) < niceness:
+            os.nice(niceness - os.nice(0))
+            return True
+    except OSError:
+        pass
+    return False
+
+class ResourceGovernor:
+    """
+    Keeps background indexing from starving interactive search.
+
+    Indexing workers call throttle_read before reading a file, do their
+    parse/embed work inside worker_slot, and call pause between files. The
+    search path reports its latency with record_query_latency; while the
+    recent p95 is above the target, pause sleeps for an exponentially
+    growing backoff, which decays again once searches are fast.
+    """
+
+    def __init__(self, read_bytes_per_sec=None, max_workers=2, niceness=10, latency_target=0.25,
+                 max_backoff=2.0, min_backoff=0.05):
+        """
+        Args:
+            read_bytes_per_sec (float, optional): Read throughput limit; unlimited when None
+            max_workers (int): Parse/embed sections that may run at once
+            niceness (int): Nice value for indexing threads; 0 leaves them alone
+            latency_target (float): Search p95 latency in seconds to stay under
+            max_backoff (float): Longest pause between files, in seconds
+            min_backoff (float): First pause once latency exceeds the target
+        """
+        self.reads = TokenBucket(read_bytes_per_sec)
+        self.max_workers = max_workers
+        self.niceness = niceness
+        self.latency_target = latency_target
+        self.max_backoff = max_backoff
+        self.min_backoff = min_backoff
+        self.latency = LatencyMonitor()
+        self.backoff = 0.0
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._lock = threading.Lock()
+
+    def lower_priority(self):
+        """Lower the scheduling priority of the calling worker thread."""
+        return lower_thread_priority(self.niceness)
+
+    def throttle_read(self, num_bytes, cancel_event=None):
+        """Block until num_bytes may be read under the read limit."""
+        return self.reads.acquire(num_bytes, cancel_event)
+
+    @contextmanager
+    def worker_slot(self):
+        """Hold one of the max_workers parse/embed slots."""
+        with self._slots:
+            yield
+
+    def record_query_latency(self, seconds):
+        self.latency.record(seconds)
+
+    def pause(self, cancel_event=None):
+        """
+        Back off while search latency is above target.
+
+        Returns:
+            float: Seconds paused
+        """
+        p95 = self.latency.percentile(95)
+        with self._lock:
+            if p95 is not None and p95 > self.latency_target:
+                self.backoff = min(self.max_backoff, max(self.min_backoff, self.backoff * 2))
+            else:
+                self.backoff = self.backoff / 2 if self.backoff > self.min_backoff else 0.0
+            backoff = self.backoff
+        if backoff > 0:
+            if cancel_event is not None:
+                cancel_event.wait(backoff)
+            else:
+                time.sleep(backoff)
+        return backoff
+
+    def status(self):
+        return {
+            'search_p95': self.latency.percentile(95),
+            'backoff': self.backoff,
+            'read_limit': self.reads.rate,
+        }
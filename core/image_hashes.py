@@ -0,0 +1,276 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+HASH_SIZE = 8  # Hashes are HASH_SIZE x HASH_SIZE = 64 bits
+
+def _grayscale(image, width, height):
+    from PIL import Image
+    return np.asarray(image.convert('L').resize((width, height), Image.LANCZOS), dtype=np.float64)
+
+def _pack_bits(bits):
+    """Pack 64 booleans, row-major, into an int."""
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+def average_hash(image):
+    """aHash: pixels brighter than the mean of an 8x8 thumbnail."""
+    pixels = _grayscale(image, HASH_SIZE, HASH_SIZE)
+    return _pack_bits(pixels > pixels.mean())
+
+def difference_hash(image):
+    """dHash: horizontal brightness gradients of a 9x8 thumbnail."""
+    pixels = _grayscale(image, HASH_SIZE + 1, HASH_SIZE)
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+def _dct_matrix(size):
+    n = np.arange(size)
+    return np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size))
+
+_DCT_SIZE = HASH_SIZE * 4
+_DCT = _dct_matrix(_DCT_SIZE)
+
+def perceptual_hash(image):
+    """pHash: low-frequency DCT coefficients of a 32x32 thumbnail above their median."""
+    pixels = _grayscale(image, _DCT_SIZE, _DCT_SIZE)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    # The DC term only reflects overall brightness
+    return _pack_bits(low > np.median(low.ravel()[1:]))
+
+HASH_FUNCTIONS = {
+    'ahash': average_hash,
+    'dhash': difference_hash,
+    'phash': perceptual_hash,
+}
+
+def hash_image(file_path, algorithm='phash'):
+    """
+    Compute the perceptual hash of an image file.
+
+    Args:
+        file_path (str): Path to the image
+        algorithm (str): 'ahash', 'dhash' or 'phash'
+
+    Returns:
+        int: 64-bit hash, or None if the image can't be read
+    """
+    from PIL import Image
+    try:
+        with Image.open(file_path) as image:
+            return HASH_FUNCTIONS[algorithm](image)
+    except (OSError, ValueError):
+        return None
+
+def hamming_distance(hash_a, hash_b):
+    return (hash_a ^ hash_b).bit_count()
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes in Hamming space.
+
+    Each child edge is labelled with its distance to the parent, so a radius
+    query only descends into edges within radius of the query's distance to
+    the node (triangle inequality), visiting a small part of the tree.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, image_hash, item):
+        self._size += 1
+        # Nodes are [hash, items, {distance: child}]
+        if self._root is None:
+            self._root = [image_hash, [item], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming_distance(image_hash, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [image_hash, [item], {}]
+                return
+            node = child
+
+    def remove(self, image_hash, item):
+        """
+        Remove an item added with a hash.
+
+        Its node stays in the tree to route searches to its children.
+
+        Returns:
+            bool: False if the item wasn't found
+        """
+        node = self._root
+        while node is not None:
+            distance = hamming_distance(image_hash, node[0])
+            if distance == 0:
+                if item not in node[1]:
+                    return False
+                node[1].remove(item)
+                self._size -= 1
+                return True
+            node = node[2].get(distance)
+        return False
+
+    def search(self, image_hash, max_distance):
+        """
+        Find every item whose hash is within max_distance bits.
+
+        Returns:
+            list: (distance, item) pairs, closest first
+        """
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming_distance(image_hash, node[0])
+            if distance <= max_distance:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found, key=lambda match: match[0])
+
+class ImageHashIndex:
+    """Finds visually similar images by the Hamming distance of their hashes."""
+
+    def __init__(self, max_distance=10):
+        self.max_distance = max_distance
+        self.hashes = {}
+        self._tree = BKTree()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def add(self, memory_id, image_hash):
+        """Index an image's hash, replacing the one it had before."""
+        if image_hash is None:
+            self.remove(memory_id)
+            return
+        previous = self.hashes.get(memory_id)
+        if previous == image_hash:
+            return
+        if previous is not None:
+            self._tree.remove(previous, memory_id)
+        self.hashes[memory_id] = image_hash
+        self._tree.add(image_hash, memory_id)
+
+    def remove(self, memory_id):
+        """
+        Forget a deleted image.
+
+        Returns:
+            bool: False if the image wasn't indexed
+        """
+        image_hash = self.hashes.pop(memory_id, None)
+        if image_hash is None:
+            return False
+        self._tree.remove(image_hash, memory_id)
+        return True
+
+    def update(self, memories):
+        """Index new and changed hashes, and drop memories that lost theirs."""
+        for memory in memories:
+            if memory.get('image_hash') is not None or memory.get('id') in self.hashes:
+                self.add(memory['id'], memory.get('image_hash'))
+
+    def similar(self, image_hash, max_distance=None):
+        """
+        Find indexed images similar to a hash.
+
+        Returns:
+            list: (memory_id, distance) pairs, closest first
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        return [(memory_id, distance) for distance, memory_id in self._tree.search(image_hash, max_distance)]
+
+    def similar_to(self, memory_id, max_distance=None):
+        """Find images similar to an indexed one, excluding itself."""
+        image_hash = self.hashes.get(memory_id)
+        if image_hash is None:
+            return []
+        return [match for match in self.similar(image_hash, max_distance) if match[0] != memory_id]
+
+def collapse_similar_images(memories, max_distance=10, limit=None):
+    """
+    Keep only the first of each group of visually similar images, such as
+    the shots of a burst. Memories without an image hash are always kept.
+
+    Args:
+        memories (list): Ordered memories
+        max_distance (int): Largest Hamming distance treated as similar
+        limit (int, optional): Stop once this many memories are kept
+
+    Returns:
+        list: Memories with later similar images removed, order preserved
+    """
+    tree = BKTree()
+    kept = []
+    for memory in memories:
+        if limit is not None and len(kept) >= limit:
+            break
+        image_hash = memory.get('image_hash')
+        if image_hash is not None:
+            if tree.search(image_hash, max_distance):
+                continue
+            tree.add(image_hash, memory.get('id'))
+        kept.append(memory)
+    return kept
+
+def _hash_batch(file_paths, algorithm):
+    return [hash_image(file_path, algorithm) for file_path in file_paths]
+
+class ImageHashStage:
+    """
+    Indexing stage that adds an 'image_hash' to image memories.
+
+    Decoding and resizing images is CPU-bound, so batches of files are
+    hashed on a process pool. With workers=0, everything runs in the calling
+    process.
+    """
+
+    def __init__(self, workers=2, batch_size=64, algorithm='phash'):
+        if algorithm not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown image hash algorithm: {algorithm}")
+        self.batch_size = batch_size
+        self.algorithm = algorithm
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+
+    def process(self, memories):
+        """
+        Hash the image memories in place.
+
+        Args:
+            memories (list): List of memory dictionaries
+
+        Returns:
+            list: The same memories
+        """
+        images = [memory for memory in memories
+                  if memory.get('type') == 'image' and memory.get('file_path')]
+        paths = [memory['file_path'] for memory in images]
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+
+        if self._pool is not None:
+            results = [image_hash for batch in self._pool.map(_hash_batch, batches,
+                                                               [self.algorithm] * len(batches))
+                       for image_hash in batch]
+        else:
+            results = _hash_batch(paths, self.algorithm)
+
+        for memory, image_hash in zip(images, results):
+            if image_hash is not None:
+                memory['image_hash'] = image_hash
+        return memories
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
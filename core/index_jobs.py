@@ -0,0 +1,444 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import nullcontext
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from core.indexer import iter_files, index_file, unchanged_memory
+
+# Job states. 'interrupted' marks jobs that were running when the process
+# exited; like 'cancelled' and 'failed' jobs they can be resumed.
+PENDING = 'pending'
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+INTERRUPTED = 'interrupted'
+
+RESUMABLE = (CANCELLED, FAILED, INTERRUPTED)
+
+# Job sources. 'files' jobs walk a directory; the others stream from a
+# connector in core.connectors and resume from its saved cursor.
+FILES = 'files'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS index_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    directory TEXT NOT NULL,
+    status TEXT NOT NULL,
+    files_seen INTEGER NOT NULL DEFAULT 0,
+    files_parsed INTEGER NOT NULL DEFAULT 0,
+    files_embedded INTEGER NOT NULL DEFAULT 0,
+    bytes_read INTEGER NOT NULL DEFAULT 0,
+    run_bytes INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    run_started_at REAL,
+    updated_at REAL,
+    finished_at REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS import_cursors (
+    source TEXT NOT NULL,
+    location TEXT NOT NULL,
+    cursor TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source, location)
+);
+CREATE TABLE IF NOT EXISTS index_job_files (
+    job_id INTEGER NOT NULL,
+    file_path TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (job_id, file_path)
+);
+"""
+
+class IndexJobScheduler:
+    """
+    Runs index_directory-style jobs on background worker threads.
+
+    Jobs and their progress counters live in a SQLite table so the UI can poll
+    them on each rerun, and every finished file is checkpointed so cancelled
+    or interrupted jobs resume where they stopped instead of starting over.
+    Import jobs checkpoint their connector's high-water-mark cursor instead,
+    so a later sync of the same source only reads what is new.
+    """
+
+    def __init__(self, database_path, max_workers=1, audio_pipeline=None, embed=None,
+                 progress_interval=0.5, index=None, entity_stage=None, batch_size=32,
+                 dedup=None, image_stage=None, governor=None, topics=None, image_index=None,
+                 positional_index=None, embed_duplicates=False):
+        """
+        Args:
+            database_path (str): SQLite file holding the job table
+            max_workers (int): Number of jobs that may run at once
+            audio_pipeline (AudioTranscriptionPipeline, optional): Pipeline for audio files
+            index (SegmentedIndex, optional): Index that receives indexed memories
+            entity_stage (EntityExtractionStage, optional): Adds entities to memories
+            batch_size (int): Parsed memories handed to later stages at a time
+            dedup (NearDuplicateIndex, optional): Marks near-duplicates, which
+                are not embedded again unless embed_duplicates is set
+            image_stage (ImageHashStage, optional): Adds perceptual hashes to images
+            governor (ResourceGovernor, optional): Throttles reads and workers
+                so indexing doesn't slow down interactive search
+            topics (TopicIndex, optional): Assigns new memories to topics
+            image_index (ImageHashIndex, optional): Finds similar images;
+                kept up to date with hashed and deleted memories
+            positional_index (PositionalIndex, optional): Answers phrase,
+                boolean and proximity queries; kept up to date with indexed
+                and deleted memories
+            embed (callable, optional): Returns the embedding stored in the
+                index with each new memory, or None
+            progress_interval (float): Minimum seconds between counter writes
+            embed_duplicates (bool): Embed near-duplicates too, so vector
+                search can still find them
+        """
+        directory = os.path.dirname(database_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(database_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # Job tables created before connectors existed have no source column
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(index_jobs)")}
+        if 'source' not in columns:
+            with self._db:
+                self._db.execute(f"ALTER TABLE index_jobs ADD COLUMN source TEXT NOT NULL DEFAULT '{FILES}'")
+        # Checkpoints used to keep a JSON copy of every memory, which the index already holds
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(index_job_files)")}
+        if 'memory' in columns:
+            with self._db:
+                self._db.execute("ALTER TABLE index_job_files DROP COLUMN memory")
+        self._db_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="index-job")
+        self._cancel_events = {}
+        self.audio_pipeline = audio_pipeline
+        self.embed = embed
+        self.progress_interval = progress_interval
+        self.index = index
+        self.entity_stage = entity_stage
+        self.batch_size = batch_size
+        self.dedup = dedup
+        self.image_stage = image_stage
+        self.governor = governor
+        self.topics = topics
+        self.image_index = image_index
+        self.positional_index = positional_index
+        self.embed_duplicates = embed_duplicates
+
+        # Anything still marked running belongs to a previous process
+        with self._db_lock, self._db:
+            self._db.execute("UPDATE index_jobs SET status = ? WHERE status IN (?, ?)",
+                             (INTERRUPTED, RUNNING, PENDING))
+
+    def _execute(self, sql, params=()):
+        with self._db_lock, self._db:
+            return self._db.execute(sql, params).fetchall()
+
+    def submit(self, directory_path, source=FILES):
+        """
+        Create a job that indexes a directory or imports a source in the background.
+
+        Args:
+            directory_path (str): Directory to index, or the folder or
+                history database a connector imports from
+            source (str): 'files', or a connector source such as 'notes'
+
+        Returns:
+            int: The new job id
+        """
+        with self._db_lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO index_jobs (directory, source, status, created_at) VALUES (?, ?, ?, ?)",
+                (directory_path, source, PENDING, time.time()))
+            job_id = cursor.lastrowid
+        self._start(job_id, directory_path, source)
+        return job_id
+
+    def resume(self, job_id):
+        """
+        Restart a cancelled, failed or interrupted job from its checkpoint.
+
+        Returns:
+            bool: True if the job was restarted
+        """
+        rows = self._execute("SELECT directory, status, source FROM index_jobs WHERE id = ?", (job_id,))
+        if not rows or rows[0][1] not in RESUMABLE:
+            return False
+        self._execute("UPDATE index_jobs SET status = ?, error = NULL, finished_at = NULL WHERE id = ?",
+                      (PENDING, job_id))
+        self._start(job_id, rows[0][0], rows[0][2])
+        return True
+
+    def cancel(self, job_id):
+        """Ask a job to stop after the file it is currently processing."""
+        event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        self._execute("UPDATE index_jobs SET status = ? WHERE id = ? AND status = ?",
+                      (CANCELLED, job_id, PENDING))
+
+    def _start(self, job_id, directory_path, source=FILES):
+        self._cancel_events[job_id] = threading.Event()
+        if source == FILES:
+            self._executor.submit(self._run, job_id, directory_path)
+        else:
+            self._executor.submit(self._run_import, job_id, source, directory_path)
+
+    def _process_batch(self, memories):
+        """
+        Run the later indexing stages over parsed memories and add them to the index.
+
+        Returns:
+            int: Number of memories embedded
+        """
+        embedded = 0
+        with self._worker_slot():
+            if self.entity_stage is not None:
+                self.entity_stage.process(memories)
+            if self.image_stage is not None:
+                self.image_stage.process(memories)
+            for memory in memories:
+                duplicate_of = self.dedup.add_memory(memory) if self.dedup is not None else None
+                if duplicate_of is not None:
+                    memory['duplicate_of'] = duplicate_of
+                if duplicate_of is not None and not self.embed_duplicates:
+                    vector = None
+                else:
+                    vector = self.embed(memory) if self.embed is not None else None
+                    if vector is not None:
+                        embedded += 1
+                if self.index is not None:
+                    self.index.add(memory, vector)
+            if self.topics is not None:
+                self.topics.add(memories)
+            if self.image_index is not None:
+                self.image_index.update(memories)
+            if self.positional_index is not None:
+                self.positional_index.add(memories)
+            if self.audio_pipeline is not None:
+                self.audio_pipeline.submit_pending(memories)
+        return embedded
+
+    def _worker_slot(self):
+        return self.governor.worker_slot() if self.governor is not None else nullcontext()
+
+    def _throttle(self, num_bytes, cancel_event):
+        """Wait for the read limit and any search-latency backoff."""
+        if self.governor is not None:
+            self.governor.throttle_read(num_bytes, cancel_event)
+            self.governor.pause(cancel_event)
+
+    def _run(self, job_id, directory_path):
+        cancel_event = self._cancel_events[job_id]
+        if cancel_event.is_set():
+            return
+
+        # Files that failed in an earlier run are tried again
+        checkpointed = self._execute("SELECT file_path, error FROM index_job_files WHERE job_id = ?", (job_id,))
+        done = {file_path for file_path, error in checkpointed if error is None}
+        failed = {file_path for file_path, error in checkpointed if error is not None}
+        counts = self._execute(
+            "SELECT files_seen, files_parsed, files_embedded, bytes_read FROM index_jobs WHERE id = ?",
+            (job_id,))[0]
+        seen, parsed, embedded, bytes_read = counts
+        run_bytes = 0
+        if self.governor is not None:
+            self.governor.lower_priority()
+        started = time.time()
+        self._execute("UPDATE index_jobs SET status = ?, run_started_at = ?, run_bytes = 0, updated_at = ? "
+                      "WHERE id = ?", (RUNNING, started, started, job_id))
+
+        last_flush = started
+        pending_files = []
+        present = set()
+        batch = []
+
+        def finish_batch():
+            nonlocal embedded
+            if not batch:
+                return
+            embedded += self._process_batch([memory for _, memory in batch])
+            for file_path, _ in batch:
+                pending_files.append((job_id, file_path, None))
+            batch.clear()
+
+        def flush():
+            finish_batch()
+            # Files are only checkpointed once their memories are durable in the index
+            if self.index is not None:
+                self.index.sync()
+            now = time.time()
+            with self._db_lock, self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO index_job_files (job_id, file_path, error) "
+                    "VALUES (?, ?, ?)", pending_files)
+                self._db.execute(
+                    "UPDATE index_jobs SET files_seen = ?, files_parsed = ?, files_embedded = ?, "
+                    "bytes_read = ?, run_bytes = ?, updated_at = ? WHERE id = ?",
+                    (seen, parsed, embedded, bytes_read, run_bytes, now, job_id))
+            pending_files.clear()
+            return now
+
+        status, error = FAILED, None
+        try:
+            if not os.path.isdir(directory_path):
+                raise FileNotFoundError(f"Directory not found: {directory_path}")
+
+            for file_path in iter_files(directory_path):
+                if cancel_event.is_set():
+                    flush()
+                    status = CANCELLED
+                    return
+
+                # Files checkpointed by an earlier run are already counted
+                present.add(file_path)
+                if file_path in done:
+                    continue
+                if file_path not in failed:
+                    seen += 1
+
+                if unchanged_memory(file_path, self.index) is not None:
+                    # Indexed by an earlier job and not modified since
+                    pending_files.append((job_id, file_path, None))
+                    continue
+
+                try:
+                    self._throttle(os.path.getsize(file_path), cancel_event)
+                    with self._worker_slot():
+                        memory = index_file(file_path, self.audio_pipeline, self.index)
+                except Exception as e:
+                    pending_files.append((job_id, file_path, str(e)))
+                else:
+                    parsed += 1
+                    size = memory.get('file_size') or 0
+                    bytes_read += size
+                    run_bytes += size
+                    batch.append((file_path, memory))
+                    if len(batch) >= self.batch_size:
+                        finish_batch()
+
+                if time.time() - last_flush >= self.progress_interval:
+                    last_flush = flush()
+
+            flush()
+            if self.index is not None:
+                for memory_id in self.index.delete_missing(directory_path, present):
+                    if self.dedup is not None:
+                        self.dedup.remove(memory_id)
+                    if self.image_index is not None:
+                        self.image_index.remove(memory_id)
+                    if self.topics is not None:
+                        self.topics.remove(memory_id)
+                    if self.positional_index is not None:
+                        self.positional_index.remove(memory_id)
+                self.index.flush()
+            status = COMPLETED
+        except Exception as e:
+            error = str(e)
+            # Keep the checkpoint for files finished before the failure, if it can still be written
+            batch.clear()
+            try:
+                flush()
+            except Exception:
+                pass
+        finally:
+            # The job never stays running, whatever failed
+            self._finish(job_id, status, error)
+
+    def cursor(self, source, location):
+        """Return the saved import cursor for a source, or None before its first sync."""
+        rows = self._execute("SELECT cursor FROM import_cursors WHERE source = ? AND location = ?",
+                             (source, location))
+        return json.loads(rows[0][0]) if rows else None
+
+    def _run_import(self, job_id, source, location):
+        cancel_event = self._cancel_events[job_id]
+        if cancel_event.is_set():
+            return
+
+        seen, parsed, embedded = self._execute(
+            "SELECT files_seen, files_parsed, files_embedded FROM index_jobs WHERE id = ?", (job_id,))[0]
+        if self.governor is not None:
+            self.governor.lower_priority()
+        started = time.time()
+        self._execute("UPDATE index_jobs SET status = ?, run_started_at = ?, run_bytes = 0, updated_at = ? "
+                      "WHERE id = ?", (RUNNING, started, started, job_id))
+
+        try:
+            from core.connectors import get_connector
+
+            connector = get_connector(source, location)
+            for memories, cursor in connector.iter_batches(self.cursor(source, location), self.batch_size):
+                self._throttle(sum(memory.get('file_size') or 0 for memory in memories), cancel_event)
+                seen += len(memories)
+                embedded += self._process_batch(memories)
+                parsed += len(memories)
+
+                # The cursor only moves past records that are durable in the index
+                if self.index is not None:
+                    self.index.sync()
+                now = time.time()
+                with self._db_lock, self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO import_cursors (source, location, cursor, updated_at) "
+                        "VALUES (?, ?, ?, ?)", (source, location, json.dumps(cursor), now))
+                    self._db.execute(
+                        "UPDATE index_jobs SET files_seen = ?, files_parsed = ?, files_embedded = ?, "
+                        "updated_at = ? WHERE id = ?", (seen, parsed, embedded, now, job_id))
+
+                if cancel_event.is_set():
+                    self._finish(job_id, CANCELLED)
+                    return
+
+            if self.index is not None:
+                self.index.flush()
+            self._finish(job_id, COMPLETED)
+        except Exception as e:
+            self._finish(job_id, FAILED, str(e))
+
+    def _finish(self, job_id, status, error=None):
+        now = time.time()
+        self._execute("UPDATE index_jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+                      (status, error, now, now, job_id))
+
+    def jobs(self):
+        """
+        Return the job table, newest first.
+
+        Returns:
+            list: One dictionary per job with its counters and bytes_per_sec
+        """
+        rows = self._execute(
+            "SELECT id, directory, source, status, files_seen, files_parsed, files_embedded, bytes_read, "
+            "run_bytes, created_at, run_started_at, updated_at, finished_at, error "
+            "FROM index_jobs ORDER BY id DESC")
+        jobs = []
+        for (job_id, directory, source, status, seen, parsed, embedded, bytes_read,
+             run_bytes, created_at, run_started_at, updated_at, finished_at, error) in rows:
+            elapsed = (updated_at or 0) - (run_started_at or 0)
+            jobs.append({
+                'id': job_id,
+                'directory': directory,
+                'source': source,
+                'status': status,
+                'files_seen': seen,
+                'files_parsed': parsed,
+                'files_embedded': embedded,
+                'bytes_read': bytes_read,
+                'bytes_per_sec': run_bytes / elapsed if elapsed > 0 else 0.0,
+                'created_at': datetime.fromtimestamp(created_at),
+                'finished_at': datetime.fromtimestamp(finished_at) if finished_at else None,
+                'error': error,
+            })
+        return jobs
+
+    def active_jobs(self):
+        return [job for job in self.jobs() if job['status'] in (PENDING, RUNNING)]
+
+    def shutdown(self, wait=True):
+        for event in self._cancel_events.values():
+            event.set()
+        self._executor.shutdown(wait=wait)
+        self._db.close()
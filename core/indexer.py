@@ -1,102 +1,243 @@
 import os
-import json
+import time
 import pandas as pd
 from datetime import datetime
-from core.document_parser import parse_document
-from core.image_analyzer import analyze_image
+from core.segments import SegmentedIndex
+from core.replication import ChangeLog
+from config import (SEGMENTS_DIR, SNAPSHOT_COMPRESS_CONTENT, SEGMENT_FLUSH_THRESHOLD,
+                    SEGMENT_MERGE_FACTOR, SEGMENT_MAX_COUNT, CHANGESET_DIR, CHANGESET_RETAIN,
+                    JOURNAL_SYNC_INTERVAL, JOURNAL_SYNC_RECORDS)
 import hashlib
 
-def index_directory(directory_path, allowed_extensions=None):
+DEFAULT_EXTENSIONS = [
+    # Documents
+    '.txt', '.pdf', '.docx', '.doc', '.md', '.rtf',
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp',
+    # Audio
+    '.mp3', '.wav', '.m4a', '.ogg', '.flac',
+    # Other
+    '.html', '.csv', '.json'
+]
+
+def iter_files(directory_path, allowed_extensions=None):
+    """
+    Walk a directory in a stable order and yield the files to index.
+
+    Args:
+        directory_path (str): Path to the directory to index
+        allowed_extensions (list, optional): List of file extensions to include
+
+    Yields:
+        str: Path of each file with an allowed extension
+    """
+    if allowed_extensions is None:
+        allowed_extensions = DEFAULT_EXTENSIONS
+
+    for root, dirs, files in os.walk(directory_path):
+        # Sort so interrupted runs can be resumed in the same order
+        dirs.sort()
+        for file in sorted(files):
+            file_ext = os.path.splitext(file)[1].lower()
+
+            # Skip if not an allowed extension
+            if file_ext not in allowed_extensions:
+                continue
+
+            yield os.path.join(root, file)
+
+def file_memory_id(file_path):
+    """Return the id of the memory indexed from a file."""
+    return hashlib.md5(file_path.encode()).hexdigest()
+
+def file_stat(file_path):
+    """Return a file's modification timestamp and size, falling back to now and 0."""
+    try:
+        mod_time = os.path.getmtime(file_path)
+    except:
+        mod_time = time.time()
+
+    try:
+        file_size = os.path.getsize(file_path)
+    except:
+        file_size = 0
+
+    return mod_time, file_size
+
+def unchanged_memory(file_path, index, stat=None):
+    """
+    Return a file's memory from the index if the file hasn't changed since.
+
+    Args:
+        file_path (str): Path to the file
+        index (SegmentedIndex): Index holding earlier versions, or None
+        stat (tuple, optional): The file's (modification timestamp, size), if already known
+
+    Returns:
+        dict: The indexed memory, or None if the file is new or changed
+    """
+    if index is None:
+        return None
+    previous = index.get(file_memory_id(file_path))
+    if previous is None:
+        return None
+    mod_time, file_size = stat or file_stat(file_path)
+    if (previous.get('file_mtime'), previous.get('file_size')) != (mod_time, file_size):
+        return None
+    return previous
+
+def index_file(file_path, audio_pipeline=None, index=None):
+    """
+    Build the memory for a single file.
+
+    Args:
+        file_path (str): Path to the file
+        audio_pipeline (AudioTranscriptionPipeline, optional): Pipeline that
+            will transcribe audio files; they are marked as pending
+        index (SegmentedIndex, optional): Index holding earlier versions; an
+            audio file that hasn't changed since keeps its transcription status
+
+    Returns:
+        dict: The indexed memory
+    """
+    file = os.path.basename(file_path)
+    file_ext = os.path.splitext(file)[1].lower()
+
+    mod_time, file_size = file_stat(file_path)
+    file_id = file_memory_id(file_path)
+
+    # Determine file type and process accordingly
+    # Parsers are imported on first use, so listing files and opening the
+    # index don't need them
+    if file_ext in ['.txt', '.pdf', '.docx', '.doc', '.md', '.rtf']:
+        from core.document_parser import parse_document
+        memory = parse_document(file_path)
+        memory_type = 'document'
+    elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
+        from core.image_analyzer import analyze_image
+        memory = analyze_image(file_path)
+        memory_type = 'image'
+    elif file_ext in ['.mp3', '.wav', '.m4a', '.ogg', '.flac']:
+        # Transcripts are produced separately by the audio pipeline
+        memory = {
+            'title': file,
+            'content': f"Audio file: {file}"
+        }
+        memory_type = 'audio'
+    else:
+        # For other files, just create a basic memory
+        memory = {
+            'title': file,
+            'content': f"File: {file}"
+        }
+        memory_type = 'document'
+
+    # Add common metadata
+    memory.update({
+        'id': file_id,
+        'file_path': file_path,
+        'file_name': file,
+        'file_extension': file_ext,
+        'file_size': file_size,
+        # Kept apart from the date, which connectors may set from metadata
+        'file_mtime': mod_time,
+        'date': datetime.fromtimestamp(mod_time),
+        'type': memory_type,
+        'source': 'local_file'
+    })
+
+    # Audio is queued for background transcription once it is in the index
+    if memory_type == 'audio' and audio_pipeline is not None:
+        previous = unchanged_memory(file_path, index, (mod_time, file_size))
+        status = previous.get('transcription_status') if previous is not None else None
+        if status in (None, 'running'):
+            # New, changed, or interrupted while it was being transcribed
+            status = 'pending'
+        memory['transcription_status'] = status
+
+    return memory
+
+def _add_batch(batch, index, entity_stage, image_stage=None, topics=None, audio_pipeline=None, embed=None):
+    """Run the later indexing stages over a batch and add it to the index."""
+    if batch and entity_stage is not None:
+        entity_stage.process(batch)
+    if batch and image_stage is not None:
+        image_stage.process(batch)
+    for memory in batch:
+        index.add(memory, embed(memory) if embed is not None else None)
+    if batch and topics is not None:
+        topics.add(batch)
+    if batch and audio_pipeline is not None:
+        audio_pipeline.submit_pending(batch)
+    return batch
+
+def open_index():
+    """Open the on-disk segmented memory index with the configured settings."""
+    changelog = ChangeLog(CHANGESET_DIR, retain=CHANGESET_RETAIN) if CHANGESET_DIR else None
+    return SegmentedIndex(SEGMENTS_DIR, flush_threshold=SEGMENT_FLUSH_THRESHOLD,
+                          merge_factor=SEGMENT_MERGE_FACTOR, max_segments=SEGMENT_MAX_COUNT,
+                          compress_content=SNAPSHOT_COMPRESS_CONTENT, changelog=changelog,
+                          sync_interval=JOURNAL_SYNC_INTERVAL, sync_records=JOURNAL_SYNC_RECORDS)
+
+def index_directory(directory_path, allowed_extensions=None, audio_pipeline=None, index=None,
+                    entity_stage=None, image_stage=None, governor=None, topics=None, embed=None):
     """
     Index files in a directory and add them to the memory database.
-    
+
+    Files that haven't changed since they were indexed are skipped, and
+    files that were indexed from this directory before but no longer exist
+    are deleted from the index.
+
     Args:
         directory_path (str): Path to the directory to index
         allowed_extensions (list, optional): List of file extensions to include
-        
+        audio_pipeline (AudioTranscriptionPipeline, optional): Pipeline that
+            transcribes audio files in the background
+        index (SegmentedIndex, optional): Index to write to; the configured
+            on-disk index is opened and closed when omitted
+        entity_stage (EntityExtractionStage, optional): Adds entities to
+            memories in batches
+        image_stage (ImageHashStage, optional): Adds perceptual hashes to
+            image memories in batches
+        governor (ResourceGovernor, optional): Throttles reads and backs off
+            while interactive search is slow
+        topics (TopicIndex, optional): Assigns new memories to topics
+        embed (callable, optional): Returns the embedding stored in the
+            index with each memory, or None
+
     Returns:
         list: List of indexed memories
     """
     if not os.path.exists(directory_path):
         return []
-        
-    if allowed_extensions is None:
-        allowed_extensions = [
-            # Documents
-            '.txt', '.pdf', '.docx', '.doc', '.md', '.rtf',
-            # Images
-            '.jpg', '.jpeg', '.png', '.gif', '.bmp',
-            # Audio
-            '.mp3', '.wav', '.m4a', '.ogg', '.flac',
-            # Other
-            '.html', '.csv', '.json'
-        ]
-    
+
+    owns_index = index is None
+    if owns_index:
+        index = open_index()
+
     memories = []
-    
-    # Walk through the directory
-    for root, _, files in os.walk(directory_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            # Skip if not an allowed extension
-            if file_ext not in allowed_extensions:
-                continue
-                
-            # Get file modification time
-            try:
-                mod_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-            except:
-                mod_time = datetime.now()
-                
-            # Get file size
-            try:
-                file_size = os.path.getsize(file_path)
-            except:
-                file_size = 0
-            
-            # Generate a unique ID for the file
-            file_id = hashlib.md5(file_path.encode()).hexdigest()
-            
-            # Determine file type and process accordingly
-            if file_ext in ['.txt', '.pdf', '.docx', '.doc', '.md', '.rtf']:
-                memory = parse_document(file_path)
-                memory_type = 'document'
-            elif file_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp']:
-                memory = analyze_image(file_path)
-                memory_type = 'image'
-            elif file_ext in ['.mp3', '.wav', '.m4a', '.ogg', '.flac']:
-                # For now, just create a simple audio memory
-                memory = {
-                    'title': file,
-                    'content': f"Audio file: {file}"
-                }
-                memory_type = 'audio'
-            else:
-                # For other files, just create a basic memory
-                memory = {
-                    'title': file,
-                    'content': f"File: {file}"
-                }
-                memory_type = 'document'
-            
-            # Add common metadata
-            memory.update({
-                'id': file_id,
-                'file_path': file_path,
-                'file_name': file,
-                'file_extension': file_ext,
-                'file_size': file_size,
-                'date': mod_time,
-                'type': memory_type,
-                'source': 'local_file'
-            })
-            
-            memories.append(memory)
-    
-    # Save the memories to a sample file for demo purposes
-    with open('data/sample_memories.json', 'w') as f:
-        json.dump(memories, f)
-    
-    return memories
\ No newline at end of file
+    batch = []
+    stages = [stage for stage in (entity_stage, image_stage) if stage is not None]
+    batch_size = max([stage.batch_size for stage in stages], default=1)
+    for file_path in iter_files(directory_path, allowed_extensions):
+        if governor is not None:
+            governor.throttle_read(os.path.getsize(file_path))
+            governor.pause()
+        previous = unchanged_memory(file_path, index)
+        if previous is not None:
+            # Already indexed as it is
+            memories.append(previous)
+            continue
+        batch.append(index_file(file_path, audio_pipeline, index))
+        if len(batch) >= batch_size:
+            memories.extend(_add_batch(batch, index, entity_stage, image_stage, topics, audio_pipeline, embed))
+            batch = []
+    memories.extend(_add_batch(batch, index, entity_stage, image_stage, topics, audio_pipeline, embed))
+
+    index.delete_missing(directory_path, {memory['file_path'] for memory in memories})
+    index.flush()
+
+    if owns_index:
+        index.close()
+
+    return memories
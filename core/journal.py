@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import zlib
+import struct
+import threading
+from core.snapshot import json_default, json_object_hook
+
+# A journal is a sequence of records, each one
+#
+#   header   payload length and CRC-32 of the payload, little-endian uint32s
+#   payload  one JSON-encoded entry
+#
+# A crash can leave the last record half written; replay stops at the first
+# record that is short or fails its checksum.
+
+_RECORD = struct.Struct('<II')
+
+class Journal:
+    """
+    Append-only write-ahead log.
+
+    Appends are buffered and fsynced in groups, once sync_records entries
+    are waiting or sync_interval seconds have passed since the last fsync,
+    so a burst of writes costs one fsync rather than one each. When no
+    append follows, a timer fsyncs the waiting entries once sync_interval
+    is up. sync() makes everything appended so far durable; callers
+    checkpoint progress elsewhere only after it returns.
+    """
+
+    def __init__(self, path, sync_interval=0.2, sync_records=256):
+        """
+        Args:
+            path (str): Journal file, appended to if it exists
+            sync_interval (float): Longest time in seconds an entry waits for fsync
+            sync_records (int): Entries that trigger an fsync on their own
+        """
+        self.path = path
+        self.sync_interval = sync_interval
+        self.sync_records = sync_records
+        self._file = open(path, 'ab')
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        """Add an entry, fsyncing if the group commit is due."""
+        payload = json.dumps(entry, default=json_default).encode('utf-8')
+        with self._lock:
+            self._file.write(_RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._unsynced += 1
+            waited = time.monotonic() - self._last_sync
+            if self._unsynced >= self.sync_records or waited >= self.sync_interval:
+                self._sync()
+            elif self._timer is None:
+                # A pending timer fires within sync_interval and covers this entry too
+                self._timer = threading.Timer(self.sync_interval - waited, self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _timed_sync(self):
+        with self._lock:
+            self._timer = None
+            if not self._file.closed:
+                self._sync()
+
+    def sync(self):
+        """Write and fsync every entry appended so far."""
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self, remove=False):
+        """
+        Sync and close the journal.
+
+        Args:
+            remove (bool): Delete the file, once what it holds is stored elsewhere
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+def read_journal(path):
+    """
+    Read the entries of a journal file.
+
+    Returns:
+        list: Entries in the order they were appended, up to the first torn
+            or corrupt record
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    entries = []
+    offset = 0
+    while offset + _RECORD.size <= len(data):
+        length, checksum = _RECORD.unpack_from(data, offset)
+        start = offset + _RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            break
+        entries.append(json.loads(payload, object_hook=json_object_hook))
+        offset = start + length
+    return entries
@@ -0,0 +1,229 @@
+import os
+import re
+import mmap
+import time
+import hashlib
+import threading
+from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from core.indexer import iter_files
+from core.topk import tokenize
+
+# Files whose raw bytes are their text; other formats need a parser and wait
+# for the next indexing run
+TEXT_EXTENSIONS = ('.txt', '.md', '.csv', '.json', '.html', '.rtf')
+
+_OPERATOR = re.compile(r'\b(?:AND|OR|NOT|NEAR(?:/\d+)?)\b')
+_QUERY_WORD = re.compile(r'-?\w+')
+
+def query_terms(query):
+    """
+    Return the words a live scan looks for.
+
+    Boolean operators, NEAR/n and -excluded words are dropped, so live hits
+    match any remaining word of structured queries too.
+    """
+    words = _QUERY_WORD.findall(_OPERATOR.sub(' ', query or ''))
+    return list(dict.fromkeys(word.lower() for word in words if not word.startswith('-')))
+
+@lru_cache(maxsize=32)
+def pattern_matcher(terms):
+    """
+    Compile terms into one case-insensitive bytes pattern.
+
+    The regex engine finds every term in a single pass over the data.
+    Terms only match as whole words, as in keyword_score.
+    """
+    terms = sorted(terms, key=len, reverse=True)
+    return re.compile(rb'\b(?:' + b'|'.join(re.escape(term.encode('utf-8')) for term in terms) + rb')\b',
+                      re.IGNORECASE)
+
+def scan_file(path, terms, max_bytes=None, content_chars=2000, snippet_bytes=240):
+    """
+    Count the occurrences of terms in a file's raw bytes.
+
+    The file is memory-mapped, so the scan reads it straight from the page
+    cache without copying it into Python strings.
+
+    Args:
+        path (str): File to scan
+        terms (tuple): Lowercase terms
+        max_bytes (int, optional): Only scan this many bytes from the start
+        content_chars (int): Characters from the start of the file to return as content
+        snippet_bytes (int): Bytes around the first match to return as a snippet
+
+    Returns:
+        dict: counts per term, content and snippet, or None if nothing matched
+    """
+    matcher = pattern_matcher(terms)
+    try:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                end = min(size, max_bytes) if max_bytes else size
+                counts = {}
+                first = None
+                for match in matcher.finditer(data, 0, end):
+                    term = match.group().lower().decode('utf-8', 'replace')
+                    counts[term] = counts.get(term, 0) + 1
+                    if first is None:
+                        first = match.start()
+                if not counts:
+                    return None
+                start = max(first - snippet_bytes // 3, 0)
+                snippet = data[start:start + snippet_bytes].decode('utf-8', 'replace')
+                content = data[:content_chars * 4].decode('utf-8', 'replace')[:content_chars]
+    except (OSError, ValueError):
+        return None
+
+    snippet = re.sub(r'\b(?:' + '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r')\b',
+                     lambda match: f"**{match.group()}**", snippet, flags=re.IGNORECASE)
+    return {
+        'counts': counts,
+        'content': content,
+        'snippet': ('...' if start > 0 else '') + snippet + ('...' if start + snippet_bytes < size else ''),
+    }
+
+def _scan_batch(paths, terms, max_bytes):
+    return [scan_file(path, terms, max_bytes) for path in paths]
+
+def indexed_file_times(memories):
+    """Return {file path: modification timestamp when indexed} for memories indexed from files."""
+    times = {}
+    for memory in memories:
+        path = memory.get('file_path')
+        # Not the date, which may be when a photo was taken or a note was written
+        mtime = memory.get('file_mtime')
+        if path and mtime is not None:
+            times[path] = mtime
+    return times
+
+class LiveScanner:
+    """
+    Searches files that changed since they were last indexed.
+
+    Files under the watched directories that are missing from the index,
+    or modified after their indexed copy, are scanned directly. Batches of
+    files are scanned on a process pool; with workers=0, everything runs in
+    the calling process. Hits are scored like keyword search, 10 per title
+    match and 2 per content occurrence, so they rank alongside indexed
+    results.
+    """
+
+    def __init__(self, workers=2, batch_size=16, max_file_bytes=64 * 1024 * 1024, refresh_interval=2.0,
+                 extensions=TEXT_EXTENSIONS):
+        """
+        Args:
+            workers (int): Scanning processes; 0 scans inline
+            batch_size (int): Files handed to a worker at a time
+            max_file_bytes (int): Bytes scanned per file
+            refresh_interval (float): Seconds a directory listing is reused
+            extensions (tuple): File extensions that are scanned
+        """
+        self.batch_size = batch_size
+        self.max_file_bytes = max_file_bytes
+        self.refresh_interval = refresh_interval
+        self.extensions = extensions
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def changed_files(self, directories, indexed):
+        """
+        List the scannable files that the index doesn't have up to date.
+
+        Args:
+            directories (list): Directories to look in
+            indexed (dict): {file path: modification timestamp} of indexed files
+
+        Returns:
+            list: (path, size, modification timestamp) tuples
+        """
+        key = tuple(sorted(directories))
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached is None or time.monotonic() - cached[0] >= self.refresh_interval:
+            cached = (time.monotonic(), self._list_files(key))
+            with self._lock:
+                self._listings[key] = cached
+
+        # Indexed dates are modification times, which survive the round trip to the microsecond
+        return [(path, size, mtime) for path, size, mtime in cached[1]
+                if path not in indexed or mtime > indexed[path] + 1e-3]
+
+    def _list_files(self, directories):
+        files = []
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            for path in iter_files(directory, self.extensions):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((path, stat.st_size, stat.st_mtime))
+        return files
+
+    def search(self, query, directories, indexed, top_k=10):
+        """
+        Scan changed files for the words of a query.
+
+        Args:
+            query (str): The search query
+            directories (list): Directories to look in
+            indexed (dict): {file path: modification timestamp} of indexed files
+            top_k (int): Number of hits to return
+
+        Returns:
+            tuple: (list of (memory, score) pairs, best first, {memory id: snippet})
+        """
+        terms = tuple(query_terms(query))
+        files = self.changed_files(directories, indexed) if terms else []
+        if not files:
+            return [], {}
+
+        paths = [path for path, _, _ in files]
+        batches = [paths[i:i + self.batch_size] for i in range(0, len(paths), self.batch_size)]
+        if self._pool is not None:
+            results = [result for batch in self._pool.map(_scan_batch, batches, [terms] * len(batches),
+                                                          [self.max_file_bytes] * len(batches))
+                       for result in batch]
+        else:
+            results = _scan_batch(paths, terms, self.max_file_bytes)
+
+        hits = []
+        snippets = {}
+        for (path, size, mtime), result in zip(files, results):
+            if result is None:
+                continue
+            name = os.path.basename(path)
+            memory = {
+                # Same id the indexer will give the file, so its indexed copy replaces this one
+                'id': hashlib.md5(path.encode()).hexdigest(),
+                'title': name,
+                'content': result['content'],
+                'file_path': path,
+                'file_name': name,
+                'file_extension': os.path.splitext(name)[1].lower(),
+                'file_size': size,
+                'file_mtime': mtime,
+                'date': datetime.fromtimestamp(mtime),
+                'type': 'document',
+                'source': 'live_scan',
+            }
+            name_tokens = set(tokenize(name))
+            score = sum(10 for term in terms if term in name_tokens) + 2 * sum(result['counts'].values())
+            hits.append((memory, score))
+            snippets[memory['id']] = result['snippet']
+
+        hits.sort(key=lambda hit: -hit[1])
+        hits = hits[:top_k]
+        kept = {memory['id'] for memory, _ in hits}
+        return hits, {memory_id: snippet for memory_id, snippet in snippets.items() if memory_id in kept}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
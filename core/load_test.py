@@ -0,0 +1,367 @@
+import time
+import tempfile
+import threading
+from collections import defaultdict
+import numpy as np
+from core import views
+from core import serach_engine
+from core.autocomplete import Autocomplete
+from core.encoders import get_encoder
+from core.governor import ResourceGovernor
+from core.memory_budget import process_rss
+from core.near_duplicates import NearDuplicateIndex
+from core.positional_index import PositionalIndex
+from core.segments import SegmentedIndex
+from core.synthetic import TOPICS, TITLES, PEOPLE, LOCATIONS, iter_corpus, generate_chunk
+
+# Each simulated session runs in its own thread, as Streamlit runs each
+# browser session's script in its own thread of one server process. A
+# session holds its own memory list, as st.session_state does, while the
+# search model, score cache, autocomplete, dedup index, positional index and
+# memory index are shared the way st.cache_resource and module globals share
+# them in the app.
+#
+# View models are called uncached, which is what every session sees after
+# its results or filters change.
+
+OPERATIONS = ('search', 'structured', 'semantic', 'suggest', 'timeline', 'connections', 'analytics', 'index')
+
+DEFAULT_MIX = {
+    'search': 0.3,
+    'structured': 0.1,
+    'semantic': 0.1,
+    'suggest': 0.25,
+    'timeline': 0.1,
+    'connections': 0.05,
+    'analytics': 0.05,
+    'index': 0.05,
+}
+
+def _queries():
+    words = [word.lower() for text in TITLES + TOPICS for word in text.split() if word.isalpha()]
+    plain = words + [topic for topic in TOPICS] + [title.lower() for title in TITLES]
+    structured = ([f'"{topic}"' for topic in TOPICS]
+                  + [f"{word} -{other}" for word, other in zip(words, reversed(words))]
+                  + [f"{person.split()[0]} NEAR/5 {location.split()[0]}" for person, location in zip(PEOPLE, LOCATIONS)])
+    return plain, structured
+
+def parse_mix(text):
+    """Parse 'search=0.5,suggest=0.3' into a normalised operation mix."""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+class InstrumentedLock:
+    """
+    Lock wrapper that counts acquisitions and the time spent waiting.
+
+    An acquisition is contended when the lock was already held and the
+    caller had to block for it.
+    """
+
+    def __init__(self, name, lock=None):
+        self.name = name
+        self._lock = lock if lock is not None else threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+        self.max_wait = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+        started = time.perf_counter()
+        acquired = self._lock.acquire(True, timeout)
+        if acquired:
+            # Counters are only updated while holding the lock
+            waited = time.perf_counter() - started
+            self.acquisitions += 1
+            self.contended += 1
+            self.wait_seconds += waited
+            self.max_wait = max(self.max_wait, waited)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'contention_rate': self.contended / self.acquisitions if self.acquisitions else 0.0,
+            'wait_seconds': self.wait_seconds,
+            'max_wait': self.max_wait,
+        }
+
+def instrument_locks(objects):
+    """
+    Swap the _lock of each shared object for an InstrumentedLock.
+
+    Must be called before any thread uses the objects.
+
+    Args:
+        objects (dict): Name -> object with a _lock attribute
+
+    Returns:
+        list: The InstrumentedLocks installed
+    """
+    locks = []
+    for name, obj in objects.items():
+        lock = getattr(obj, '_lock', None)
+        if lock is None or isinstance(lock, InstrumentedLock):
+            continue
+        obj._lock = InstrumentedLock(name, lock)
+        locks.append(obj._lock)
+    return locks
+
+class SharedState:
+    """The objects every session shares, as st.cache_resource shares them in the app."""
+
+    def __init__(self, corpus, directory):
+        self.dedup = NearDuplicateIndex()
+        self.autocomplete = Autocomplete()
+        self.autocomplete.add(corpus)
+        self.positional_index = PositionalIndex(corpus)
+        self.governor = ResourceGovernor()
+        self.index = SegmentedIndex(directory)
+        self.score_cache = serach_engine.score_cache
+        self.next_id = len(corpus)
+        self._id_lock = threading.Lock()
+
+    def reserve_ids(self, count):
+        with self._id_lock:
+            start = self.next_id
+            self.next_id += count
+        return start
+
+    def lockables(self):
+        return {
+            'score_cache.queries': self.score_cache.queries,
+            'score_cache.embeddings': self.score_cache.embeddings,
+            'autocomplete': self.autocomplete,
+            'autocomplete.phrases': self.autocomplete.phrases,
+            'autocomplete.words': self.autocomplete.words,
+            'governor': self.governor,
+            'governor.latency': self.governor.latency,
+            'memory_index': self.index,
+            'positional_index': self.positional_index,
+        }
+
+class SimulatedSession:
+    """One user: picks operations from the mix and thinks between them."""
+
+    def __init__(self, session_id, corpus, shared, mix, think_time, seed, index_batch=50):
+        self.session_id = session_id
+        self.shared = shared
+        self.think_time = think_time
+        self.index_batch = index_batch
+        self.rng = np.random.default_rng([seed, session_id])
+        self.operations = list(mix)
+        weights = np.array([mix[name] for name in self.operations], dtype=float)
+        self.probabilities = weights / weights.sum()
+        self.plain_queries, self.structured_queries = _queries()
+
+        # Per-session state, as st.session_state holds it
+        self.memories = list(corpus)
+        self.results = self.memories
+        self.snippets = {}
+
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def _query(self, structured=False):
+        queries = self.structured_queries if structured else self.plain_queries
+        return queries[self.rng.integers(len(queries))]
+
+    def _search(self, query):
+        started = time.perf_counter()
+        self.results, self.snippets = views.run_search(query, self.memories, self.shared.positional_index,
+                                                       dedup=self.shared.dedup)
+        self.shared.governor.record_query_latency(time.perf_counter() - started)
+        self.shared.autocomplete.record_query(query)
+
+    def run_operation(self, name):
+        if name == 'search':
+            self._search(self._query())
+        elif name == 'structured':
+            self._search(self._query(structured=True))
+        elif name == 'semantic':
+            self.results = serach_engine.search_memories(self._query(), self.memories)
+        elif name == 'suggest':
+            # One lookup per keystroke of a query
+            query = self._query()
+            for end in range(1, len(query) + 1):
+                self.shared.autocomplete.suggest(query[:end])
+        elif name == 'timeline':
+            views.timeline_view_model(self.results, self.snippets)
+        elif name == 'connections':
+            views.connections_view_model(self.results)
+        elif name == 'analytics':
+            views.analytics_view_model(self.results)
+        elif name == 'index':
+            start = self.shared.reserve_ids(self.index_batch)
+            end_date = max(memory['date'] for memory in self.memories[:100])
+            batch = generate_chunk(self.rng, start, self.index_batch, end_date.replace(year=end_date.year - 1),
+                                   end_date)
+            for memory in batch:
+                self.shared.index.add(memory)
+            self.shared.autocomplete.add(batch)
+            self.shared.positional_index.add(batch)
+            self.memories = self.memories + batch
+        else:
+            raise ValueError(f"Unknown operation: {name}")
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            name = self.operations[self.rng.choice(len(self.operations), p=self.probabilities)]
+            started = time.perf_counter()
+            try:
+                self.run_operation(name)
+                self.latencies[name].append(time.perf_counter() - started)
+            except Exception:
+                self.errors[name] += 1
+            if self.think_time:
+                stop_event.wait(self.rng.exponential(self.think_time))
+
+def _summary(latencies):
+    values = np.asarray(latencies)
+    return {
+        'count': len(values),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+def run_load_test(sessions=8, duration=30.0, corpus_size=2000, mix=None, think_time=0.5, seed=0,
+                  backend=None, directory=None):
+    """
+    Drive the search and view-model code paths from many concurrent sessions.
+
+    Args:
+        sessions (int): Number of simulated sessions
+        duration (float): Seconds to run for
+        corpus_size (int): Synthetic memories each session starts with
+        mix (dict, optional): Operation name -> relative weight; DEFAULT_MIX by default
+        think_time (float): Mean seconds a session waits between operations
+        seed (int): Random seed for the corpus and every session
+        backend (str, optional): Embedding backend for semantic search, e.g. "hash";
+            the app's configured model when omitted
+        directory (str, optional): Index directory for indexed memories; a temporary one by default
+
+    Returns:
+        dict: Throughput, latency percentiles per operation, RSS and lock contention
+    """
+    mix = mix or DEFAULT_MIX
+    if backend is not None:
+        serach_engine.model = get_encoder(backend)
+
+    corpus = next(iter_corpus(corpus_size, corpus_size, seed))
+    temp_directory = None
+    if directory is None:
+        temp_directory = tempfile.TemporaryDirectory()
+        directory = temp_directory.name
+
+    try:
+        shared = SharedState(corpus, directory)
+        locks = instrument_locks(shared.lockables())
+
+        # Sessions are built one at a time so their memory can be measured
+        rss_before = process_rss()
+        simulated = [SimulatedSession(i, corpus, shared, mix, think_time, seed) for i in range(sessions)]
+        rss_sessions = process_rss()
+
+        stop_event = threading.Event()
+        threads = [threading.Thread(target=session.run, args=(stop_event,), daemon=True,
+                                    name=f"session-{session.session_id}")
+                   for session in simulated]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        stop_event.wait(duration)
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        rss_after = process_rss()
+        shared.index.close()
+    finally:
+        if temp_directory is not None:
+            temp_directory.cleanup()
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for session in simulated:
+        for name, values in session.latencies.items():
+            latencies[name].extend(values)
+        for name, count in session.errors.items():
+            errors[name] += count
+    total = sum(len(values) for values in latencies.values())
+
+    per_session = None
+    if rss_before is not None and rss_sessions is not None:
+        per_session = (rss_sessions - rss_before) / max(sessions, 1)
+    return {
+        'sessions': sessions,
+        'seconds': elapsed,
+        'operations': total,
+        'throughput': total / elapsed if elapsed > 0 else 0.0,
+        'latency': {name: _summary(values) for name, values in sorted(latencies.items()) if values},
+        'all': _summary([value for values in latencies.values() for value in values]) if total else None,
+        'errors': dict(errors),
+        'rss_per_session': per_session,
+        'rss_total': rss_after,
+        'locks': sorted((lock.stats() for lock in locks), key=lambda stats: -stats['wait_seconds']),
+    }
+
+def format_report(report):
+    """Format a run_load_test report as text."""
+    lines = [f"{report['sessions']} sessions, {report['operations']} operations in {report['seconds']:.1f}s "
+             f"({report['throughput']:.1f} ops/s)"]
+    if report['rss_per_session'] is not None:
+        lines.append(f"RSS {report['rss_total'] / 2**20:.0f} MiB, {report['rss_per_session'] / 2**20:.1f} MiB per session")
+    lines.append("")
+    lines.append(f"{'operation':<12} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}")
+    rows = list(report['latency'].items()) + ([('all', report['all'])] if report['all'] else [])
+    for name, summary in rows:
+        errors = report['errors'].get(name, 0) if name != 'all' else sum(report['errors'].values())
+        lines.append(f"{name:<12} {summary['count']:>7} {summary['p50'] * 1000:>9.1f} {summary['p95'] * 1000:>9.1f} "
+                     f"{summary['p99'] * 1000:>9.1f} {summary['max'] * 1000:>9.1f} {errors:>7}")
+    lines.append("")
+    lines.append(f"{'shared lock':<24} {'acquired':>9} {'contended':>10} {'wait ms':>9} {'max ms':>9}")
+    for stats in report['locks']:
+        lines.append(f"{stats['name']:<24} {stats['acquisitions']:>9} {stats['contention_rate']:>9.1%} "
+                     f"{stats['wait_seconds'] * 1000:>9.1f} {stats['max_wait'] * 1000:>9.1f}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate many concurrent app sessions")
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--corpus', type=int, default=2000, help="Memories per session")
+    parser.add_argument('--think-time', type=float, default=0.5, help="Mean seconds between operations")
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help="Operation weights, e.g. search=0.5,suggest=0.3,timeline=0.2")
+    parser.add_argument('--backend', default=None, help="Embedding backend for semantic search, e.g. hash")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(format_report(run_load_test(args.sessions, args.duration, args.corpus, args.mix, args.think_time,
+                                      args.seed, args.backend)))
@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+from config import MEMORY_BUDGET_MB
+
+def process_rss():
+    """Return the resident set size of this process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        return None
+
+class MemoryBudget:
+    """
+    Holds registered caches and vector stores to a byte budget.
+
+    Each consumer reports its footprint with memory_usage() and can give
+    memory back with shrink(target_bytes), by evicting entries or spilling
+    to disk. When the total exceeds the budget, consumers are shrunk in
+    priority order, lowest first, until the total is back under the low
+    watermark, so eviction isn't triggered again by the next small
+    addition. Caches that are cheap to rebuild should get low priorities
+    and data that is slow to reload high ones.
+    """
+
+    def __init__(self, limit_bytes=None, low_watermark=0.9):
+        """
+        Args:
+            limit_bytes (int, optional): Budget for the registered consumers; None disables it
+            low_watermark (float): Fraction of the budget to shrink down to
+        """
+        self.limit_bytes = limit_bytes
+        self.low_watermark = low_watermark
+        self.evictions = {}
+        self._consumers = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, consumer, priority=0):
+        """
+        Track a consumer's memory.
+
+        Args:
+            name (str): Name shown in usage reports
+            consumer: Object with memory_usage() and shrink(target_bytes) methods
+            priority (int): Shrink order; lower priorities are shrunk first
+        """
+        with self._lock:
+            self._consumers[name] = (priority, consumer)
+            self.evictions.setdefault(name, 0)
+
+    def usage(self):
+        """Return {consumer name: bytes} for every registered consumer."""
+        with self._lock:
+            consumers = dict(self._consumers)
+        return {name: consumer.memory_usage() for name, (_, consumer) in consumers.items()}
+
+    def enforce(self):
+        """
+        Shrink consumers if the budget is exceeded.
+
+        Returns:
+            int: Bytes freed
+        """
+        if not self.limit_bytes:
+            return 0
+        usage = self.usage()
+        total = sum(usage.values())
+        if total <= self.limit_bytes:
+            return 0
+
+        target = int(self.limit_bytes * self.low_watermark)
+        freed = 0
+        with self._lock:
+            consumers = sorted(self._consumers.items(), key=lambda item: item[1][0])
+        for name, (_, consumer) in consumers:
+            excess = total - freed - target
+            if excess <= 0:
+                break
+            released = consumer.shrink(max(usage[name] - excess, 0))
+            if released:
+                freed += released
+                self.evictions[name] += 1
+        return freed
+
+    def status(self):
+        """Return the budget, tracked usage per consumer and process RSS."""
+        usage = self.usage()
+        return {
+            'limit': self.limit_bytes,
+            'used': sum(usage.values()),
+            'consumers': usage,
+            'evictions': dict(self.evictions),
+            'rss': process_rss(),
+        }
+
+# Shared by the search core, caches and the app
+memory_budget = MemoryBudget(MEMORY_BUDGET_MB * 2**20 if MEMORY_BUDGET_MB else None)
@@ -0,0 +1,281 @@
+import re
+import zlib
+import hashlib
+import threading
+import numpy as np
+from core.score_cache import LRUCache
+from core.memory_budget import memory_budget
+
+_PRIME = np.uint64(4294967311)  # Smallest prime above 2**32
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_WORD = re.compile(r'\w+')
+
+def shingles(text, size=3):
+    """
+    Hash the overlapping word n-grams of a text.
+
+    Args:
+        text (str): Text to shingle
+        size (int): Words per shingle
+
+    Returns:
+        numpy.ndarray: Unique 32-bit shingle hashes
+    """
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(np.fromiter((zlib.crc32(gram.encode()) for gram in grams), dtype=np.uint64,
+                                 count=len(grams)))
+
+# Signatures of recently seen memories, keyed by memory id and a digest of
+# the text so an edited memory isn't served its old signature; results are
+# re-ranked often
+_signature_cache = LRUCache(10000)
+memory_budget.register('dedup signatures', _signature_cache, priority=10)
+
+def memory_text(memory):
+    return f"{memory.get('title', '')} {memory.get('content', '')}"
+
+class MinHasher:
+    """Computes MinHash signatures with num_perm universal hash functions."""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, text, shingle_size=3):
+        """
+        Return the MinHash signature of a text, or None if it has no words.
+
+        Returns:
+            numpy.ndarray: uint32 signature of length num_perm
+        """
+        hashes = shingles(text, shingle_size)
+        if len(hashes) == 0:
+            return None
+        # a * x fits in 64 bits because both are below 2**32 + 15
+        permuted = (self._a[:, None] * hashes[None, :] % _PRIME + self._b[:, None]) % _PRIME
+        return (permuted.min(axis=1) & _MAX_HASH).astype(np.uint32)
+
+def estimated_jaccard(signature_a, signature_b):
+    """Fraction of matching MinHash slots, an estimate of Jaccard similarity."""
+    return float(np.mean(signature_a == signature_b))
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures with LSH banding for near-duplicate lookup.
+
+    Signatures are split into bands; memories sharing any band bucket become
+    candidates, and candidates are confirmed when their estimated Jaccard
+    similarity reaches the threshold. Confirmed pairs are merged into
+    clusters with union-find. Re-adding a memory replaces its signature,
+    and removing one re-links the rest of its cluster, since links that
+    went through it may no longer hold.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=3):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self._parent = {}
+        # Members of every cluster with more than one, by root
+        self._clusters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _find(self, memory_id):
+        root = memory_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Path compression
+        while self._parent[memory_id] != root:
+            self._parent[memory_id], memory_id = root, self._parent[memory_id]
+        return root
+
+    def _union(self, memory_id, other_id):
+        root, other_root = self._find(memory_id), self._find(other_id)
+        if root == other_root:
+            return
+        self._parent[root] = other_root
+        self._clusters[other_root] = self._clusters.get(other_root, {other_root}) | \
+            self._clusters.pop(root, {root})
+
+    def _unlink(self, memory_id):
+        """Drop a memory's signature and rebuild the cluster it was in without it."""
+        signature = self._signatures.pop(memory_id, None)
+        if signature is not None:
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.discard(memory_id)
+                    if not bucket:
+                        del self._buckets[band][key]
+        if memory_id not in self._parent:
+            return
+
+        members = self._clusters.pop(self._find(memory_id), set())
+        members.discard(memory_id)
+        del self._parent[memory_id]
+        for other_id in members:
+            self._parent[other_id] = other_id
+        for other_id in members:
+            signature = self._signatures.get(other_id)
+            if signature is None:
+                continue
+            for candidate in self.candidates(signature) & members:
+                if candidate != other_id and \
+                        estimated_jaccard(signature, self._signatures[candidate]) >= self.threshold:
+                    self._union(other_id, candidate)
+
+    def signature(self, text, memory_id=None):
+        """Return the signature of a text, reusing recently computed ones."""
+        digest = hashlib.blake2b(text.encode('utf-8', 'replace'), digest_size=16).digest()
+        key = (self.hasher.num_perm, self.shingle_size, memory_id, digest)
+        signature = _signature_cache.get(key)
+        if signature is None:
+            signature = self.hasher.signature(text, self.shingle_size)
+            _signature_cache.put(key, signature)
+        return signature
+
+    def candidates(self, signature):
+        """Return the ids whose signatures share at least one band bucket."""
+        found = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def query(self, text):
+        """
+        Find indexed memories that are near-duplicates of a text.
+
+        Returns:
+            list: (memory_id, similarity) pairs, most similar first
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return []
+        with self._lock:
+            matches = [(memory_id, estimated_jaccard(signature, self._signatures[memory_id]))
+                       for memory_id in self.candidates(signature)]
+        matches = [match for match in matches if match[1] >= self.threshold]
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def add(self, memory_id, text):
+        """
+        Index a memory and join it to the cluster of its near-duplicates.
+
+        A memory that is already indexed is replaced.
+
+        Returns:
+            The id of the most similar existing near-duplicate, or None
+        """
+        signature = self.signature(text, memory_id)
+        with self._lock:
+            if memory_id in self._parent:
+                self._unlink(memory_id)
+            self._parent[memory_id] = memory_id
+            if signature is None:
+                return None
+
+            best = None
+            best_similarity = 0.0
+            for other_id in self.candidates(signature):
+                if other_id == memory_id:
+                    continue
+                similarity = estimated_jaccard(signature, self._signatures[other_id])
+                if similarity >= self.threshold:
+                    self._union(memory_id, other_id)
+                    if similarity > best_similarity:
+                        best, best_similarity = other_id, similarity
+
+            self._signatures[memory_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, set()).add(memory_id)
+            return best
+
+    def add_memory(self, memory):
+        return self.add(memory['id'], memory_text(memory))
+
+    def update(self, memories):
+        """Add the memories that aren't indexed yet."""
+        for memory in memories:
+            if memory['id'] not in self._signatures:
+                self.add_memory(memory)
+
+    def remove(self, memory_id):
+        """
+        Forget a deleted memory.
+
+        Returns:
+            bool: False if the memory wasn't indexed
+        """
+        with self._lock:
+            if memory_id not in self._parent:
+                return False
+            self._unlink(memory_id)
+            return True
+
+    def cluster_id(self, memory_id):
+        """Return the representative id of a memory's near-duplicate cluster."""
+        with self._lock:
+            if memory_id not in self._parent:
+                return memory_id
+            return self._find(memory_id)
+
+    def clusters(self):
+        """Return every cluster with more than one member."""
+        with self._lock:
+            return [list(members) for members in self._clusters.values()]
+
+def collapse_duplicates(memories, threshold=0.8, index=None):
+    """
+    Keep only the first memory of each near-duplicate cluster.
+
+    Memories are compared among themselves, so this is meant for a ranked
+    result list rather than the whole corpus. Clusters found at index time,
+    through a persistent index or the 'duplicate_of' field, are honoured too.
+
+    Args:
+        memories (list): Ranked memories
+        threshold (float): Minimum estimated Jaccard similarity
+        index (NearDuplicateIndex, optional): Index built at indexing time
+
+    Returns:
+        list: Memories with later near-duplicates removed, order preserved
+    """
+    local = NearDuplicateIndex(threshold)
+    seen_clusters = set()
+    kept = []
+
+    for position, memory in enumerate(memories):
+        memory_id = memory.get('id', position)
+        if index is not None:
+            cluster = index.cluster_id(memory_id)
+        else:
+            cluster = memory.get('duplicate_of') or memory_id
+        if cluster in seen_clusters:
+            continue
+
+        # Compare with the results ranked above this one
+        if local.add(position, memory_text(memory)) is not None:
+            continue
+
+        seen_clusters.add(cluster)
+        kept.append(memory)
+
+    return kept
@@ -0,0 +1,551 @@
+import re
+import threading
+import numpy as np
+from core.topk import TopK
+
+_TOKEN = re.compile(r'\w+')
+_QUERY_TOKEN = re.compile(r'"[^"]*"?|\(|\)|[^\s()"]+')
+_NEAR = re.compile(r'NEAR(?:/(\d+))?$')
+
+DEFAULT_NEAR_DISTANCE = 5
+
+def token_spans(text):
+    """
+    Split text into lowercase word tokens with their character offsets.
+
+    Returns:
+        list: (token, start, end) tuples
+    """
+    return [(match.group(0).lower(), match.start(), match.end()) for match in _TOKEN.finditer(text)]
+
+# Query nodes are tuples:
+#   ('term', token)            ('phrase', [tokens])
+#   ('and', [nodes])           ('or', [nodes])
+#   ('not', node)              ('near', distance, left, right)
+
+def is_structured(query):
+    """True if the query uses quotes, parentheses or boolean/proximity operators."""
+    for token in _QUERY_TOKEN.findall(query):
+        if token.startswith('"') or token in ('(', ')', 'AND', 'OR', 'NOT') or _NEAR.match(token):
+            return True
+        if token.startswith('-') and len(token) > 1:
+            return True
+    return False
+
+def _word_node(text):
+    words = [token for token, _, _ in token_spans(text)]
+    if not words:
+        return None
+    return ('term', words[0]) if len(words) == 1 else ('phrase', words)
+
+class _Parser:
+    """
+    Recursive-descent parser, loosest binding first:
+
+        or   := and ('OR' and)*
+        and  := near (['AND'] near)*
+        near := unary ('NEAR' | 'NEAR/k' unary)*
+        unary:= ('NOT' | '-') unary | '(' or ')' | '"phrase"' | word
+    """
+
+    def __init__(self, query, default_operator):
+        self.tokens = _QUERY_TOKEN.findall(query)
+        self.position = 0
+        self.default_operator = default_operator
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        # Ignore anything left over, such as an unmatched ')'
+        while self.peek() is not None:
+            self.take()
+            more = self.parse_or()
+            if more is not None:
+                node = more if node is None else (self.default_operator, [node, more])
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            nodes.append(self.parse_and())
+        nodes = [node for node in nodes if node is not None]
+        if len(nodes) <= 1:
+            return nodes[0] if nodes else None
+        return ('or', nodes)
+
+    def parse_and(self):
+        nodes = []
+        operator = self.default_operator
+        while self.peek() not in (None, ')', 'OR'):
+            if self.peek() == 'AND':
+                self.take()
+                operator = 'and'
+                continue
+            node = self.parse_near()
+            if node is not None:
+                nodes.append(node)
+        if any(node[0] == 'not' for node in nodes):
+            # A negated term always restricts the other terms
+            operator = 'and'
+        if len(nodes) <= 1:
+            return nodes[0] if nodes else None
+        return (operator, nodes)
+
+    def parse_near(self):
+        node = self.parse_unary()
+        while self.peek() is not None and _NEAR.match(self.peek()):
+            distance = _NEAR.match(self.take()).group(1)
+            right = self.parse_unary()
+            if node is None or right is None:
+                node = node or right
+                continue
+            node = ('near', int(distance) if distance else DEFAULT_NEAR_DISTANCE, node, right)
+        return node
+
+    def parse_unary(self):
+        token = self.take()
+        if token is None:
+            return None
+        if token == 'NOT':
+            node = self.parse_unary()
+            return ('not', node) if node is not None else None
+        if token.startswith('-') and len(token) > 1:
+            node = _word_node(token[1:])
+            return ('not', node) if node is not None else None
+        if token == '(':
+            node = self.parse_or()
+            if self.peek() == ')':
+                self.take()
+            return node
+        if token.startswith('"'):
+            return _word_node(token.strip('"'))
+        return _word_node(token)
+
+def parse_query(query):
+    """
+    Parse a search query into a query tree.
+
+    Supports "quoted phrases", AND, OR, NOT (or a leading '-'), parentheses
+    and proximity with NEAR/k. Adjacent terms are ANDed when the query uses
+    any of these, and ORed when it is a plain list of words.
+
+    Returns:
+        tuple: The root query node, or None for an empty query
+    """
+    default_operator = 'and' if is_structured(query) else 'or'
+    return _Parser(query, default_operator).parse()
+
+def _query_terms(node, negated=False):
+    """Yield the (token, negated) pairs of every term in a query tree."""
+    kind = node[0]
+    if kind == 'term':
+        yield node[1], negated
+    elif kind == 'phrase':
+        for token in node[1]:
+            yield token, negated
+    elif kind in ('and', 'or'):
+        for child in node[1]:
+            yield from _query_terms(child, negated)
+    elif kind == 'not':
+        yield from _query_terms(node[1], not negated)
+    elif kind == 'near':
+        yield from _query_terms(node[2], negated)
+        yield from _query_terms(node[3], negated)
+
+def _only_negative(node):
+    """True if a query can match documents that contain none of its terms."""
+    kind = node[0]
+    if kind == 'not':
+        return True
+    if kind == 'and':
+        return all(_only_negative(child) for child in node[1])
+    if kind == 'or':
+        return any(_only_negative(child) for child in node[1])
+    return False
+
+# Approximate bytes per term and per document beyond the positions themselves
+_TERM_OVERHEAD = 250
+_DOC_OVERHEAD = 160
+
+class PositionalIndex:
+    """
+    In-memory positional inverted index over memory titles and content.
+
+    Each token position is recorded per document, so phrases and proximity
+    are answered from the postings alone. A term's postings are one int32
+    array of (document, position) rows, grown by doubling, so memories can
+    be added incrementally without a Python object per occurrence.
+
+    A document's positions run through its title first and then its
+    content; positions below the title length are title matches.
+
+    With a loader, the index is built from the memories it returns on the
+    first search, and add and remove calls before then are skipped, since
+    the loader's memories already reflect them. The memory budget can
+    drop a loaded index; the next search loads it again. With a lookup,
+    only memory ids are kept and results are fetched by id, so indexing a
+    memory doesn't keep its content in RAM.
+    """
+
+    def __init__(self, memories=(), loader=None, lookup=None):
+        """
+        Args:
+            memories (iterable): Memories to index
+            loader (callable, optional): Returns the memories to index on
+                first use, instead of indexing them up front
+            lookup (callable, optional): Returns the current memory for an
+                id, or None once it is gone
+        """
+        self.loader = loader
+        self.lookup = lookup
+        self._lock = threading.Lock()
+        self._reset()
+        if loader is None:
+            self._add(memories)
+            self._loaded = True
+
+    def _reset(self):
+        self._loaded = False
+        self._memories = []
+        self._ordinals = {}
+        self._title_lengths = np.zeros(0, dtype=np.int32)
+        self._postings = {}
+        self._live = 0
+        self._nbytes = 0
+        self._ranges = {}
+
+    def _load(self):
+        if not self._loaded:
+            self._add(self.loader())
+            self._loaded = True
+
+    def __len__(self):
+        with self._lock:
+            return self._live
+
+    def _append(self, token, doc, positions):
+        entry = self._postings.get(token)
+        if entry is None:
+            entry = [np.empty((len(positions), 2), dtype=np.int32), 0]
+            self._postings[token] = entry
+            self._nbytes += entry[0].nbytes + _TERM_OVERHEAD
+        rows, size = entry
+        if size + len(positions) > len(rows):
+            grown = np.empty((max(2 * len(rows), size + len(positions)), 2), dtype=np.int32)
+            grown[:size] = rows[:size]
+            self._nbytes += grown.nbytes - rows.nbytes
+            entry[0] = rows = grown
+        rows[size:size + len(positions), 0] = doc
+        rows[size:size + len(positions), 1] = positions
+        entry[1] = size + len(positions)
+
+    def _add(self, memories):
+        title_lengths = []
+        for memory in memories:
+            self._remove(memory.get('id'))
+            doc = len(self._memories)
+            self._memories.append(memory if self.lookup is None else memory.get('id'))
+            self._ordinals[memory.get('id')] = doc
+            self._live += 1
+
+            title = token_spans(memory.get('title') or '')
+            content = token_spans(memory.get('content') or '')
+            title_lengths.append(len(title))
+            positions = {}
+            for position, (token, _, _) in enumerate(title + content):
+                positions.setdefault(token, []).append(position)
+            for token, token_positions in positions.items():
+                self._append(token, doc, token_positions)
+
+        if title_lengths:
+            self._title_lengths = np.concatenate([self._title_lengths, np.array(title_lengths, dtype=np.int32)])
+            self._nbytes += _DOC_OVERHEAD * len(title_lengths)
+
+    def _remove(self, memory_id):
+        doc = self._ordinals.pop(memory_id, None)
+        if doc is None:
+            return False
+        # The postings keep the ordinal; it just no longer matches
+        self._memories[doc] = None
+        self._live -= 1
+        return True
+
+    def add(self, memories):
+        """Index new memories, replacing indexed ones with the same id."""
+        with self._lock:
+            if self._loaded:
+                self._add(memories)
+
+    def update(self, memories):
+        """Index the memories whose ids aren't indexed yet."""
+        with self._lock:
+            if self._loaded:
+                self._add([memory for memory in memories if memory.get('id') not in self._ordinals])
+
+    def remove(self, memory_id):
+        """
+        Forget a deleted memory.
+
+        Returns:
+            bool: False if it wasn't indexed
+        """
+        with self._lock:
+            removed = self._loaded and self._remove(memory_id)
+            if removed and self.loader is not None and len(self._memories) > 2 * self._live + 1000:
+                # Mostly dead ordinals; loading again is cheaper to keep
+                self._reset()
+            return removed
+
+    def memory_usage(self):
+        """Approximate bytes held by the postings and per-document arrays."""
+        return self._nbytes
+
+    def shrink(self, target_bytes):
+        """
+        Drop a loaded index if it holds more than target_bytes; it is loaded
+        again on the next search.
+
+        Returns:
+            int: Bytes freed
+        """
+        with self._lock:
+            if self.loader is None or self._nbytes <= target_bytes:
+                return 0
+            freed = self._nbytes
+            self._reset()
+            return freed
+
+    def _doc_ranges(self, token):
+        entry = self._postings.get(token)
+        if entry is None:
+            return {}
+        docs = entry[0][:entry[1], 0]
+        # Ordinals only grow, so each term's rows are sorted by document
+        starts = np.flatnonzero(np.concatenate(([True], docs[1:] != docs[:-1])))
+        ends = np.append(starts[1:], len(docs))
+        return dict(zip(docs[starts].tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def _positions(self, token, doc):
+        ranges = self._ranges.get(token)
+        if ranges is None:
+            # Found once per search, rather than once per candidate
+            ranges = self._ranges[token] = self._doc_ranges(token)
+        found = ranges.get(doc)
+        if found is None:
+            return None
+        return self._postings[token][0][found[0]:found[1], 1]
+
+    def _spans(self, node, doc):
+        """
+        Match a query node against one document.
+
+        Returns:
+            list: (first, last) token position spans of the match, possibly
+                empty for a negated match, or None if the document doesn't match
+        """
+        kind = node[0]
+        if kind == 'term':
+            positions = self._positions(node[1], doc)
+            return None if positions is None else [(int(p), int(p)) for p in positions]
+
+        if kind == 'phrase':
+            starts = self._positions(node[1][0], doc)
+            for offset, token in enumerate(node[1][1:], 1):
+                if starts is None or len(starts) == 0:
+                    return None
+                positions = self._positions(token, doc)
+                if positions is None:
+                    return None
+                starts = np.intersect1d(starts, positions - offset, assume_unique=True)
+            if starts is None or len(starts) == 0:
+                return None
+            length = len(node[1]) - 1
+            return [(int(p), int(p) + length) for p in starts]
+
+        if kind == 'and':
+            spans = []
+            for child in node[1]:
+                child_spans = self._spans(child, doc)
+                if child_spans is None:
+                    return None
+                spans.extend(child_spans)
+            return spans
+
+        if kind == 'or':
+            matched = [spans for spans in (self._spans(child, doc) for child in node[1]) if spans is not None]
+            return [span for spans in matched for span in spans] if matched else None
+
+        if kind == 'not':
+            return [] if self._spans(node[1], doc) is None else None
+
+        if kind == 'near':
+            distance, left, right = node[1], self._spans(node[2], doc), self._spans(node[3], doc)
+            if not left or not right:
+                return None
+            spans = [(min(a[0], b[0]), max(a[1], b[1]))
+                     for a in left for b in right
+                     if max(b[0] - a[1], a[0] - b[1]) - 1 <= distance]
+            return spans or None
+
+        raise ValueError(f"Unknown query node: {kind}")
+
+    def _candidates(self, node):
+        if _only_negative(node):
+            docs = range(len(self._memories))
+        else:
+            docs = set()
+            for token, negated in _query_terms(node):
+                entry = self._postings.get(token)
+                if not negated and entry is not None:
+                    docs.update(np.unique(entry[0][:entry[1], 0]).tolist())
+            docs = sorted(docs)
+        return [doc for doc in docs if self._memories[doc] is not None]
+
+    def _term_hits(self, node, doc, terms):
+        """Content positions of the query's terms inside the spans a document matched with."""
+        spans = self._spans(node, doc) or []
+        title_length = int(self._title_lengths[doc])
+        hits = set()
+        for token in terms:
+            positions = self._positions(token, doc)
+            for position in () if positions is None else positions.tolist():
+                if position >= title_length and any(first <= position <= last for first, last in spans):
+                    hits.add(position - title_length)
+        return sorted(hits)
+
+    def search(self, query, top_k=10, hits=None):
+        """
+        Find the memories matching a query, best first.
+
+        Title matches weigh more than content matches, as in keyword_top_k.
+
+        Args:
+            query (str): Query in the syntax of parse_query
+            top_k (int): Number of results to return
+            hits (dict, optional): Filled with {memory id: content token
+                positions of the matched query terms} for the results, which
+                snippet() cuts around
+
+        Returns:
+            list: Up to top_k (memory, score) pairs sorted by descending score
+        """
+        node = parse_query(query)
+        if node is None:
+            return []
+
+        heap = TopK(top_k)
+        with self._lock:
+            self._load()
+            self._ranges = {}
+            for doc in self._candidates(node):
+                spans = self._spans(node, doc)
+                if spans is None:
+                    continue
+                title_length = self._title_lengths[doc]
+                score = sum(10 if first < title_length else 2 for first, _ in spans)
+                # Purely negative matches still belong in the results
+                heap.push(doc, max(score, 1))
+            results = [(self._memories[doc], score) for doc, score in heap.items()]
+            if hits is not None:
+                terms = {token for token, negated in _query_terms(node) if not negated}
+                for (memory, _), (doc, _) in zip(results, heap.items()):
+                    memory_id = memory if self.lookup is not None else memory.get('id')
+                    hits[memory_id] = self._term_hits(node, doc, terms)
+            self._ranges = {}
+        if self.lookup is None:
+            return results
+        found = [(self.lookup(memory_id), score) for memory_id, score in results]
+        return [(memory, score) for memory, score in found if memory is not None]
+
+def snippet(memory, query, window=30, highlight=('**', '**'), hits=None):
+    """
+    Cut the part of a memory's content that best matches a query.
+
+    Picks the window of content tokens holding the most matched positions
+    and wraps each token where a query term occurs in the highlight markers.
+    Only the content up to the end of that window is tokenized.
+
+    Args:
+        memory (dict): A memory, usually a search result
+        query (str): The search query
+        window (int): Snippet length in tokens
+        highlight (tuple): Markers placed before and after matched tokens
+        hits (list, optional): Content token positions of the matched query
+            terms, as PositionalIndex.search finds them; without them, the
+            content is scanned for the query's terms until a window past
+            the first one found
+
+    Returns:
+        str: The snippet
+    """
+    content = memory.get('content') or ''
+    scan = _TOKEN.finditer(content)
+    tokens = []
+    terms = None
+    if hits is None:
+        node = parse_query(query)
+        terms = {token for token, negated in _query_terms(node) if not negated} if node is not None else set()
+        hits = []
+        for match in scan:
+            tokens.append(match)
+            if match.group(0).lower() in terms:
+                hits.append(len(tokens) - 1)
+            if hits and len(tokens) > hits[0] + window:
+                break
+
+    # Slide over the hits for the window that covers the most of them
+    first = 0
+    if hits:
+        best, best_count, j = 0, 0, 0
+        for i in range(len(hits)):
+            while j < len(hits) and hits[j] - hits[i] < window:
+                j += 1
+            if j - i > best_count:
+                best, best_count = i, j - i
+        first = max(0, (hits[best] + hits[best + best_count - 1]) // 2 - window // 2)
+
+    # Up to the end of the window, plus one token to tell whether the content goes on
+    for match in scan:
+        if len(tokens) > first + window:
+            break
+        tokens.append(match)
+        if terms is not None and match.group(0).lower() in terms:
+            hits.append(len(tokens) - 1)
+    if not tokens:
+        return content[:150]
+    first = max(0, min(first, len(tokens) - window))
+    last = min(len(tokens), first + window) - 1
+
+    pieces = ['...' if first > 0 else '']
+    position = tokens[first].start()
+    for hit in hits:
+        if first <= hit <= last:
+            start, end = tokens[hit].span()
+            pieces.append(content[position:start])
+            pieces.append(highlight[0] + content[start:end] + highlight[1])
+            position = end
+    if last < len(tokens) - 1:
+        pieces.append(content[position:tokens[last].end()] + '...')
+    else:
+        pieces.append(content[position:])
+    return ''.join(pieces)
+
+def snippets(memories, query, window=30, hits=None):
+    """
+    Return {memory id: snippet} for search results.
+
+    Args:
+        hits (dict, optional): {memory id: matched content token positions}
+            filled in by PositionalIndex.search
+    """
+    hits = hits or {}
+    return {memory.get('id'): snippet(memory, query, window, hits=hits.get(memory.get('id')))
+            for memory in memories}
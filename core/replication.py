@@ -0,0 +1,246 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from core.segments import MANIFEST, SEGMENT_SUFFIXES, write_json
+
+# A change log directory holds one subdirectory per version:
+#
+#   v00000001/changeset.json   version, record count, tombstones and the
+#                              size and SHA-256 of every file
+#   v00000001/segment.*        the files of the segment flushed at that
+#                              version: records, postings and vectors
+#
+# plus log.json with the oldest and newest versions kept.  Every flush of
+# the primary index becomes one version holding exactly the memories added
+# or updated and the ids deleted since the flush before, so a replica only
+# ever copies what changed.  Segment files are immutable, so change sets are
+# hard links to them where the file system allows.
+
+CHANGESET = 'changeset.json'
+LOG = 'log.json'
+REPLICA_STATE = 'replica.json'
+
+def file_checksum(path, chunk_size=1 << 20):
+    """Return the hex SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def changeset_path(directory, version):
+    return os.path.join(directory, f"v{version:08d}")
+
+def read_log(directory):
+    """Return {'oldest': version, 'head': version} for a change log directory."""
+    try:
+        with open(os.path.join(directory, LOG)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'oldest': 1, 'head': 0}
+
+def read_changeset(directory, version):
+    """Return the changeset.json of a version."""
+    with open(os.path.join(changeset_path(directory, version), CHANGESET)) as f:
+        return json.load(f)
+
+def verify_changeset(directory, version):
+    """
+    Check a change set's files against its checksums.
+
+    Returns:
+        dict: The change set
+
+    Raises:
+        ValueError: If a file is missing or its size or checksum differs
+    """
+    changeset = read_changeset(directory, version)
+    base = changeset_path(directory, version)
+    for name, expected in changeset['files'].items():
+        path = os.path.join(base, name)
+        if not os.path.exists(path):
+            raise ValueError(f"Change set {version} is missing {name}")
+        if os.path.getsize(path) != expected['size'] or file_checksum(path) != expected['sha256']:
+            raise ValueError(f"Change set {version} has a corrupt {name}")
+    return changeset
+
+def _link_or_copy(source, destination):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+class ChangeLog:
+    """
+    Versioned change sets written by a primary index.
+
+    Only the newest retain versions are kept. A replica that falls further
+    behind has to be reseeded from a copy of the primary's index directory.
+    """
+
+    def __init__(self, directory, retain=None):
+        """
+        Args:
+            directory (str): Change log directory
+            retain (int, optional): Versions to keep; None keeps every version
+        """
+        self.directory = directory
+        self.retain = retain
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        log = read_log(directory)
+        self.oldest = log['oldest']
+        self.head = log['head']
+
+    def record(self, index_directory, segment):
+        """
+        Record a newly written segment as the next version.
+
+        Args:
+            index_directory (str): Directory holding the segment's files
+            segment (Segment): Segment that was flushed
+
+        Returns:
+            int: The new version
+        """
+        with self._lock:
+            version = self.head + 1
+            path = changeset_path(self.directory, version)
+            tmp_path = path + '.tmp'
+            for stale in (path, tmp_path):
+                # Left behind by a crash before the log was updated
+                shutil.rmtree(stale, ignore_errors=True)
+            os.makedirs(tmp_path)
+
+            files = {}
+            base = os.path.join(index_directory, segment.name)
+            for suffix in SEGMENT_SUFFIXES:
+                if os.path.exists(base + suffix):
+                    name = 'segment' + suffix
+                    _link_or_copy(base + suffix, os.path.join(tmp_path, name))
+                    files[name] = {'size': os.path.getsize(base + suffix),
+                                   'sha256': file_checksum(base + suffix)}
+            write_json(os.path.join(tmp_path, CHANGESET), {
+                'version': version,
+                'created': time.time(),
+                'count': len(segment),
+                'tombstones': segment.tombstones,
+                'files': files,
+            })
+            os.replace(tmp_path, path)
+
+            self.head = version
+            previous_oldest = self.oldest
+            if self.retain:
+                self.oldest = max(self.oldest, version - self.retain + 1)
+            write_json(os.path.join(self.directory, LOG), {'oldest': self.oldest, 'head': self.head})
+            for old in range(previous_oldest, self.oldest):
+                shutil.rmtree(changeset_path(self.directory, old), ignore_errors=True)
+            return version
+
+class Replica:
+    """
+    Read-only copy of an index kept up to date from a primary's change log.
+
+    Change sets are verified against their checksums and imported into the
+    replica's index in version order. The version reached is saved after
+    each one; a change set applied twice after a crash only adds a newer
+    copy of the same records.
+    """
+
+    def __init__(self, index, source, version=None):
+        """
+        Args:
+            index (SegmentedIndex): Replica index to apply change sets to
+            source (str): Primary's change log directory
+            version (int, optional): Version the index already holds; read
+                from the replica state, or from the manifest of a copied
+                primary directory, when omitted
+        """
+        self.index = index
+        self.source = source
+        self._state_path = os.path.join(index.directory, REPLICA_STATE)
+        if version is None:
+            version = self._saved_version()
+        self.version = version
+        self._save_state()
+
+    def _saved_version(self):
+        for path, key in ((self._state_path, 'version'),
+                          (os.path.join(self.index.directory, MANIFEST), 'changelog_version')):
+            try:
+                with open(path) as f:
+                    return json.load(f).get(key, 0)
+            except FileNotFoundError:
+                continue
+        return 0
+
+    def _save_state(self):
+        write_json(self._state_path, {'source': os.path.abspath(self.source), 'version': self.version})
+
+    def pending(self):
+        """
+        Return the versions not yet applied.
+
+        Raises:
+            ValueError: If change sets the replica needs have been pruned
+        """
+        log = read_log(self.source)
+        if self.version + 1 < log['oldest']:
+            raise ValueError(f"Replica is at version {self.version} but the oldest change set kept is "
+                             f"{log['oldest']}; reseed it from a copy of the primary's index")
+        return list(range(self.version + 1, log['head'] + 1))
+
+    def sync(self):
+        """
+        Apply every pending change set.
+
+        Returns:
+            dict: Versions applied, records imported, memories deleted and seconds taken
+        """
+        started = time.perf_counter()
+        applied = records = deleted = 0
+        for version in self.pending():
+            changeset = verify_changeset(self.source, version)
+            records += self.index.import_segment(os.path.join(changeset_path(self.source, version), 'segment'),
+                                                 changeset['tombstones'])
+            deleted += len(changeset['tombstones'])
+            self.version = version
+            self._save_state()
+            applied += 1
+        return {'applied': applied, 'records': records, 'deleted': deleted, 'version': self.version,
+                'seconds': time.perf_counter() - started}
+
+if __name__ == '__main__':
+    import argparse
+    from core.segments import SegmentedIndex
+
+    parser = argparse.ArgumentParser(description="Bring a replica index up to date from a primary's change log")
+    parser.add_argument('source', help="Primary's change log directory")
+    parser.add_argument('directory', help="Replica index directory")
+    parser.add_argument('--version', type=int, default=None,
+                        help="Version the replica already holds, when seeding from a copy")
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help="Keep polling for new change sets at this interval")
+    args = parser.parse_args()
+
+    index = SegmentedIndex(args.directory)
+    replica = Replica(index, args.source, args.version)
+    try:
+        while True:
+            result = replica.sync()
+            if result['applied']:
+                print(f"version {result['version']}: {result['applied']} change sets, {result['records']:,} records, "
+                      f"{result['deleted']:,} deletes in {result['seconds']:.2f}s")
+            if args.watch is None:
+                break
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        pass
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    finally:
+        index.close()
@@ -0,0 +1,190 @@
+import re
+import time
+import threading
+import numpy as np
+from core.score_cache import LRUCache, SCORE_ENTRY_BYTES, memory_key
+from core.content_store import content_excerpt
+
+# A cross-encoder reads the query and a memory together, so it scores
+# relevance far better than comparing separately computed embeddings, but
+# it costs a model run per (query, memory) pair.  It is only applied to the
+# few best candidates of the embedding search.
+#
+# Every cross-encoder has predict(pairs) -> float array with one score per
+# (query, text) pair; higher is more relevant.
+
+_WORD = re.compile(r'\w+')
+
+class CrossEncoderModel:
+    """A sentence-transformers CrossEncoder, run on the CPU."""
+
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", threads=None, max_length=512):
+        import torch
+        from sentence_transformers import CrossEncoder
+        if threads:
+            torch.set_num_threads(threads)
+        self.name = "cross-encoder"
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+
+    def predict(self, pairs, batch_size=8):
+        return np.asarray(self.model.predict(list(pairs), batch_size=batch_size), dtype=np.float32)
+
+class StubCrossEncoder:
+    """
+    Deterministic stand-in for a cross-encoder.
+
+    Scores the share of query words found in the text, plus a bonus for
+    query word pairs that appear next to each other. Needs no model
+    weights, which makes it suitable for tests; seconds_per_pair simulates
+    the cost of a real model.
+    """
+
+    def __init__(self, seconds_per_pair=0.0):
+        self.name = "stub"
+        self.seconds_per_pair = seconds_per_pair
+
+    def predict(self, pairs, batch_size=8):
+        pairs = list(pairs)
+        if self.seconds_per_pair:
+            time.sleep(self.seconds_per_pair * len(pairs))
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for row, (query, text) in enumerate(pairs):
+            query_words = _WORD.findall(query.lower())
+            if not query_words:
+                continue
+            words = _WORD.findall(text.lower())
+            vocabulary = set(words)
+            adjacent = set(zip(words, words[1:]))
+            query_pairs = list(zip(query_words, query_words[1:]))
+            scores[row] = sum(word in vocabulary for word in query_words) / len(query_words)
+            if query_pairs:
+                scores[row] += 0.5 * sum(pair in adjacent for pair in query_pairs) / len(query_pairs)
+        return scores
+
+CROSS_ENCODER_BACKENDS = ("cross-encoder", "stub")
+
+def get_cross_encoder(backend="cross-encoder", model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", threads=None):
+    """
+    Create a cross-encoder backend by name.
+
+    Args:
+        backend (str): "cross-encoder" or "stub"
+        model_name (str): Model to load for the cross-encoder backend
+        threads (int, optional): CPU threads for inference; library default when omitted
+
+    Returns:
+        object: Scorer with a predict(pairs) method
+    """
+    if backend == "cross-encoder":
+        return CrossEncoderModel(model_name, threads)
+    if backend == "stub":
+        return StubCrossEncoder()
+    raise ValueError(f"Unknown cross-encoder backend: {backend}")
+
+def pair_text(memory, content_chars=1000):
+    """Text a memory is judged by: its title and the start of its content."""
+    return f"{memory.get('title') or ''}\n{content_excerpt(memory, content_chars)}"
+
+class Reranker:
+    """
+    Re-scores the best first-stage candidates with a cross-encoder.
+
+    Pairs are scored in batches, and scores are cached per (query, memory),
+    so paging or refining a search only scores new candidates. Each query
+    gets a latency budget: a batch that is expected to overrun it isn't
+    started, and the query keeps its first-stage order. The scores computed
+    before stopping are cached, so the next run of the query gets further.
+    Each fallback halves the cost estimate, so once the model is fast again
+    a later query scores a batch and the estimate follows the new cost.
+    """
+
+    def __init__(self, encoder, top_n=20, batch_size=8, latency_budget=0.2, cache_size=10000,
+                 content_chars=1000):
+        """
+        Args:
+            encoder: Cross-encoder with a predict(pairs) method
+            top_n (int): First-stage candidates re-scored per query
+            batch_size (int): Pairs scored per model call
+            latency_budget (float, optional): Seconds a query may spend
+                re-ranking; None for no limit
+            cache_size (int): Cached (query, memory) scores
+            content_chars (int): Content characters sent with each memory
+        """
+        self.encoder = encoder
+        self.top_n = top_n
+        self.batch_size = batch_size
+        self.latency_budget = latency_budget
+        self.content_chars = content_chars
+        self.cache = LRUCache(cache_size, sizeof=lambda score: SCORE_ENTRY_BYTES)
+        self.reranked = 0
+        self.fallbacks = 0
+        self._seconds_per_pair = None
+        self._lock = threading.Lock()
+
+    def rerank(self, query, scored):
+        """
+        Reorder first-stage results by cross-encoder score.
+
+        Args:
+            query (str): The search query
+            scored (list): (memory, score) pairs, best first
+
+        Returns:
+            list: The top_n candidates by cross-encoder score followed by the
+                rest in first-stage order, scored below them, or scored
+                unchanged if the latency budget ran out
+        """
+        head, tail = scored[:self.top_n], scored[self.top_n:]
+        if not head:
+            return scored
+
+        started = time.perf_counter()
+        keys = [(query, memory_key(memory)) for memory, _ in head]
+        scores = [self.cache.get(key) for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            with self._lock:
+                seconds_per_pair = self._seconds_per_pair
+            elapsed = time.perf_counter() - started
+            if self.latency_budget is not None and seconds_per_pair is not None \
+                    and elapsed + seconds_per_pair * len(batch) > self.latency_budget:
+                with self._lock:
+                    # Otherwise one slow batch would keep every later query from measuring again
+                    self._seconds_per_pair *= 0.5
+                    self.fallbacks += 1
+                return scored
+
+            batch_started = time.perf_counter()
+            predictions = self.encoder.predict([(query, pair_text(head[i][0], self.content_chars)) for i in batch],
+                                               batch_size=self.batch_size)
+            cost = (time.perf_counter() - batch_started) / len(batch)
+            with self._lock:
+                # Smoothed, so one slow batch doesn't turn re-ranking off for every query
+                self._seconds_per_pair = cost if self._seconds_per_pair is None \
+                    else 0.8 * self._seconds_per_pair + 0.2 * cost
+            for i, score in zip(batch, predictions):
+                scores[i] = float(score)
+                self.cache.put(keys[i], scores[i])
+
+        with self._lock:
+            self.reranked += 1
+        # Stable, so ties keep their first-stage order
+        order = sorted(range(len(head)), key=lambda i: -scores[i])
+        if tail:
+            # The tail keeps first-stage scores, which are on another scale;
+            # shift them below the lowest cross-encoder score, keeping their gaps
+            shift = min(scores) - tail[0][1] - 1.0
+            tail = [(memory, score + shift) for memory, score in tail]
+        return [(head[i][0], scores[i]) for i in order] + tail
+
+    def stats(self):
+        """Return how many queries were re-ranked or fell back, and the cache hit rate."""
+        lookups = self.cache.hits + self.cache.misses
+        return {
+            'reranked': self.reranked,
+            'fallbacks': self.fallbacks,
+            'seconds_per_pair': self._seconds_per_pair,
+            'cache_hit_rate': self.cache.hits / lookups if lookups else None,
+        }
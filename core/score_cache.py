@@ -0,0 +1,174 @@
+import sys
+import threading
+from collections import OrderedDict
+from core.content_store import content_excerpt
+
+def approximate_size(value):
+    """Bytes held by a cached value: an array's buffer, or the object itself."""
+    nbytes = getattr(value, 'nbytes', None)
+    return nbytes if nbytes is not None else sys.getsizeof(value)
+
+class LRUCache:
+    """
+    Thread-safe mapping that evicts the least recently used entry.
+
+    The approximate size of the cached values is tracked, so a memory
+    budget can shrink the cache to a byte target.
+    """
+
+    def __init__(self, maxsize=128, sizeof=approximate_size):
+        self.maxsize = maxsize
+        self.sizeof = sizeof
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self.sizeof(self._data[key])
+            self._data[key] = value
+            self.nbytes += self.sizeof(value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= self.sizeof(evicted)
+
+    def values(self):
+        with self._lock:
+            return list(self._data.values())
+
+    def memory_usage(self):
+        return self.nbytes
+
+    def pop_oldest(self):
+        """Evict the least recently used entry; returns False if the cache is empty."""
+        with self._lock:
+            if not self._data:
+                return False
+            _, evicted = self._data.popitem(last=False)
+            self.nbytes -= self.sizeof(evicted)
+            return True
+
+    def shrink(self, target_bytes):
+        """
+        Evict least recently used entries until at most target_bytes remain.
+
+        Returns:
+            int: Bytes freed
+        """
+        with self._lock:
+            before = self.nbytes
+            while self._data and self.nbytes > target_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.nbytes -= self.sizeof(evicted)
+            return before - self.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+# Rough cost of one cached partial score: the key tuple, the score tuple and the dict slot
+SCORE_ENTRY_BYTES = 250
+
+def memory_key(memory):
+    """
+    Cache key for a memory's partial scores.
+
+    Includes the text the scores are computed from, so an updated memory that
+    keeps its id is rescored rather than served stale scores.
+    """
+    return (memory.get('id'), memory.get('title'), content_excerpt(memory, 200))
+
+class ScoreCache:
+    """
+    Caches query embeddings and per-memory partial similarity scores.
+
+    For each recent query it keeps a dict of memory key -> (title_score,
+    content_score). Refining a search by filtering the memory list, raising
+    top_k or paging only scores memories that haven't been seen for that
+    query yet. Text embeddings are cached separately so a new query only has
+    to embed itself, not the whole corpus again.
+    """
+
+    def __init__(self, max_queries=32, max_embeddings=50000):
+        self.queries = LRUCache(max_queries)
+        self.embeddings = LRUCache(max_embeddings)
+
+    def query_scores(self, query):
+        """
+        Return the partial score dict for a query, creating it if needed.
+
+        The returned dict is shared with the cache, so scores added to it are
+        kept for later refinements of the same query.
+        """
+        entry = self.queries.get(query)
+        if entry is None:
+            entry = {'embedding': None, 'scores': {}}
+            self.queries.put(query, entry)
+        return entry
+
+    def encode(self, model, texts):
+        """
+        Embed texts, reusing cached embeddings and batching the rest.
+
+        Args:
+            model: Object with an encode(list_of_texts) method
+            texts (list): Texts to embed
+
+        Returns:
+            list: One embedding per text
+        """
+        results = [self.embeddings.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, results) if vector is None))
+
+        if missing:
+            encoded = dict(zip(missing, model.encode(missing)))
+            for text, vector in encoded.items():
+                self.embeddings.put(text, vector)
+            results = [encoded[text] if vector is None else vector
+                       for text, vector in zip(texts, results)]
+
+        return results
+
+    def memory_usage(self):
+        """Approximate bytes held by cached embeddings and partial scores."""
+        # Score dicts grow after they are cached, so they are measured now
+        scores = sum(len(entry['scores']) for entry in self.queries.values())
+        return self.embeddings.memory_usage() + scores * SCORE_ENTRY_BYTES
+
+    def shrink(self, target_bytes):
+        """
+        Evict cached embeddings, then whole queries, down to target_bytes.
+
+        Returns:
+            int: Bytes freed
+        """
+        before = self.memory_usage()
+        scores_bytes = before - self.embeddings.memory_usage()
+        self.embeddings.shrink(max(target_bytes - scores_bytes, 0))
+        while self.memory_usage() > target_bytes and self.queries.pop_oldest():
+            pass
+        return before - self.memory_usage()
+
+    def clear(self):
+        self.queries.clear()
+        self.embeddings.clear()
@@ -0,0 +1,675 @@
+import os
+import re
+import json
+import math
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from core.snapshot import Snapshot, write_snapshot
+from core.journal import Journal, read_journal
+from core.topk import TopK, top_k_indices, tokenize, keyword_score, keyword_term_scores
+
+# An index directory holds a manifest plus, for every segment, a record
+# snapshot, a postings file and an optional vectors file.  Segments are never
+# modified once written.  Each one has a generation number; when the same
+# memory id appears in several places, the newest generation wins, and a
+# tombstone in a newer generation hides every older copy.
+#
+# Writes not yet flushed to a segment are journaled to
+# journal_<generation>.wal, named after the in-memory segment they belong to.
+# A journal is removed once the manifest lists its segment, so any journal
+# newer than every segment holds writes a crash would otherwise have lost.
+
+MANIFEST = 'manifest.json'
+_JOURNAL = re.compile(r'journal_(\d+)\.wal$')
+SEGMENT_SUFFIXES = ('.snapshot', '.postings.npz', '.vectors.npy', '.vector_mask.npy')
+
+def memory_terms(memory):
+    """Return the set of tokens in a memory's title, content and entities."""
+    return set(keyword_term_scores(memory))
+
+def _write_file(path, write):
+    """Write a file through a temporary path, fsync it and rename it into place."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Segment:
+    """One immutable on-disk segment: records, postings and vectors."""
+
+    def __init__(self, directory, name, generation, tombstones=()):
+        self.name = name
+        self.generation = generation
+        self.tombstones = list(tombstones)
+        base = os.path.join(directory, name)
+
+        self.records = Snapshot(base + '.snapshot')
+        self.ids = [memory.get('id') for memory in self.records]
+        self.ordinals = {memory_id: ordinal for ordinal, memory_id in enumerate(self.ids)}
+        # Records still holding the latest copy of their id; the index keeps it up to date
+        self.alive = np.ones(len(self.ids), dtype=bool)
+
+        with np.load(base + '.postings.npz') as postings:
+            terms = postings['terms']
+            self._offsets = postings['offsets']
+            self._postings = postings['postings']
+            # Highest keyword score each term reaches in one record; older segments lack it
+            self._bounds = postings['bounds'] if 'bounds' in postings.files else None
+        self._terms = {str(term): i for i, term in enumerate(terms)}
+
+        self.vectors = None
+        self.vector_mask = None
+        if os.path.exists(base + '.vectors.npy'):
+            self.vectors = np.load(base + '.vectors.npy', mmap_mode='r')
+            self.vector_mask = np.load(base + '.vector_mask.npy')
+        self._vector_norms = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def docs_for_term(self, term):
+        """Return the ordinals of the records containing a token."""
+        i = self._terms.get(term)
+        if i is None:
+            return self._postings[:0]
+        return self._postings[self._offsets[i]:self._offsets[i + 1]]
+
+    def keyword_candidates(self, terms):
+        """
+        Find the records containing any of the query tokens.
+
+        Returns:
+            tuple: (sorted ordinals, upper bound on each one's keyword score,
+                or None if the segment was written without bounds)
+        """
+        found = [(self.docs_for_term(term), self._terms.get(term)) for term in terms]
+        found = [(docs, i) for docs, i in found if len(docs)]
+        if not found:
+            return self._postings[:0], None
+        ordinals, inverse = np.unique(np.concatenate([docs for docs, _ in found]), return_inverse=True)
+        if self._bounds is None:
+            return ordinals, None
+        # A record scores at most the sum of its terms' highest scores
+        weights = np.concatenate([np.full(len(docs), self._bounds[i], dtype=np.float64) for docs, i in found])
+        return ordinals, np.bincount(inverse, weights=weights, minlength=len(ordinals))
+
+    def vector_norms(self):
+        """Return the L2 norm of every stored vector, with 1 for empty ones."""
+        if self._vector_norms is None:
+            norms = np.linalg.norm(self.vectors, axis=1)
+            norms[norms == 0] = 1.0
+            self._vector_norms = norms
+        return self._vector_norms
+
+    def files(self, directory):
+        base = os.path.join(directory, self.name)
+        return [base + suffix for suffix in SEGMENT_SUFFIXES]
+
+def write_segment(directory, name, memories, vectors=None, compress_content=True):
+    """
+    Write a segment's records, postings and vectors to disk.
+
+    Args:
+        directory (str): Index directory
+        name (str): Segment file name prefix
+        memories (list): Memories in the segment
+        vectors (list, optional): One embedding or None per memory
+        compress_content (bool): Compress content in the record snapshot
+    """
+    base = os.path.join(directory, name)
+    write_snapshot(memories, base + '.snapshot', compress_content=compress_content)
+
+    postings = {}
+    bounds = {}
+    for ordinal, memory in enumerate(memories):
+        for term, score in keyword_term_scores(memory).items():
+            postings.setdefault(term, []).append(ordinal)
+            bounds[term] = max(bounds.get(term, 0), score)
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+    flat = np.fromiter((ordinal for term in terms for ordinal in postings[term]),
+                       dtype=np.int32, count=int(offsets[-1]))
+    _write_file(base + '.postings.npz',
+                lambda f: np.savez(f, terms=np.array(terms, dtype=str), offsets=offsets, postings=flat,
+                                   bounds=np.array([bounds[term] for term in terms], dtype=np.int32)))
+
+    if vectors is not None and any(vector is not None for vector in vectors):
+        dim = len(next(vector for vector in vectors if vector is not None))
+        matrix = np.zeros((len(memories), dim), dtype=np.float32)
+        mask = np.zeros(len(memories), dtype=bool)
+        for ordinal, vector in enumerate(vectors):
+            if vector is not None:
+                matrix[ordinal] = vector
+                mask[ordinal] = True
+        _write_file(base + '.vectors.npy', lambda f: np.save(f, matrix))
+        _write_file(base + '.vector_mask.npy', lambda f: np.save(f, mask))
+
+class SegmentedIndex:
+    """
+    Log-structured memory index made of immutable segments.
+
+    New and updated memories go into an in-memory segment that is flushed to
+    disk once it reaches flush_threshold records. Deletes are recorded as
+    tombstones. A tiered merge policy runs in the background and combines
+    runs of merge_factor similarly sized adjacent segments, so queries fan
+    out over a bounded number of segments while writes stay append-only.
+
+    Adds and deletes are journaled before they are applied, and journals
+    left by a crash are replayed on open, so only the writes since the last
+    flush are redone. Journal fsyncs are batched; sync() makes every write
+    so far durable.
+
+    With a change log, every flushed segment is also recorded as a
+    versioned change set that replicas can apply.
+    """
+
+    def __init__(self, directory, flush_threshold=1000, merge_factor=4, max_segments=16,
+                 compress_content=True, background_merge=True, changelog=None, journal=True,
+                 sync_interval=0.2, sync_records=256):
+        self.directory = directory
+        self.changelog = changelog
+        self.journal = journal
+        self.sync_interval = sync_interval
+        self.sync_records = sync_records
+        self.flush_threshold = flush_threshold
+        self.merge_factor = merge_factor
+        self.max_segments = max_segments
+        self.compress_content = compress_content
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._merge_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-merge") \
+            if background_merge else None
+
+        manifest_path = os.path.join(directory, MANIFEST)
+        manifest = {'next_generation': 1, 'next_segment': 1, 'segments': []}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        self._next_generation = manifest['next_generation']
+        self._next_segment = manifest['next_segment']
+        self._segments = [Segment(directory, entry['name'], entry['generation'], entry['tombstones'])
+                          for entry in manifest['segments']]
+
+        # Latest (generation, deleted) per memory id, used to decide which
+        # copy of a record is live
+        self._latest = {}
+        for segment in self._segments:
+            for memory_id in segment.ids:
+                self._latest[memory_id] = (segment.generation, False)
+            for memory_id in segment.tombstones:
+                self._latest[memory_id] = (segment.generation, True)
+        for segment in self._segments:
+            self._refresh_alive(segment)
+        self._index_segments()
+        self._live = sum(1 for _, deleted in self._latest.values() if not deleted)
+
+        # Journals newer than every segment hold writes that were never flushed
+        flushed = max((segment.generation for segment in self._segments), default=0)
+        journals = sorted((int(match.group(1)), os.path.join(directory, match.group(0)))
+                          for match in map(_JOURNAL.match, os.listdir(directory)) if match)
+        if journals:
+            self._next_generation = max(self._next_generation, journals[-1][0] + 1)
+
+        self._journal = None
+        self._new_memtable()
+
+        if changelog is not None and changelog.head == 0 and self._segments:
+            # Start the change log with the segments already on disk, so a
+            # replica can be built from the change log alone
+            for segment in self._segments:
+                changelog.record(directory, segment)
+            self._save_manifest()
+
+        self.recovered = 0
+        for generation, path in journals:
+            if generation > flushed:
+                self.recovered += self._replay(path)
+        if self._journal is not None:
+            self._journal.sync()
+        for _, path in journals:
+            os.remove(path)
+
+    def _new_memtable(self):
+        """Start a new in-memory segment and journal; returns the previous journal."""
+        previous = self._journal
+        self._memtable_generation = self._next_generation
+        self._next_generation += 1
+        self._memtable = {}
+        self._memtable_deletes = set()
+        self._journal = Journal(os.path.join(self.directory, f"journal_{self._memtable_generation:08d}.wal"),
+                                self.sync_interval, self.sync_records) if self.journal else None
+        return previous
+
+    def _replay(self, path):
+        """Apply the writes in a journal left by an earlier process."""
+        entries = read_journal(path)
+        for entry in entries:
+            if entry[0] == 'add':
+                self.add(entry[1], entry[2])
+            else:
+                self.delete(entry[1])
+        return len(entries)
+
+    def sync(self):
+        """Make every add and delete so far durable."""
+        with self._lock:
+            journal = self._journal
+        if journal is not None:
+            journal.sync()
+
+    def _save_manifest(self):
+        manifest = {
+            'next_generation': self._next_generation,
+            'next_segment': self._next_segment,
+            'segments': [{'name': segment.name, 'generation': segment.generation,
+                          'count': len(segment), 'tombstones': segment.tombstones}
+                         for segment in self._segments],
+        }
+        if self.changelog is not None:
+            # Lets a copy of this directory seed a replica at the right version
+            manifest['changelog_version'] = self.changelog.head
+        write_json(os.path.join(self.directory, MANIFEST), manifest)
+
+    def __len__(self):
+        return self._live
+
+    def _index_segments(self):
+        """Map generations to segments after the segment list changes."""
+        self._by_generation = {segment.generation: segment for segment in self._segments}
+
+    def _refresh_alive(self, segment):
+        segment.alive = np.fromiter((self._is_live(segment.generation, memory_id) for memory_id in segment.ids),
+                                    dtype=bool, count=len(segment.ids))
+
+    def _supersede(self, memory_id):
+        """
+        Mark the live copy of a memory as replaced or deleted.
+
+        Returns:
+            bool: True if the memory was live
+        """
+        latest = self._latest.get(memory_id)
+        if latest is None or latest[1]:
+            return False
+        segment = self._by_generation.get(latest[0])
+        if segment is not None:
+            segment.alive[segment.ordinals[memory_id]] = False
+        return True
+
+    @property
+    def segments(self):
+        with self._lock:
+            return list(self._segments)
+
+    def add(self, memory, vector=None):
+        """
+        Insert or replace a memory.
+
+        Args:
+            memory (dict): Memory with an 'id'
+            vector (array-like, optional): Embedding for vector search
+        """
+        with self._lock:
+            memory_id = memory['id']
+            if self._journal is not None:
+                self._journal.append(['add', dict(memory), None if vector is None
+                                      else np.asarray(vector, dtype=np.float32).tolist()])
+            if not self._supersede(memory_id):
+                self._live += 1
+            self._memtable[memory_id] = (memory, vector)
+            self._memtable_deletes.discard(memory_id)
+            self._latest[memory_id] = (self._memtable_generation, False)
+            if len(self._memtable) >= self.flush_threshold:
+                self.flush()
+
+    def get(self, memory_id):
+        """Return the live memory with an id, or None."""
+        with self._lock:
+            latest = self._latest.get(memory_id)
+            if latest is None or latest[1]:
+                return None
+            if memory_id in self._memtable:
+                return self._memtable[memory_id][0]
+            segment = self._by_generation.get(latest[0])
+            if segment is not None:
+                return segment.records[segment.ordinals[memory_id]]
+        return None
+
+    def _stored(self, memory_id):
+        """Return the live (memory, vector) of an id, or None."""
+        latest = self._latest.get(memory_id)
+        if latest is None or latest[1]:
+            return None
+        if memory_id in self._memtable:
+            return self._memtable[memory_id]
+        segment = self._by_generation.get(latest[0])
+        if segment is not None:
+            ordinal = segment.ordinals[memory_id]
+            vector = None
+            if segment.vectors is not None and segment.vector_mask[ordinal]:
+                vector = np.array(segment.vectors[ordinal])
+            return segment.records[ordinal].to_dict(), vector
+        return None
+
+    def update(self, memory_id, changes):
+        """
+        Change some fields of a stored memory, keeping its vector.
+
+        Args:
+            memory_id: Id of the memory
+            changes (dict): Fields to set
+
+        Returns:
+            bool: False if the memory isn't in the index
+        """
+        with self._lock:
+            stored = self._stored(memory_id)
+            if stored is None:
+                return False
+            memory, vector = stored
+            self.add({**memory, **changes}, vector)
+            return True
+
+    def delete(self, memory_id):
+        """Hide every stored copy of a memory behind a tombstone."""
+        with self._lock:
+            if memory_id not in self._latest:
+                return
+            if self._journal is not None:
+                self._journal.append(['delete', memory_id])
+            if self._supersede(memory_id):
+                self._live -= 1
+            self._memtable.pop(memory_id, None)
+            self._memtable_deletes.add(memory_id)
+            self._latest[memory_id] = (self._memtable_generation, True)
+
+    def delete_missing(self, directory_path, present_paths):
+        """
+        Delete memories for files under a directory that no longer exist.
+
+        Args:
+            directory_path (str): Directory that was indexed
+            present_paths (set): File paths seen in that directory
+
+        Returns:
+            list: Ids of the memories deleted
+        """
+        prefix = os.path.join(directory_path, '')
+        stale = [memory['id'] for memory in self.memories()
+                 if str(memory.get('file_path', '')).startswith(prefix)
+                 and memory['file_path'] not in present_paths]
+        for memory_id in stale:
+            self.delete(memory_id)
+        return stale
+
+    def flush(self):
+        """Write the in-memory segment to disk and schedule merging."""
+        with self._lock:
+            if not self._memtable and not self._memtable_deletes:
+                return
+            name = f"seg_{self._next_segment:08d}"
+            self._next_segment += 1
+            records = list(self._memtable.values())
+            write_segment(self.directory, name, [memory for memory, _ in records],
+                          [vector for _, vector in records], self.compress_content)
+            segment = Segment(self.directory, name, self._memtable_generation,
+                              sorted(self._memtable_deletes, key=str))
+            self._segments.append(segment)
+            self._index_segments()
+            if self.changelog is not None:
+                self.changelog.record(self.directory, segment)
+            journal = self._new_memtable()
+            self._save_manifest()
+            # The segment is listed in the manifest, so its journal is no longer needed
+            if journal is not None:
+                journal.close(remove=True)
+
+        self._schedule_merge()
+
+    def import_segment(self, source_base, tombstones=()):
+        """
+        Add a segment written elsewhere, such as a replicated change set.
+
+        The files are copied in under a new name and the segment takes the
+        newest generation, so its records and tombstones override every
+        older copy in the index.
+
+        Args:
+            source_base (str): Path prefix of the segment's files
+            tombstones (list): Memory ids the segment deletes
+
+        Returns:
+            int: Number of records imported
+        """
+        with self._lock:
+            # Pending writes keep their older generation; the import takes
+            # the fresh memtable's generation and a new memtable follows it
+            self.flush()
+            generation = self._memtable_generation
+            journal = self._new_memtable()
+
+            name = f"seg_{self._next_segment:08d}"
+            self._next_segment += 1
+            base = os.path.join(self.directory, name)
+            for suffix in SEGMENT_SUFFIXES:
+                if os.path.exists(source_base + suffix):
+                    shutil.copyfile(source_base + suffix, base + suffix)
+
+            segment = Segment(self.directory, name, generation, sorted(tombstones, key=str))
+            for memory_id in segment.ids:
+                if not self._supersede(memory_id):
+                    self._live += 1
+                self._latest[memory_id] = (generation, False)
+            for memory_id in segment.tombstones:
+                if self._supersede(memory_id):
+                    self._live -= 1
+                self._latest[memory_id] = (generation, True)
+            self._segments.append(segment)
+            self._refresh_alive(segment)
+            self._index_segments()
+            self._save_manifest()
+            if journal is not None:
+                journal.close(remove=True)
+
+        self._schedule_merge()
+        return len(segment)
+
+    def _schedule_merge(self):
+        if self._executor is not None:
+            self._executor.submit(self.merge)
+        else:
+            self.merge()
+
+    def _is_live(self, generation, memory_id):
+        return self._latest.get(memory_id) == (generation, False)
+
+    def _tier(self, segment):
+        size = max(len(segment), 1) / max(self.flush_threshold, 1)
+        return max(int(math.log(size, self.merge_factor)), 0) if size > 1 else 0
+
+    def _pick_merge(self):
+        """Choose a run of adjacent segments to merge, or None."""
+        segments = self._segments
+        for start in range(len(segments) - self.merge_factor + 1):
+            run = segments[start:start + self.merge_factor]
+            if len({self._tier(segment) for segment in run}) == 1:
+                return run
+
+        # Keep the fan-out bounded even when tiers don't line up
+        if len(segments) > self.max_segments:
+            start = min(range(len(segments) - 1),
+                        key=lambda i: len(segments[i]) + len(segments[i + 1]))
+            return segments[start:start + 2]
+        return None
+
+    def merge(self):
+        """Merge segments until the merge policy is satisfied."""
+        with self._merge_lock:
+            while True:
+                with self._lock:
+                    run = self._pick_merge()
+                if run is None:
+                    return
+                self._merge_run(run)
+
+    def _merge_run(self, run):
+        generation = max(segment.generation for segment in run)
+        run_generations = {segment.generation for segment in run}
+
+        with self._lock:
+            name = f"seg_{self._next_segment:08d}"
+            self._next_segment += 1
+            # Tombstones only matter while an older segment could hold the id
+            includes_oldest = self._segments[0] is run[0]
+            live = [(segment, ordinal) for segment in run for ordinal in np.flatnonzero(segment.alive).tolist()]
+            tombstones = [] if includes_oldest else sorted(
+                {memory_id for segment in run for memory_id in segment.tombstones
+                 if self._latest.get(memory_id) == (segment.generation, True)}, key=str)
+
+        memories = [segment.records[ordinal].to_dict() for segment, ordinal in live]
+        vectors = [segment.vectors[ordinal] if segment.vectors is not None and segment.vector_mask[ordinal]
+                   else None for segment, ordinal in live]
+        write_segment(self.directory, name, memories, vectors, self.compress_content)
+        merged = Segment(self.directory, name, generation, tombstones)
+
+        with self._lock:
+            for memory_id, (latest_generation, deleted) in list(self._latest.items()):
+                if latest_generation in run_generations:
+                    if deleted and includes_oldest:
+                        del self._latest[memory_id]
+                    else:
+                        self._latest[memory_id] = (generation, deleted)
+
+            position = self._segments.index(run[0])
+            run_names = {segment.name for segment in run}
+            self._segments = [segment for segment in self._segments if segment.name not in run_names]
+            self._segments.insert(position, merged)
+            # Copies replaced while the merge was written are already dead
+            self._refresh_alive(merged)
+            self._index_segments()
+            self._save_manifest()
+
+        # Readers holding old records keep their mappings; the files just go away
+        for segment in run:
+            for path in segment.files(self.directory):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def memories(self):
+        """Return every live memory, oldest segment first."""
+        with self._lock:
+            segments = list(self._segments)
+            memtable = [memory for memory, _ in self._memtable.values()]
+            live = [(segment, ordinal) for segment in segments for ordinal in np.flatnonzero(segment.alive).tolist()]
+        return [segment.records[ordinal] for segment, ordinal in live] + memtable
+
+    def keyword_search(self, query, top_k=10):
+        """
+        Keyword search over all segments.
+
+        Postings narrow each segment to records containing a query token,
+        and each term's highest score in the segment bounds what a record
+        can score. Candidates are scored with keyword_score from the highest
+        bound down, stopping once no bound left can beat the results, so
+        most records are never read.
+
+        Returns:
+            list: Up to top_k (memory, score) pairs, tied scores in the
+                order a full scan of memories() would give
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            segments = list(self._segments)
+            # (bound, position in a full scan, records, ordinal)
+            candidates = []
+            position = 0
+            for segment in segments:
+                ordinals, bounds = segment.keyword_candidates(terms)
+                live = segment.alive[ordinals]
+                ordinals = ordinals[live].tolist()
+                bounds = bounds[live].tolist() if bounds is not None else [math.inf] * len(ordinals)
+                candidates.extend((bound, position + ordinal, segment.records, ordinal)
+                                  for ordinal, bound in zip(ordinals, bounds))
+                position += len(segment)
+            # The memtable has no postings, so its records are always scored
+            memtable = [memory for memory, _ in self._memtable.values()]
+            candidates.extend((math.inf, position + i, memtable, i) for i in range(len(memtable)))
+
+        heap = TopK(top_k)
+        candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+        for bound, position, records, ordinal in candidates:
+            if heap.full and bound < heap.threshold[0]:
+                break
+            memory = records[ordinal]
+            score = keyword_score(terms, memory)
+            if score > 0:
+                # Ranked by position among equal scores, whatever order they are scored in
+                heap.push(memory, (score, -position))
+        return [(memory, score) for memory, (score, _) in heap.items()]
+
+    def vector_search(self, query_vector, top_k=10):
+        """
+        Cosine-similarity search over stored vectors in every segment.
+
+        Each segment contributes its own top_k; a heap merges them.
+
+        Returns:
+            list: Up to top_k (memory, score) pairs
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        heap = TopK(top_k)
+
+        with self._lock:
+            segments = list(self._segments)
+            memtable = [(memory, vector) for memory, vector in self._memtable.values() if vector is not None]
+            # Copied, since writes keep updating the masks
+            alive = {segment.name: segment.alive & segment.vector_mask
+                     for segment in segments if segment.vectors is not None}
+
+        for segment in segments:
+            if segment.vectors is None:
+                continue
+            scores = segment.vectors @ query_vector / segment.vector_norms()
+            scores[~alive[segment.name]] = -np.inf
+            for ordinal in top_k_indices(scores, top_k):
+                if np.isfinite(scores[ordinal]):
+                    heap.push(segment.records[ordinal], float(scores[ordinal]))
+
+        for memory, vector in memtable:
+            vector = np.asarray(vector, dtype=np.float32)
+            heap.push(memory, float(vector @ query_vector / (np.linalg.norm(vector) or 1.0)))
+
+        return heap.items()
+
+    def close(self):
+        """Flush pending writes and wait for background merges."""
+        self.flush()
+        with self._lock:
+            if self._journal is not None:
+                # Nothing has been written since the flush
+                self._journal.close(remove=True)
+                self._journal = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
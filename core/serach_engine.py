@@ -1,15 +1,95 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
+from core.topk import keyword_top_k, top_k_indices
+from core.score_cache import ScoreCache, memory_key
+from core.content_store import content_excerpt
+from core.memory_budget import memory_budget
+from core.encoders import get_encoder
+from core.rerank import Reranker, get_cross_encoder
+from config import (EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_THREADS, RERANK_BACKEND, RERANK_MODEL,
+                    RERANK_TOP_N, RERANK_BATCH_SIZE, RERANK_LATENCY_BUDGET, RERANK_CACHE_SIZE)
 
 # Initialize the embedding model
 try:
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+    model = get_encoder(EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_THREADS)
 except:
     # Fallback for demo purposes
     model = None
 
-def search_memories(query, memories, top_k=10):
+# Embeddings and partial scores shared by repeated and refined queries
+score_cache = ScoreCache()
+memory_budget.register('query scores and embeddings', score_cache, priority=20)
+
+# Optional second stage that re-scores the best candidates with a cross-encoder
+rerank_stage = None
+if RERANK_BACKEND:
+    try:
+        rerank_stage = Reranker(get_cross_encoder(RERANK_BACKEND, RERANK_MODEL, EMBEDDING_THREADS),
+                                top_n=RERANK_TOP_N, batch_size=RERANK_BATCH_SIZE,
+                                latency_budget=RERANK_LATENCY_BUDGET, cache_size=RERANK_CACHE_SIZE)
+        memory_budget.register('re-ranking scores', rerank_stage.cache, priority=20)
+    except Exception:
+        # Without the model, results keep the embedding order
+        rerank_stage = None
+
+def embed_memory(memory, cache=None):
+    """
+    Embedding stored with a memory in the index, for vector search.
+
+    The title and content embeddings are normalized and weighted as in
+    semantic_top_k, so the dot product with a normalized query embedding is
+    the memory's semantic search score.
+
+    Args:
+        memory (dict): Memory to embed
+        cache (ScoreCache, optional): Cache of embeddings; defaults to the
+            module-level score_cache
+
+    Returns:
+        numpy.ndarray: The embedding, or None without a model
+    """
+    if model is None:
+        return None
+    if cache is None:
+        cache = score_cache
+
+    texts, weights = [], []
+    if memory.get('title'):
+        texts.append(memory['title'])
+        weights.append(0.4)
+    if 'content' in memory:
+        texts.append(content_excerpt(memory, 200))
+        weights.append(0.6)
+    if not texts:
+        return None
+
+    embeddings = np.asarray(cache.encode(model, texts), dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (np.asarray(weights, dtype=np.float32)[:, None] * embeddings / norms).sum(axis=0)
+
+def embed_query(query, cache=None):
+    """
+    Embed a query for the index's vector search.
+
+    Args:
+        query (str): The search query
+        cache (ScoreCache, optional): Cache of embeddings; defaults to the
+            module-level score_cache
+
+    Returns:
+        numpy.ndarray: The embedding, or None without a model
+    """
+    if model is None:
+        return None
+    if cache is None:
+        cache = score_cache
+    entry = cache.query_scores(query)
+    if entry['embedding'] is None:
+        entry['embedding'] = cache.encode(model, [query])[0]
+    return entry['embedding']
+
+def search_memories(query, memories, top_k=10, offset=0, cache=None, reranker=None):
     """
     Search for memories matching the query
     
@@ -17,48 +97,95 @@ def search_memories(query, memories, top_k=10):
         query (str): The search query
         memories (list): List of memory dictionaries
         top_k (int): Number of results to return
+        offset (int): Number of top results to skip, for paging
+        cache (ScoreCache, optional): Cache of embeddings and partial scores;
+            defaults to the module-level score_cache
+        reranker (Reranker, optional): Second stage for the best candidates;
+            defaults to the module-level rerank_stage, if one is configured
         
     Returns:
         list: Sorted list of matching memories
     """
+    if reranker is None:
+        reranker = rerank_stage
+    if reranker is None:
+        return [memory for memory, _ in semantic_top_k(query, memories, top_k, offset, cache)]
+    
+    # Re-rank a fixed candidate pool, so pages come from one consistent order
+    candidates = semantic_top_k(query, memories, max(offset + top_k, reranker.top_n), 0, cache)
+    return [memory for memory, _ in reranker.rerank(query, candidates)[offset:offset + top_k]]
+
+def semantic_top_k(query, memories, top_k=10, offset=0, cache=None):
+    """
+    Score memories against the query and return the best ones with scores
+    
+    Args:
+        query (str): The search query
+        memories (list): List of memory dictionaries
+        top_k (int): Number of results to return
+        offset (int): Number of top results to skip, for paging
+        cache (ScoreCache, optional): Cache of embeddings and partial scores
+        
+    Returns:
+        list: (memory, score) pairs sorted by descending score
+    """
     if not memories:
         return []
         
     # If no model is available, fall back to simple keyword matching
     if model is None:
-        return keyword_search(query, memories, top_k)
-        
-    # Get query embedding
-    query_embedding = model.encode([query])[0]
+        return keyword_top_k(query, memories, offset + top_k)[offset:]
     
-    # Calculate scores for each memory
-    scores = []
+    if cache is None:
+        cache = score_cache
     
-    for i, memory in enumerate(memories):
-        score = 0
-        
+    # Partial scores from earlier runs of this query are reused, so filtering,
+    # paging or raising top_k only scores memories not seen for it yet
+    query_embedding = embed_query(query, cache)
+    partial_scores = cache.query_scores(query)['scores']
+    
+    keys = [memory_key(memory) for memory in memories]
+    unscored = [i for i, key in enumerate(keys) if key not in partial_scores]
+    
+    if unscored:
         # Check title
-        if 'title' in memory:
-            title_embedding = model.encode([memory['title']])[0]
-            title_score = cosine_similarity([query_embedding], [title_embedding])[0][0]
-            score += title_score * 0.4  # Give title higher weight
+        # Empty titles are skipped, as in embed_memory, so both score the same text
+        titled = [i for i in unscored if memories[i].get('title')]
+        title_scores = {}
+        if titled:
+            title_embeddings = cache.encode(model, [memories[i]['title'] for i in titled])
+            similarities = cosine_similarity([query_embedding], title_embeddings)[0]
+            title_scores = dict(zip(titled, similarities))
         
         # Check content
-        if 'content' in memory:
+        with_content = [i for i in unscored if 'content' in memories[i]]
+        content_scores = {}
+        if with_content:
             # For simplicity, we'll just embed the first 200 chars of content
-            content = memory['content'][:200]
-            content_embedding = model.encode([content])[0]
-            content_score = cosine_similarity([query_embedding], [content_embedding])[0][0]
-            score += content_score * 0.6
+            content_embeddings = cache.encode(model, [content_excerpt(memories[i], 200) for i in with_content])
+            similarities = cosine_similarity([query_embedding], content_embeddings)[0]
+            content_scores = dict(zip(with_content, similarities))
         
-        scores.append((i, score))
+        for i in unscored:
+            partial_scores[keys[i]] = (title_scores.get(i), content_scores.get(i))
     
-    # Sort by score and get top_k
-    scores.sort(key=lambda x: x[1], reverse=True)
-    top_indices = [idx for idx, _ in scores[:top_k]]
+    # Calculate scores for each memory
+    scores = np.zeros(len(memories))
+    for i, key in enumerate(keys):
+        title_score, content_score = partial_scores[key]
+        if title_score is not None:
+            scores[i] += title_score * 0.4  # Give title higher weight
+        if content_score is not None:
+            scores[i] += content_score * 0.6
+    
+    # Select top_k without sorting the whole corpus
+    top_indices = top_k_indices(scores, offset + top_k)[offset:]
+    
+    # New embeddings and scores may have pushed the caches over budget
+    memory_budget.enforce()
     
     # Return matched memories
-    return [memories[idx] for idx in top_indices]
+    return [(memories[idx], float(scores[idx])) for idx in top_indices]
 
 def keyword_search(query, memories, top_k=10):
     """
@@ -72,42 +199,4 @@ def keyword_search(query, memories, top_k=10):
     Returns:
         list: Sorted list of matching memories
     """
-    query_terms = query.lower().split()
-    results = []
-    
-    for memory in memories:
-        score = 0
-        
-        # Check title
-        if 'title' in memory:
-            title = memory['title'].lower()
-            for term in query_terms:
-                if term in title:
-                    score += 10  # Higher weight for title matches
-        
-        # Check content
-        if 'content' in memory:
-            content = memory['content'].lower()
-            for term in query_terms:
-                score += content.count(term) * 2
-        
-        # Check entities
-        if 'entities' in memory and memory['entities']:
-            for entity in memory['entities']:
-                if isinstance(entity, dict):
-                    entity_text = entity.get('text', '').lower()
-                else:
-                    entity_text = str(entity).lower()
-                    
-                for term in query_terms:
-                    if term in entity_text:
-                        score += 5  # Higher weight for entity matches
-        
-        if score > 0:
-            results.append((memory, score))
-    
-    # Sort by score
-    results.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top k memories
-    return [memory for memory, _ in results[:top_k]]
\ No newline at end of file
+    return [memory for memory, _ in keyword_top_k(query, memories, top_k)]
\ No newline at end of file
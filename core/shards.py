@@ -0,0 +1,299 @@
+import bisect
+import hashlib
+import random
+import threading
+import time
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing.connection import Listener, Client
+from core.topk import TopK, keyword_top_k
+
+# Scores from every search mode depend only on the query and the memory
+# itself (no corpus-wide statistics), so each shard's local top-k contains
+# every memory that can make the global top-k.  The coordinator tags each
+# memory with a global ordinal when it is added, and merges on
+# (score, -ordinal) so ties resolve exactly as a single-process search over
+# the memories in insertion order would.
+
+class HashPartitioner:
+    """Assigns memories to shards by a stable hash of their id."""
+
+    def __init__(self, num_shards):
+        self.num_shards = num_shards
+
+    def shard_for(self, memory):
+        digest = hashlib.md5(str(memory.get('id')).encode()).digest()
+        return int.from_bytes(digest[:8], 'little') % self.num_shards
+
+    def shards_for_range(self, start=None, end=None):
+        return list(range(self.num_shards))
+
+class DateRangePartitioner:
+    """
+    Assigns memories to shards by date.
+
+    With boundaries [b1, b2, ...], shard 0 holds dates before b1, shard 1
+    holds [b1, b2), and so on. Memories without a date go to the last shard.
+    """
+
+    def __init__(self, boundaries):
+        self.boundaries = sorted(boundaries)
+        self.num_shards = len(self.boundaries) + 1
+
+    def shard_for(self, memory):
+        date = memory.get('date')
+        if not isinstance(date, datetime):
+            return self.num_shards - 1
+        return bisect.bisect_right(self.boundaries, date)
+
+    def shards_for_range(self, start=None, end=None):
+        """Return the shards that may hold dates in [start, end]."""
+        first = 0 if start is None else bisect.bisect_right(self.boundaries, start)
+        last = self.num_shards - 1 if end is None else bisect.bisect_right(self.boundaries, end)
+        shards = list(range(first, last + 1))
+        # Undated memories always live in the last shard
+        if self.num_shards - 1 not in shards:
+            shards.append(self.num_shards - 1)
+        return shards
+
+def _score(mode, query, memories, top_k):
+    if mode == 'keyword':
+        return keyword_top_k(query, memories, top_k)
+    if mode == 'semantic':
+        # Imported lazily so keyword-only shards don't load the model
+        from core.serach_engine import semantic_top_k
+        return semantic_top_k(query, memories, top_k)
+    raise ValueError(f"Unknown search mode: {mode}")
+
+class LocalShard:
+    """In-process shard, used directly or behind a socket by serve_shard."""
+
+    def __init__(self):
+        self.memories = []
+        self.ordinals = {}
+
+    def add(self, tagged):
+        for ordinal, memory in tagged:
+            self.ordinals[id(memory)] = ordinal
+            self.memories.append(memory)
+        return len(self.memories)
+
+    def search(self, query, top_k, mode='keyword'):
+        results = _score(mode, query, self.memories, top_k)
+        return [(self.ordinals[id(memory)], score, memory) for memory, score in results]
+
+    def stats(self):
+        return {'memories': len(self.memories)}
+
+def serve_shard(address_queue, authkey):
+    """
+    Run a LocalShard behind a socket until told to close.
+
+    Args:
+        address_queue (multiprocessing.Queue): Receives the bound address
+        authkey (bytes): Shared secret for connections
+    """
+    shard = LocalShard()
+    with Listener(('127.0.0.1', 0), authkey=authkey) as listener:
+        address_queue.put(listener.address)
+        while True:
+            with listener.accept() as conn:
+                while True:
+                    try:
+                        command, args = conn.recv()
+                    except EOFError:
+                        break
+                    if command == 'close':
+                        conn.send(None)
+                        return
+                    try:
+                        conn.send(('ok', getattr(shard, command)(*args)))
+                    except Exception as e:
+                        conn.send(('error', repr(e)))
+
+class RemoteShard:
+    """Client for a shard served over a socket by serve_shard."""
+
+    def __init__(self, address, authkey, process=None):
+        self.address = address
+        self.process = process
+        self._conn = Client(address, authkey=authkey)
+        self._lock = threading.Lock()
+
+    def _call(self, command, *args):
+        with self._lock:
+            self._conn.send((command, args))
+            status, result = self._conn.recv()
+        if status == 'error':
+            raise RuntimeError(f"Shard {self.address} failed: {result}")
+        return result
+
+    def add(self, tagged):
+        # Snapshot-backed memories can't cross a process boundary
+        return self._call('add', [(ordinal, dict(memory)) for ordinal, memory in tagged])
+
+    def search(self, query, top_k, mode='keyword'):
+        return self._call('search', query, top_k, mode)
+
+    def stats(self):
+        return self._call('stats')
+
+    def close(self):
+        with self._lock:
+            try:
+                self._conn.send(('close', ()))
+                self._conn.recv()
+            except (EOFError, OSError):
+                pass
+            self._conn.close()
+        if self.process is not None:
+            self.process.join(timeout=5)
+
+def start_local_shards(num_shards, authkey=None):
+    """
+    Spawn shard worker processes on this machine.
+
+    Args:
+        num_shards (int): Number of shard processes
+        authkey (bytes, optional): Shared secret; random when omitted
+
+    Returns:
+        list: Connected RemoteShard clients
+    """
+    authkey = authkey or random.randbytes(16)
+    context = mp.get_context('spawn')
+    address_queue = context.Queue()
+    shards = []
+    for _ in range(num_shards):
+        process = context.Process(target=serve_shard, args=(address_queue, authkey), daemon=True)
+        process.start()
+        shards.append(RemoteShard(address_queue.get(timeout=30), authkey, process))
+    return shards
+
+class ShardedSearch:
+    """
+    Scatter-gather coordinator over a set of shards.
+
+    Memories are routed to shards by a partitioner. Queries go to every
+    relevant shard in parallel, each shard returns its local top_k, and the
+    coordinator merges them into the global top_k.
+    """
+
+    def __init__(self, shards, partitioner=None):
+        self.shards = shards
+        self.partitioner = partitioner or HashPartitioner(len(shards))
+        if self.partitioner.num_shards != len(shards):
+            raise ValueError("Partitioner and shard count don't match")
+        self._next_ordinal = 0
+        self._executor = ThreadPoolExecutor(max_workers=len(shards), thread_name_prefix="shard")
+
+    def add(self, memories):
+        """Partition memories and send each batch to its shard."""
+        batches = [[] for _ in self.shards]
+        for memory in memories:
+            batches[self.partitioner.shard_for(memory)].append((self._next_ordinal, memory))
+            self._next_ordinal += 1
+        list(self._executor.map(lambda pair: pair[0].add(pair[1]) if pair[1] else None,
+                                zip(self.shards, batches)))
+
+    def search(self, query, top_k=10, mode='keyword', date_range=None):
+        """
+        Search all relevant shards and merge their results.
+
+        Args:
+            query (str): The search query
+            top_k (int): Number of results to return
+            mode (str): 'keyword' or 'semantic'
+            date_range (tuple, optional): (start, end) datetimes; with a date
+                partitioner, shards outside the range are skipped
+
+        Returns:
+            list: Up to top_k (memory, score) pairs
+        """
+        targets = [self.shards[i] for i in self.partitioner.shards_for_range(*(date_range or (None, None)))]
+        futures = [self._executor.submit(shard.search, query, top_k, mode) for shard in targets]
+
+        heap = TopK(top_k)
+        for future in futures:
+            for ordinal, score, memory in future.result():
+                # Lower ordinals win ties, as in a single ordered scan
+                heap.push((ordinal, memory), (score, -ordinal))
+        return [(memory, score[0]) for (_, memory), score in heap.items()]
+
+    def close(self):
+        for shard in self.shards:
+            if hasattr(shard, 'close'):
+                shard.close()
+        self._executor.shutdown(wait=True)
+
+def _synthetic_memories(count, seed=0):
+    rng = random.Random(seed)
+    words = ["meeting", "project", "budget", "travel", "photos", "research", "notes",
+             "recipe", "tokyo", "london", "acme", "family", "draft", "review", "plan"]
+    start = datetime(2022, 1, 1)
+    return [{
+        'id': f"synthetic-{i}",
+        'title': " ".join(rng.sample(words, 2)).title(),
+        'content': " ".join(rng.choices(words, k=rng.randint(5, 40))),
+        'date': start + timedelta(days=rng.randint(0, 730)),
+        'type': rng.choice(['document', 'image', 'audio', 'web']),
+    } for i in range(count)]
+
+def run_harness(num_shards=4, num_memories=20000, queries=None, top_k=10, partition='hash'):
+    """
+    Spin up local shard processes and check them against a single process.
+
+    Builds a synthetic corpus, loads it into num_shards shard processes, and
+    verifies that sharded keyword search returns exactly the single-process
+    keyword_top_k results for each query.
+
+    Returns:
+        dict: Mismatch count and mean latencies in milliseconds
+    """
+    memories = _synthetic_memories(num_memories)
+    queries = queries or ["project budget", "tokyo photos", "family travel notes", "draft", "acme review plan"]
+
+    if partition == 'date':
+        step = timedelta(days=730 // num_shards)
+        partitioner = DateRangePartitioner([datetime(2022, 1, 1) + step * i for i in range(1, num_shards)])
+    else:
+        partitioner = HashPartitioner(num_shards)
+
+    search = ShardedSearch(start_local_shards(num_shards), partitioner)
+    try:
+        search.add(memories)
+        mismatches = 0
+        sharded_ms = []
+        single_ms = []
+        for query in queries:
+            start = time.perf_counter()
+            sharded = search.search(query, top_k)
+            sharded_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            single = keyword_top_k(query, memories, top_k)
+            single_ms.append((time.perf_counter() - start) * 1000)
+
+            if [(m['id'], s) for m, s in sharded] != [(m['id'], s) for m, s in single]:
+                mismatches += 1
+    finally:
+        search.close()
+
+    return {
+        'shards': num_shards,
+        'memories': num_memories,
+        'mismatches': mismatches,
+        'sharded_ms': sum(sharded_ms) / len(sharded_ms),
+        'single_ms': sum(single_ms) / len(single_ms),
+    }
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run sharded search against local shard processes")
+    parser.add_argument('--shards', type=int, default=4)
+    parser.add_argument('--memories', type=int, default=20000)
+    parser.add_argument('--partition', choices=['hash', 'date'], default='hash')
+    args = parser.parse_args()
+    print(run_harness(args.shards, args.memories, partition=args.partition))
@@ -0,0 +1,371 @@
+import os
+import json
+import mmap
+import struct
+import zlib
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timedelta
+import numpy as np
+
+# File layout (all integers little-endian):
+#
+#   header   MAGIC, version, flags, record count, section count
+#   table    one (name, offset, length) entry per section
+#   sections 8-byte aligned column arrays and byte heaps
+#
+# String columns are uint64 offset arrays into a shared heap of
+# length-prefixed UTF-8 strings.  Numeric columns are fixed-width arrays with
+# a parallel presence mask.  Content lives in its own heap so it can be
+# compressed per record and decoded only when a memory's content is read.
+# Fields that don't fit the columns are kept per record as a JSON blob.
+
+MAGIC = b'PMSS'
+VERSION = 1
+
+FLAG_COMPRESSED_CONTENT = 0x1
+
+_HEADER = struct.Struct('<4sHHQII')
+_SECTION = struct.Struct('<32sQQ')
+_LENGTH = struct.Struct('<I')
+
+_NULL = np.uint64(0xFFFFFFFFFFFFFFFF)
+_EPOCH = datetime(1970, 1, 1)
+
+STRING_COLUMNS = ('id', 'title', 'type', 'source', 'file_path', 'file_name', 'file_extension')
+NUMERIC_COLUMNS = {
+    'date': np.int64,        # microseconds since the epoch
+    'sentiment': np.float64,
+    'file_size': np.int64,
+    'image_hash': np.uint64,  # 64-bit perceptual hash
+}
+
+def json_default(value):
+    """json.dumps default hook that encodes datetimes."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not snapshot serializable")
+
+def json_object_hook(obj):
+    """json.loads object hook that decodes json_default datetimes."""
+    if '__datetime__' in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+def _fits_numeric(name, value):
+    if name == 'date':
+        return isinstance(value, datetime) and value.tzinfo is None
+    if isinstance(value, bool):
+        return False
+    if NUMERIC_COLUMNS[name] is np.int64:
+        return isinstance(value, (int, np.integer)) and -2**63 <= value < 2**63
+    if NUMERIC_COLUMNS[name] is np.uint64:
+        return isinstance(value, (int, np.integer)) and 0 <= value < 2**64
+    return isinstance(value, (int, float, np.integer, np.floating))
+
+def _to_micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+def _align(buffer):
+    buffer.extend(b'\0' * (-len(buffer) % 8))
+
+def write_snapshot(memories, path, compress_content=True):
+    """
+    Write memories to a binary snapshot file.
+
+    The file is written to a temporary path and renamed into place, so readers
+    never observe a partially written snapshot.
+
+    Args:
+        memories (list): List of memory dictionaries
+        path (str): Destination file path
+        compress_content (bool): zlib-compress each memory's content
+
+    Returns:
+        int: Number of memories written
+    """
+    count = len(memories)
+    heap = bytearray()
+    interned = {}
+
+    def add_string(text):
+        if text not in interned:
+            interned[text] = len(heap)
+            data = text.encode('utf-8')
+            heap.extend(_LENGTH.pack(len(data)))
+            heap.extend(data)
+        return interned[text]
+
+    string_offsets = {name: np.full(count, _NULL, dtype=np.uint64) for name in STRING_COLUMNS}
+    numeric_values = {name: np.zeros(count, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+    numeric_present = {name: np.zeros(count, dtype=np.uint8) for name in NUMERIC_COLUMNS}
+    extras_offsets = np.full(count, _NULL, dtype=np.uint64)
+
+    content_heap = bytearray()
+    content_offsets = np.full(count, _NULL, dtype=np.uint64)
+
+    for i, memory in enumerate(memories):
+        extras = {}
+
+        for key, value in memory.items():
+            if key in string_offsets and isinstance(value, str):
+                string_offsets[key][i] = add_string(value)
+            elif key in numeric_values and _fits_numeric(key, value):
+                numeric_values[key][i] = _to_micros(value) if key == 'date' else value
+                numeric_present[key][i] = 1
+            elif key == 'content' and isinstance(value, str):
+                data = value.encode('utf-8')
+                if compress_content:
+                    data = zlib.compress(data)
+                content_offsets[i] = len(content_heap)
+                content_heap.extend(_LENGTH.pack(len(data)))
+                content_heap.extend(data)
+            else:
+                extras[key] = value
+
+        if extras:
+            extras_offsets[i] = add_string(json.dumps(extras, default=json_default))
+
+    sections = [(f'str:{name}', offsets.tobytes()) for name, offsets in string_offsets.items()]
+    for name in NUMERIC_COLUMNS:
+        sections.append((f'num:{name}', numeric_values[name].tobytes()))
+        sections.append((f'has:{name}', numeric_present[name].tobytes()))
+    sections += [
+        ('extras', extras_offsets.tobytes()),
+        ('heap', bytes(heap)),
+        ('content_offsets', content_offsets.tobytes()),
+        ('content', bytes(content_heap)),
+    ]
+
+    flags = FLAG_COMPRESSED_CONTENT if compress_content else 0
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, flags, count, len(sections), 0))
+    table_start = len(out)
+    out.extend(b'\0' * (_SECTION.size * len(sections)))
+    _align(out)
+
+    for n, (name, data) in enumerate(sections):
+        offset = len(out)
+        out.extend(data)
+        _align(out)
+        _SECTION.pack_into(out, table_start + n * _SECTION.size, name.encode('ascii'), offset, len(data))
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(out)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    return count
+
+class Snapshot(Sequence):
+    """
+    Read-only, memory-mapped view over a snapshot file.
+
+    Opening a snapshot only parses the header and section table. Column arrays
+    are numpy views over the mapping, and strings and content are decoded on
+    access, so only the pages that are actually touched are read from disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            self._file.close()
+            raise ValueError(f"{path} is not a memory snapshot")
+
+        magic, version, self.flags, self._count, n_sections, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a memory snapshot")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"Snapshot version {version} is newer than supported version {VERSION}")
+        self.version = version
+
+        self._sections = {}
+        for n in range(n_sections):
+            name, offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + n * _SECTION.size)
+            self._sections[name.rstrip(b'\0').decode('ascii')] = (offset, length)
+
+        self._string_offsets = {name: self._array(f'str:{name}', np.uint64) for name in STRING_COLUMNS}
+        self._numeric_values = {name: self._array(f'num:{name}', dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self._numeric_present = {name: self._array(f'has:{name}', np.uint8) for name in NUMERIC_COLUMNS}
+        # Snapshots written before a column was added simply lack its sections
+        for name, dtype in NUMERIC_COLUMNS.items():
+            if self._numeric_values[name] is None:
+                self._numeric_values[name] = np.zeros(self._count, dtype=dtype)
+                self._numeric_present[name] = np.zeros(self._count, dtype=np.uint8)
+        self._extras = self._array('extras', np.uint64)
+        self._content_offsets = self._array('content_offsets', np.uint64)
+        self._heap_start = self._sections['heap'][0]
+        self._content_start = self._sections['content'][0]
+
+    def _array(self, section, dtype):
+        if section not in self._sections and section.startswith(('num:', 'has:')):
+            return None
+        offset, length = self._sections[section]
+        return np.frombuffer(self._mmap, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=offset)
+
+    def _read_bytes(self, start, offset):
+        position = start + int(offset)
+        (length,) = _LENGTH.unpack_from(self._mmap, position)
+        return self._mmap[position + _LENGTH.size:position + _LENGTH.size + length]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("snapshot index out of range")
+        return LazyMemory(self, index)
+
+    def close(self):
+        # Drop numpy views first, otherwise the mapping refuses to close
+        self._string_offsets = self._numeric_values = self._numeric_present = {}
+        self._extras = self._content_offsets = None
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def column(self, name):
+        """
+        Return a numeric column as a numpy array view.
+
+        Args:
+            name (str): One of the numeric column names
+
+        Returns:
+            tuple: (values, present) arrays; values are undefined where present is 0
+        """
+        return self._numeric_values[name], self._numeric_present[name]
+
+    def string(self, name, index):
+        offset = self._string_offsets[name][index]
+        if offset == _NULL:
+            return None
+        return self._read_bytes(self._heap_start, offset).decode('utf-8')
+
+    def content(self, index):
+        offset = self._content_offsets[index]
+        if offset == _NULL:
+            return None
+        data = self._read_bytes(self._content_start, offset)
+        if self.flags & FLAG_COMPRESSED_CONTENT:
+            data = zlib.decompress(data)
+        return data.decode('utf-8')
+
+    def numeric(self, name, index):
+        if not self._numeric_present[name][index]:
+            return None
+        value = self._numeric_values[name][index]
+        if name == 'date':
+            return _EPOCH + timedelta(microseconds=int(value))
+        return value.item()
+
+    def extras(self, index):
+        offset = self._extras[index]
+        if offset == _NULL:
+            return {}
+        return json.loads(self._read_bytes(self._heap_start, offset), object_hook=json_object_hook)
+
+    def keys(self, index):
+        keys = [name for name in STRING_COLUMNS if self._string_offsets[name][index] != _NULL]
+        keys += [name for name in NUMERIC_COLUMNS if self._numeric_present[name][index]]
+        if self._content_offsets[index] != _NULL:
+            keys.append('content')
+        keys += list(self.extras(index))
+        return keys
+
+    def memories(self):
+        """Return all records as LazyMemory objects."""
+        return [LazyMemory(self, i) for i in range(self._count)]
+
+class LazyMemory(Mapping):
+    """
+    Read-only memory record backed by a Snapshot.
+
+    Fields are decoded from the mapping on each access and never cached, so
+    holding many of these costs little more than the list that contains them.
+    """
+
+    __slots__ = ('_snapshot', '_index')
+
+    def __init__(self, snapshot, index):
+        self._snapshot = snapshot
+        self._index = index
+
+    def __getitem__(self, key):
+        snapshot = self._snapshot
+        if key in STRING_COLUMNS:
+            value = snapshot.string(key, self._index)
+            if value is not None:
+                return value
+        elif key in NUMERIC_COLUMNS:
+            value = snapshot.numeric(key, self._index)
+            if value is not None:
+                return value
+        elif key == 'content':
+            value = snapshot.content(self._index)
+            if value is not None:
+                return value
+        return snapshot.extras(self._index)[key]
+
+    def __contains__(self, key):
+        snapshot = self._snapshot
+        if key in STRING_COLUMNS and snapshot._string_offsets[key][self._index] != _NULL:
+            return True
+        if key in NUMERIC_COLUMNS and snapshot._numeric_present[key][self._index]:
+            return True
+        if key == 'content' and snapshot._content_offsets[self._index] != _NULL:
+            return True
+        return key in snapshot.extras(self._index)
+
+    def __iter__(self):
+        return iter(self._snapshot.keys(self._index))
+
+    def __len__(self):
+        return len(self._snapshot.keys(self._index))
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+def load_snapshot(path):
+    """
+    Open a snapshot file for lazy, memory-mapped access.
+
+    Args:
+        path (str): Path to the snapshot file
+
+    Returns:
+        Snapshot: Sequence of LazyMemory records
+    """
+    return Snapshot(path)
+
+def read_memories(path):
+    """
+    Load every memory in a snapshot as a plain dictionary.
+
+    Args:
+        path (str): Path to the snapshot file
+
+    Returns:
+        list: List of memory dictionaries
+    """
+    with Snapshot(path) as snapshot:
+        return [memory.to_dict() for memory in snapshot.memories()]
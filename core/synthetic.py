@@ -0,0 +1,278 @@
+import os
+import json
+import time
+from string import Formatter
+from datetime import datetime, timedelta
+import numpy as np
+from core.segments import MANIFEST, write_segment, write_json
+
+# Vocabularies shared by the demo data in the app and the bulk generator
+
+MEMORY_TYPES = ['document', 'image', 'audio', 'web']
+
+TITLES = [
+    "Meeting with Marketing Team", "Project Proposal Draft",
+    "Vacation Photos from Hawaii", "Research Notes on AI",
+    "Birthday Party Recording", "Tax Documents 2023",
+    "Home Renovation Plans", "Recipe Collection",
+    "Travel Itinerary - Europe Trip", "Podcast Interview",
+    "Family Reunion Photos", "Book Notes - Think Again",
+    "Website Design Mockups", "Personal Budget Spreadsheet",
+    "Medical Records", "Conference Presentation",
+    "Wine Tasting Notes", "Hiking Trip Photos",
+    "Car Maintenance Records", "Movie Reviews"
+]
+
+CONTENT_TEMPLATES = [
+    "This document contains {topic} that I worked on in {timeframe}.",
+    "Notes from my research about {topic} that I found very interesting.",
+    "Collection of {topic} that I want to remember for future reference.",
+    "Important information about {topic} that I need for {purpose}.",
+    "Ideas and thoughts about {topic} that came up during {activity}."
+]
+
+TOPICS = [
+    "artificial intelligence", "renewable energy", "digital photography",
+    "home improvement", "financial planning", "machine learning",
+    "nutrition and diet", "travel destinations", "productivity techniques",
+    "web development", "mental health", "sustainability practices"
+]
+
+PEOPLE = [
+    "John Smith", "Emma Johnson", "Michael Brown", "Lisa Davis",
+    "Robert Wilson", "Sarah Miller", "David Anderson", "Jennifer Thomas"
+]
+
+ORGANIZATIONS = [
+    "Acme Corp", "TechNova", "Global Solutions", "Evergreen Industries",
+    "Summit Enterprises", "Horizon Healthcare", "Pinnacle Partners", "Quantum Research"
+]
+
+LOCATIONS = [
+    "New York", "San Francisco", "Tokyo", "London", "Paris",
+    "Sydney", "Toronto", "Berlin", "Singapore", "Barcelona"
+]
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August',
+          'September', 'October', 'November', 'December']
+ACTIVITIES = ["a meeting", "my research", "a workshop", "a conversation", "my travels"]
+PURPOSES = ["work", "personal projects", "planning", "reference", "learning"]
+IMAGE_SUBJECTS = ['an important moment', 'a beautiful scene', 'a key diagram', 'a memorable event']
+SOURCES = ["Local Drive", "Cloud Storage", "Email", "Browser", "Mobile Device"]
+
+# Per-type sentence appended to the content; {detail} is pages, subject or minutes
+TYPE_TEMPLATES = {
+    'document': " This document is {detail} pages long and covers key points about {topic}.",
+    'image': " This image captures {detail} related to {topic}.",
+    'audio': " This audio recording is {detail} minutes long and includes discussions about {topic}.",
+    'web': " This webpage contains valuable information about {topic} that I bookmarked for future reference.",
+}
+
+# Extra content words, most common first; drawn with Zipfian frequencies
+FILLER_WORDS = list(dict.fromkeys(
+    "time people year day thing work life world school state family group country problem hand part "
+    "place case week company system program question government number night point home water room "
+    "mother area money story fact month lot right study book eye job word business issue side kind "
+    "head house service friend father power hour game line end member law car city community name "
+    "president team minute idea kid body information back parent face others level office door health "
+    "person art war history party result change morning reason research girl guy moment air teacher "
+    "force education".split()
+    + [word.lower() for text in TITLES + TOPICS for word in text.split() if word.isalpha()]))
+
+def zipf_probabilities(n, exponent=1.1):
+    """Probabilities proportional to 1 / rank ** exponent for ranks 1..n."""
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def _format_column(templates, choices, fields):
+    """
+    Fill templates for every row at once.
+
+    Each row uses templates[choices[row]]; fields map placeholder names to
+    object arrays with one string per row. Rows sharing a template are
+    filled together with elementwise string concatenation.
+
+    Returns:
+        np.ndarray: Object array of formatted strings
+    """
+    result = np.empty(len(choices), dtype=object)
+    for k, template in enumerate(templates):
+        rows = np.flatnonzero(choices == k)
+        if len(rows) == 0:
+            continue
+        column = np.full(len(rows), '', dtype=object)
+        for literal, name, _, _ in Formatter().parse(template):
+            column = column + literal
+            if name is not None:
+                column = column + fields[name][rows]
+        result[rows] = column
+    return result
+
+def _pick(rng, vocabulary, size, exponent=None):
+    """Draw words from a vocabulary, uniformly or with Zipfian frequencies."""
+    words = np.array(vocabulary, dtype=object)
+    p = zipf_probabilities(len(words), exponent) if exponent else None
+    return words[rng.choice(len(words), size=size, p=p)]
+
+def _entity_lists(rng, count, exponent):
+    """Entity lists per row: 1-3 people, 0-2 organizations and 0-2 locations."""
+    kinds = [('person', PEOPLE, 1, 3), ('organization', ORGANIZATIONS, 0, 2), ('location', LOCATIONS, 0, 2)]
+    entities = [[] for _ in range(count)]
+    for entity_type, vocabulary, low, high in kinds:
+        per_row = rng.integers(low, high + 1, size=count)
+        texts = _pick(rng, vocabulary, int(per_row.sum()), exponent).tolist()
+        rows = np.repeat(np.arange(count), per_row).tolist()
+        for row, text in zip(rows, texts):
+            entities[row].append({"type": entity_type, "text": text})
+    return entities
+
+def generate_chunk(rng, start_id, count, start_date, end_date, exponent=1.1, filler_words=40):
+    """
+    Generate a chunk of synthetic memories column by column.
+
+    Titles, topics, filler words and entities follow Zipfian frequencies, so
+    a few terms are very common and most are rare, as in real corpora.
+
+    Args:
+        rng (np.random.Generator): Random source
+        start_id (int): Number of the first memory, used for its id
+        count (int): Number of memories
+        start_date (datetime): Earliest memory date
+        end_date (datetime): Latest memory date
+        exponent (float): Zipf exponent for titles, topics, words and entities
+        filler_words (int): Mean number of extra content words per memory
+
+    Returns:
+        list: List of memory dictionaries
+    """
+    types = rng.integers(0, len(MEMORY_TYPES), size=count)
+    topics = _pick(rng, TOPICS, count, exponent)
+    titles = _pick(rng, TITLES, count, exponent)
+
+    span = int((end_date - start_date).total_seconds())
+    seconds = rng.integers(0, span, size=count)
+    dates = (np.datetime64(start_date, 's') + seconds.astype('timedelta64[s]')).astype('datetime64[us]')
+    years = dates.astype('datetime64[Y]').astype(int) + 1970
+
+    fields = {
+        'topic': topics,
+        'timeframe': _pick(rng, MONTHS, count) + ' ' + years.astype(str).astype(object),
+        'activity': _pick(rng, ACTIVITIES, count),
+        'purpose': _pick(rng, PURPOSES, count),
+    }
+    content = _format_column(CONTENT_TEMPLATES, rng.integers(0, len(CONTENT_TEMPLATES), size=count), fields)
+
+    # The per-type detail: pages for documents, a subject for images, minutes for audio
+    details = np.full(count, '', dtype=object)
+    details[types == 0] = rng.integers(1, 21, size=int((types == 0).sum())).astype(str).astype(object)
+    details[types == 1] = _pick(rng, IMAGE_SUBJECTS, int((types == 1).sum()))
+    details[types == 2] = rng.integers(1, 121, size=int((types == 2).sum())).astype(str).astype(object)
+    content = content + _format_column([TYPE_TEMPLATES[t] for t in MEMORY_TYPES], types,
+                                       {'topic': topics, 'detail': details})
+
+    # Document lengths are roughly log-normal; words are Zipfian
+    lengths = np.minimum(rng.lognormal(np.log(max(filler_words, 1)), 0.6, size=count).astype(int),
+                         filler_words * 20)
+    words = _pick(rng, FILLER_WORDS, int(lengths.sum()), exponent).tolist()
+    bounds = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+
+    entities = _entity_lists(rng, count, exponent)
+    sentiments = rng.uniform(-1, 1, size=count).tolist()
+    sources = _pick(rng, SOURCES, count).tolist()
+    sizes = rng.integers(10, 10001, size=count).tolist()
+
+    memories = []
+    for row, (memory_type, title, date, text) in enumerate(zip(types.tolist(), titles.tolist(),
+                                                                dates.tolist(), content.tolist())):
+        filler = ' '.join(words[bounds[row]:bounds[row + 1]])
+        memories.append({
+            "id": f"synthetic-{start_id + row:010d}",
+            "title": title,
+            "type": MEMORY_TYPES[memory_type],
+            "date": date,
+            "content": f"{text} {filler}" if filler else text,
+            "entities": entities[row],
+            "sentiment": sentiments[row],
+            "source": sources[row],
+            "file_size": sizes[row] if memory_type != 3 else None,
+        })
+    return memories
+
+def iter_corpus(count, chunk_size=100_000, seed=0, exponent=1.1, start_date=None, end_date=None,
+                filler_words=40):
+    """
+    Yield a synthetic corpus in chunks.
+
+    Each chunk draws from its own random stream derived from the seed and
+    the chunk's position, so the same arguments always give the same corpus.
+
+    Yields:
+        list: Up to chunk_size memory dictionaries
+    """
+    end_date = end_date or datetime(2025, 1, 1)
+    start_date = start_date or end_date - timedelta(days=365 * 2)
+    for start in range(0, count, chunk_size):
+        rng = np.random.default_rng([seed, start])
+        yield generate_chunk(rng, start, min(chunk_size, count - start), start_date, end_date,
+                             exponent, filler_words)
+
+def write_corpus(directory, count, chunk_size=100_000, seed=0, exponent=1.1, compress_content=True,
+                 progress=None):
+    """
+    Stream a synthetic corpus into an index directory, one segment per chunk.
+
+    Segments are written straight to disk and appended to the manifest, so
+    only one chunk is held in memory at a time and SegmentedIndex can open
+    the directory afterwards.
+
+    Args:
+        directory (str): Index directory; new segments are added to any already there
+        count (int): Number of memories
+        chunk_size (int): Memories per chunk and segment
+        seed (int): Random seed
+        exponent (float): Zipf exponent
+        compress_content (bool): Compress content in the segment snapshots
+        progress (callable, optional): Called with the number of memories written so far
+
+    Returns:
+        int: Number of memories written
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    manifest = {'next_generation': 1, 'next_segment': 1, 'segments': []}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    written = 0
+    for chunk in iter_corpus(count, chunk_size, seed, exponent):
+        name = f"seg_{manifest['next_segment']:08d}"
+        write_segment(directory, name, chunk, compress_content=compress_content)
+        manifest['segments'].append({'name': name, 'generation': manifest['next_generation'],
+                                     'count': len(chunk), 'tombstones': []})
+        manifest['next_segment'] += 1
+        manifest['next_generation'] += 1
+        write_json(manifest_path, manifest)
+        written += len(chunk)
+        if progress is not None:
+            progress(written)
+    return written
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic memory corpus for scale testing")
+    parser.add_argument('directory', help="Index directory to write segments to")
+    parser.add_argument('--count', type=int, default=1_000_000)
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--exponent', type=float, default=1.1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    def report(written):
+        elapsed = time.perf_counter() - started
+        print(f"{written:>12,} memories  {written / elapsed:10,.0f}/s")
+
+    write_corpus(args.directory, args.count, args.chunk_size, args.seed, args.exponent, progress=report)
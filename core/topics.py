@@ -0,0 +1,374 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+import numpy as np
+from core.content_store import content_excerpt
+
+_WORD = re.compile(r'[^\W\d_]{3,}')
+_STOPWORDS = frozenset("""
+about above after again against all also and any are because been before being below between both but
+can could did does doing down during each few file for from further had has have having her here hers
+him his how into its itself just more most not now off once only other our ours out over own same she
+should some such than that the their theirs them then there these they this those through too under
+until very was were what when where which while who whom why will with would you your yours document
+audio image notes photo content
+""".split())
+
+MAX_TERMS_PER_MEMORY = 32
+
+def memory_terms(memory):
+    """Return up to MAX_TERMS_PER_MEMORY distinct lowercase content words of a memory."""
+    # The excerpt, like memory_text, so tiered content isn't read back from disk
+    text = f"{memory.get('title', '')} {content_excerpt(memory, 200)}".lower()
+    terms = dict.fromkeys(word for word in _WORD.findall(text) if word not in _STOPWORDS)
+    return tuple(terms)[:MAX_TERMS_PER_MEMORY]
+
+def memory_text(memory):
+    # Matches the text semantic search embeds, so cached embeddings are shared
+    return content_excerpt(memory, 200) or memory.get('title', '')
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+class MiniBatchKMeans:
+    """
+    Spherical mini-batch k-means.
+
+    Vectors are compared by cosine similarity. Each batch moves a centroid
+    towards the mean of its members with a learning rate of
+    batch members / all members seen, so centroids settle as data accumulates.
+    """
+
+    def __init__(self, k, seed=0):
+        self.k = k
+        self.centroids = None
+        self.counts = np.zeros(k, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def fitted(self):
+        return self.centroids is not None
+
+    def _init_centroids(self, vectors):
+        # k-means++ seeding on the first batch
+        centroids = [vectors[self._rng.integers(len(vectors))]]
+        for _ in range(1, self.k):
+            distances = 1.0 - np.max(vectors @ np.array(centroids).T, axis=1)
+            distances = np.maximum(distances, 0.0)
+            total = distances.sum()
+            if total <= 0:
+                centroids.append(vectors[self._rng.integers(len(vectors))])
+            else:
+                centroids.append(vectors[self._rng.choice(len(vectors), p=distances / total)])
+        self.centroids = np.array(centroids, dtype=np.float32)
+
+    def partial_fit(self, vectors):
+        """
+        Update the centroids with a batch of vectors.
+
+        The first batch must hold at least k vectors.
+        """
+        vectors = _normalize(vectors)
+        if self.centroids is None:
+            if len(vectors) < self.k:
+                raise ValueError(f"Need at least {self.k} vectors to initialise")
+            self._init_centroids(vectors)
+
+        labels, _ = self.predict(vectors)
+        for topic in np.unique(labels):
+            members = vectors[labels == topic]
+            self.counts[topic] += len(members)
+            rate = len(members) / self.counts[topic]
+            self.centroids[topic] = (1 - rate) * self.centroids[topic] + rate * members.mean(axis=0)
+        self.centroids = _normalize(self.centroids)
+        return self
+
+    def predict(self, vectors):
+        """
+        Assign vectors to their nearest centroid.
+
+        Returns:
+            tuple: (labels, cosine similarities) arrays
+        """
+        similarities = _normalize(vectors) @ self.centroids.T
+        labels = np.argmax(similarities, axis=1)
+        return labels, similarities[np.arange(len(labels)), labels]
+
+class TopicIndex:
+    """
+    Incrementally maintained topics over memory embeddings.
+
+    New memories are embedded, folded into a mini-batch k-means model and
+    assigned to their nearest topic as they are indexed. Vectors are kept as
+    float16 so the model can be refitted from scratch in a background thread
+    every refit_every additions, after which every memory is reassigned.
+
+    Per-topic term counts are kept up to date with the assignments, so topic
+    labels, sizes and membership are answered in O(k) rather than by
+    comparing memories with each other.
+    """
+
+    def __init__(self, embed, k=12, refit_every=2000, batch_size=256, refit_epochs=5, seed=0, spill_path=None):
+        """
+        Args:
+            embed (callable): Maps a list of texts to an array of vectors
+            k (int): Number of topics
+            refit_every (int): Additions between background refits
+            batch_size (int): Mini-batch size used when refitting
+            refit_epochs (int): Passes over the stored vectors per refit
+            seed (int): Random seed for initialisation and batch sampling
+            spill_path (str, optional): File prefix the vectors move to when
+                shrink is called under memory pressure
+        """
+        self.embed = embed
+        self.k = k
+        self.refit_every = refit_every
+        self.batch_size = batch_size
+        self.refit_epochs = refit_epochs
+        self.seed = seed
+        self.spill_path = spill_path
+        self.model = MiniBatchKMeans(k, seed)
+
+        self._ids = []
+        self._rows = {}
+        self._vectors = None
+        self._terms = []
+        self._labels = np.zeros(0, dtype=np.int32)
+        self._topic_terms = [Counter() for _ in range(k)]
+        self._doc_freq = Counter()
+        self._since_refit = 0
+        self._refitting = False
+        self._spilled = False
+        self._spill_file = None
+        self._spill_generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _store(self, memory_id, vector, terms):
+        """Add or replace one memory's vector and terms; returns its row."""
+        row = self._rows.get(memory_id)
+        if row is None:
+            row = len(self._ids)
+            self._rows[memory_id] = row
+            self._ids.append(memory_id)
+            self._terms.append(())
+            if self._vectors is None:
+                self._vectors = self._allocate(64, len(vector))
+                self._labels = np.full(64, -1, dtype=np.int32)
+            elif row >= len(self._vectors):
+                # Grow by doubling so adding memories stays amortised O(1)
+                grown = self._allocate(len(self._vectors) * 2, self._vectors.shape[1])
+                grown[:row] = self._vectors[:row]
+                self._replace_vectors(grown)
+                self._labels = np.concatenate([self._labels, np.full(len(self._labels), -1, dtype=np.int32)])
+        else:
+            self._unassign(row)
+            self._doc_freq.subtract(self._terms[row])
+        self._vectors[row] = vector
+        self._terms[row] = terms
+        self._doc_freq.update(terms)
+        return row
+
+    def _allocate(self, rows, dimension):
+        """Zeroed vector storage, memory-mapped from a file once the index has spilled."""
+        if not self._spilled:
+            return np.zeros((rows, dimension), dtype=np.float16)
+        self._spill_generation += 1
+        path = f"{self.spill_path}.{self._spill_generation}.npy"
+        return np.lib.format.open_memmap(path, mode='w+', dtype=np.float16, shape=(rows, dimension))
+
+    def _replace_vectors(self, vectors):
+        old_file = self._spill_file
+        self._vectors = vectors
+        if isinstance(vectors, np.memmap):
+            self._spill_file = vectors.filename
+            if old_file is not None:
+                # Unlinking is safe while the old mapping is still open
+                os.remove(old_file)
+
+    def memory_usage(self):
+        """Bytes of vectors held in RAM; none once they are memory-mapped."""
+        if self._vectors is None or self._spilled:
+            return 0
+        return self._vectors.nbytes
+
+    def shrink(self, target_bytes):
+        """
+        Move the vectors to a memory-mapped file if they exceed target_bytes.
+
+        The operating system then pages them in and out as refits and
+        additions touch them.
+
+        Returns:
+            int: Bytes freed
+        """
+        with self._lock:
+            used = self.memory_usage()
+            if used <= target_bytes or self.spill_path is None:
+                return 0
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            self._spilled = True
+            spilled = self._allocate(*self._vectors.shape)
+            spilled[:] = self._vectors
+            self._replace_vectors(spilled)
+            return used
+
+    def _assign(self, row, topic):
+        self._labels[row] = topic
+        self._topic_terms[topic].update(self._terms[row])
+
+    def _unassign(self, row):
+        topic = self._labels[row]
+        if topic >= 0:
+            self._topic_terms[topic].subtract(self._terms[row])
+            self._labels[row] = -1
+
+    def add(self, memories):
+        """
+        Embed memories, update the model and assign them to topics.
+
+        Memories that are already indexed are reassigned, for example after
+        their content changed.
+
+        Args:
+            memories (list): List of memory dictionaries with ids
+        """
+        memories = [memory for memory in memories if memory.get('id') is not None]
+        if not memories:
+            return
+        vectors = _normalize(self.embed([memory_text(memory) for memory in memories]))
+
+        with self._lock:
+            rows = [self._store(memory['id'], vector, memory_terms(memory))
+                    for memory, vector in zip(memories, vectors)]
+
+            if not self.model.fitted:
+                # Wait for enough memories to seed k topics, then assign them all
+                if len(self._ids) < self.k:
+                    return
+                rows = list(range(len(self._ids)))
+                self.model.partial_fit(self._vectors[:len(self._ids)].astype(np.float32))
+            else:
+                self.model.partial_fit(vectors)
+
+            labels, _ = self.model.predict(self._vectors[rows].astype(np.float32))
+            for row, topic in zip(rows, labels):
+                self._unassign(row)
+                self._assign(row, int(topic))
+
+            self._since_refit += len(memories)
+            start_refit = self._since_refit >= self.refit_every and not self._refitting
+            if start_refit:
+                self._refitting = True
+                self._since_refit = 0
+
+        if start_refit:
+            threading.Thread(target=self.refit, daemon=True, name="topic-refit").start()
+
+    def update(self, memories):
+        """Add the memories that aren't indexed yet."""
+        self.add([memory for memory in memories if memory.get('id') not in self._rows])
+
+    def remove(self, memory_id):
+        """
+        Forget a deleted memory.
+
+        The last memory's row moves into its place, so rows stay contiguous.
+
+        Returns:
+            bool: False if it wasn't indexed
+        """
+        with self._lock:
+            row = self._rows.pop(memory_id, None)
+            if row is None:
+                return False
+            self._unassign(row)
+            self._doc_freq.subtract(self._terms[row])
+            last = len(self._ids) - 1
+            if row != last:
+                self._ids[row] = self._ids[last]
+                self._rows[self._ids[row]] = row
+                self._terms[row] = self._terms[last]
+                self._vectors[row] = self._vectors[last]
+                self._labels[row] = self._labels[last]
+            self._ids.pop()
+            self._terms.pop()
+            self._labels[last] = -1
+            return True
+
+    def refit(self):
+        """
+        Fit a fresh model over every stored vector and reassign all memories.
+
+        The fit runs without holding the lock, so additions continue; the
+        model is swapped in and everything is reassigned at the end.
+        """
+        try:
+            with self._lock:
+                count = len(self._ids)
+                vectors = self._vectors[:count].astype(np.float32) if count else None
+            if count < self.k:
+                return
+
+            model = MiniBatchKMeans(self.k, self.seed)
+            rng = np.random.default_rng(self.seed)
+            for _ in range(self.refit_epochs):
+                order = rng.permutation(count)
+                # The first batch seeds the centroids, so it needs at least k vectors
+                size = max(self.batch_size, self.k)
+                for start in range(0, count, size):
+                    batch = order[start:start + size]
+                    if model.fitted or len(batch) >= self.k:
+                        model.partial_fit(vectors[batch])
+
+            with self._lock:
+                self.model = model
+                self._topic_terms = [Counter() for _ in range(self.k)]
+                labels, _ = model.predict(self._vectors[:len(self._ids)].astype(np.float32))
+                self._labels[:] = -1
+                for row, topic in enumerate(labels):
+                    self._assign(row, int(topic))
+        finally:
+            self._refitting = False
+
+    def topic_of(self, memory_id):
+        """Return a memory's topic id, or None if it isn't assigned yet."""
+        row = self._rows.get(memory_id)
+        if row is None or self._labels[row] < 0:
+            return None
+        return int(self._labels[row])
+
+    def labels(self, num_terms=3):
+        """
+        Label each topic with its most distinctive terms.
+
+        Terms are ranked by their count in the topic times their inverse
+        document frequency across all memories.
+
+        Returns:
+            dict: Topic id -> label such as "budget · invoice · quarterly"
+        """
+        with self._lock:
+            total = max(len(self._ids), 1)
+            labels = {}
+            for topic, counts in enumerate(self._topic_terms):
+                candidates = [(term, count) for term, count in counts.most_common(50) if count > 0]
+                if not candidates:
+                    continue
+                ranked = sorted(candidates, key=lambda item: item[1] * math.log(total / self._doc_freq[item[0]]),
+                                reverse=True)
+                labels[topic] = " · ".join(term for term, _ in ranked[:num_terms])
+            return labels
+
+    def sizes(self):
+        """Return the number of memories assigned to each topic."""
+        with self._lock:
+            labels = self._labels[:len(self._ids)]
+            assigned = labels[labels >= 0]
+            counts = np.bincount(assigned, minlength=self.k)
+        return {topic: int(count) for topic, count in enumerate(counts) if count}
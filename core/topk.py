@@ -0,0 +1,185 @@
+import re
+import heapq
+import numpy as np
+
+_TOKEN = re.compile(r'\w+')
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    return _TOKEN.findall(text.lower())
+
+class TopK:
+    """
+    Bounded min-heap that keeps the k best (score, item) pairs seen so far.
+
+    Ties are broken in favour of the item pushed first, which matches the
+    ordering of a stable ``list.sort(reverse=True)`` over the same stream.
+    """
+
+    def __init__(self, k):
+        self.k = max(int(k), 0)
+        self._heap = []
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    @property
+    def full(self):
+        return len(self._heap) >= self.k
+
+    @property
+    def threshold(self):
+        """Score an item must strictly exceed to enter a full heap."""
+        if not self.full or not self._heap:
+            return float('-inf')
+        return self._heap[0][0]
+
+    def push(self, item, score):
+        """
+        Offer an item to the heap.
+
+        Returns:
+            bool: True if the item was kept
+        """
+        if self.k == 0:
+            return False
+
+        # Later items get a smaller tie-break key so they are evicted first
+        entry = (score, -self._seq, item)
+        self._seq += 1
+
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+
+        if score > self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+
+        return False
+
+    def items(self):
+        """Return the kept (item, score) pairs, best first."""
+        ordered = sorted(self._heap, key=lambda e: (e[0], e[1]), reverse=True)
+        return [(item, score) for score, _, item in ordered]
+
+def top_k_items(scored, k):
+    """
+    Select the k best items from a stream of (item, score) pairs.
+
+    Args:
+        scored (iterable): (item, score) pairs
+        k (int): Number of items to keep
+
+    Returns:
+        list: Up to k (item, score) pairs sorted by descending score
+    """
+    heap = TopK(k)
+    for item, score in scored:
+        heap.push(item, score)
+    return heap.items()
+
+def top_k_indices(scores, k):
+    """
+    Select the indices of the k largest values in a score array.
+
+    Uses ``np.argpartition`` so the cost is linear in the number of scores,
+    and only the selected slice is sorted.
+
+    Args:
+        scores (array-like): 1-D array of scores
+        k (int): Number of indices to return
+
+    Returns:
+        numpy.ndarray: Up to k indices ordered by descending score, ties by index
+    """
+    scores = np.asarray(scores, dtype=float).ravel()
+    n = scores.shape[0]
+    k = min(max(int(k), 0), n)
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if k < n:
+        # Take everything tied with the k-th score so ties resolve by index
+        kth = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:k]
+
+def keyword_score(terms, memory):
+    """
+    Score a memory for query tokens with the keyword search weights.
+
+    Each token scores 10 if it is in the title, 5 per entity containing it
+    and 2 per occurrence in the content. Only whole tokens match, as in the
+    segment index's postings, so the records postings return are exactly
+    those scoring above zero, and a search ranks the same whether it scans
+    memories or goes through an index.
+
+    Args:
+        terms (list): Distinct query tokens
+        memory (dict): Memory to score
+
+    Returns:
+        int: The score
+    """
+    title = set(tokenize(memory.get('title') or ''))
+    entities = [set(tokenize(entity.get('text', '') if isinstance(entity, dict) else str(entity)))
+                for entity in memory.get('entities') or []]
+    content = tokenize(memory.get('content') or '')
+    score = 0
+    for term in terms:
+        if term in title:
+            score += 10
+        score += 5 * sum(term in entity for entity in entities)
+    if content:
+        wanted = set(terms)
+        score += 2 * sum(token in wanted for token in content)
+    return score
+
+def keyword_term_scores(memory):
+    """
+    Return what each of a memory's tokens scores on its own in keyword_score.
+
+    keyword_score for a query is the sum of these over the query's tokens.
+
+    Returns:
+        dict: {token: score}
+    """
+    scores = dict.fromkeys(tokenize(memory.get('title') or ''), 10)
+    for entity in memory.get('entities') or []:
+        for token in set(tokenize(entity.get('text', '') if isinstance(entity, dict) else str(entity))):
+            scores[token] = scores.get(token, 0) + 5
+    for token in tokenize(memory.get('content') or ''):
+        scores[token] = scores.get(token, 0) + 2
+    return scores
+
+def keyword_top_k(query, memories, top_k=10):
+    """
+    Keyword scoring into a bounded heap.
+
+    Every memory is scored with keyword_score, but only the top_k best are
+    kept, so nothing is sorted beyond the heap.
+
+    Args:
+        query (str): The search query
+        memories (list): List of memory dictionaries
+        top_k (int): Number of results to return
+
+    Returns:
+        list: Up to top_k (memory, score) pairs sorted by descending score
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+
+    heap = TopK(top_k)
+    for memory in memories:
+        score = keyword_score(terms, memory)
+        if score > 0:
+            heap.push(memory, score)
+    return heap.items()
@@ -0,0 +1,310 @@
+import random
+from datetime import date, datetime
+import pandas as pd
+from core.topk import keyword_top_k, top_k_items
+from core.near_duplicates import collapse_duplicates
+from core.content_store import content_excerpt
+from core.positional_index import is_structured, snippets as cut_snippets
+from core.memory_budget import memory_budget
+
+# Search entry points, filters and view models used by the app. They don't
+# call Streamlit, so the app memoizes them with st.cache_data while the load
+# harness drives them directly from many simulated sessions.
+
+def merge_live_hits(scored, live_hits, top_k):
+    """Merge live scan (memory, score) pairs into ranked results; a live hit replaces the indexed copy of its file"""
+    if not live_hits:
+        return scored
+    fresh = {memory['id'] for memory, _ in live_hits}
+    return top_k_items([(memory, score) for memory, score in scored if memory.get('id') not in fresh]
+                       + list(live_hits), top_k)
+
+def indexed_search(query, index, top_k=10, query_vector=None):
+    """
+    Keyword search over the segment index's postings, topped up with the
+    nearest stored embeddings when fewer than top_k memories match
+    """
+    scored = index.keyword_search(query, top_k)
+    if query_vector is not None and len(scored) < top_k:
+        # Cosine scores are below any keyword score, so these rank after the keyword hits
+        found = {memory.get('id') for memory, _ in scored}
+        scored += [(memory, score) for memory, score in index.vector_search(query_vector, top_k)
+                   if memory.get('id') not in found][:top_k - len(scored)]
+    return scored
+
+def simple_search(query, memories, top_k=10, dedup=None, live_hits=None, index=None, query_vector=None):
+    """Keyword search, over the segment index when given, optionally showing one result per near-duplicate cluster"""
+    # Over-fetch so collapsed clusters still leave top_k results
+    fetch = top_k if dedup is None else top_k * 3
+    scored = indexed_search(query, index, fetch, query_vector) if index is not None \
+        else keyword_top_k(query, memories, fetch)
+    scored = merge_live_hits(scored, live_hits, fetch)
+    if dedup is None:
+        return [memory for memory, _ in scored]
+    return collapse_duplicates([memory for memory, _ in scored], dedup.threshold, dedup)[:top_k]
+
+def structured_search(query, positional_index, top_k=10, dedup=None, live_hits=None, hits=None):
+    """Phrase, boolean and proximity search over the positional index; hits as in PositionalIndex.search"""
+    if dedup is None:
+        return [memory for memory, _ in merge_live_hits(positional_index.search(query, top_k, hits), live_hits,
+                                                        top_k)]
+    scored = merge_live_hits(positional_index.search(query, top_k * 3, hits), live_hits, top_k * 3)
+    return collapse_duplicates([memory for memory, _ in scored], dedup.threshold, dedup)[:top_k]
+
+def run_search(query, memories, positional_index, top_k=10, dedup=None, live=None, index=None,
+               query_vector=None):
+    """
+    Run a search box query the way the app does.
+
+    Structured queries go to the positional index and plain ones to keyword
+    search, through the segment index's postings when there is one, so
+    plain queries never need the positional index. Snippets are cut around
+    the positions the positional index matched, or around the query's
+    terms found in the results themselves. Live scan hits, which share the
+    title and content weights of both, are merged in by score.
+
+    Args:
+        positional_index (PositionalIndex): Index for structured queries;
+            may be None for plain ones
+        live (tuple, optional): (hits, snippets) from LiveScanner.search
+        index (SegmentedIndex, optional): Index holding the memories
+        query_vector (array-like, optional): Query embedding, for topping
+            up plain searches from the index's vectors
+
+    Returns:
+        tuple: (results, {memory id: snippet})
+    """
+    live_hits, live_snippets = live or ([], {})
+    hits = {}
+    if is_structured(query):
+        results = structured_search(query, positional_index, top_k, dedup, live_hits, hits)
+    else:
+        results = simple_search(query, memories, top_k, dedup, live_hits, index, query_vector)
+    snippets = cut_snippets([memory for memory in results if memory.get('id') not in live_snippets], query,
+                            hits=hits)
+    snippets.update({memory['id']: live_snippets[memory['id']] for memory in results
+                     if memory.get('id') in live_snippets})
+    memory_budget.enforce()
+    return results, snippets
+
+def timeline_view_model(memories, snippets=None):
+    """Monthly counts per type and the most recent memories"""
+    # Only the columns the view needs, so full content is never read
+    memory_df = pd.DataFrame([{'ordinal': i, 'id': memory.get('id'), 'title': memory.get('title'),
+                               'type': memory.get('type'), 'date': memory.get('date')}
+                              for i, memory in enumerate(memories)])
+    
+    if 'date' not in memory_df.columns:
+        return None
+    
+    # Convert date strings to datetime objects if needed
+    if memory_df['date'].dtype == 'object':
+        memory_df['date'] = pd.to_datetime(memory_df['date'])
+    
+    # Create month column
+    memory_df['month'] = memory_df['date'].dt.strftime('%Y-%m')
+    
+    # Sort by date
+    memory_df = memory_df.sort_values('date')
+    
+    # Group by month and count
+    monthly_counts = memory_df.groupby(['month', 'type']).size().reset_index(name='count')
+    
+    # Pivot to get types as columns
+    timeline_data = monthly_counts.pivot_table(
+        index='month', 
+        columns='type', 
+        values='count',
+        fill_value=0
+    ).reset_index()
+    
+    # Make sure every type has a column for the stacked chart
+    for memory_type in ['document', 'image', 'audio', 'web']:
+        if memory_type not in timeline_data.columns:
+            timeline_data[memory_type] = 0
+    
+    recent_df = memory_df.sort_values('date', ascending=False).head(5)
+    recent = []
+    for _, memory in recent_df.iterrows():
+        # Prefer the part of the content that matched the search
+        content = (snippets or {}).get(memory.get('id'))
+        if content is None:
+            # Truncate content if too long
+            content = content_excerpt(memories[memory['ordinal']], 151)
+            if len(content) > 150:
+                content = content[:150] + "..."
+        recent.append({
+            'type': memory['type'],
+            'title': memory['title'],
+            'date': memory['date'].strftime('%B %d, %Y'),
+            'content': content
+        })
+    
+    return timeline_data, recent
+
+def connections_view_model(memories, topics=None):
+    """Nodes and links for the connection network"""
+    # Create nodes for visualization
+    nodes = []
+    for i, memory in enumerate(memories[:20]):  # Limit to 20 for performance
+        x = random.uniform(-10, 10)
+        y = random.uniform(-10, 10)
+        
+        color = '#3E7CB9'  # Default color (document)
+        if memory['type'] == 'image':
+            color = '#FF924C'
+        elif memory['type'] == 'audio':
+            color = '#8867CA'
+        elif memory['type'] == 'web':
+            color = '#71D999'
+            
+        nodes.append({
+            'index': i,
+            'id': memory.get('id', i),
+            'title': memory.get('title', f"Memory {i}"),
+            'type': memory.get('type', 'document'),
+            'x': x,
+            'y': y,
+            'color': color
+        })
+    
+    # Link each memory to a hub node for its topic, rather than linking
+    # every pair of memories in the same group
+    links = []
+    topic_labels = topics.labels() if topics is not None else {}
+    topic_nodes = {}
+    for i, memory in enumerate(memories[:len(nodes)]):
+        topic = topics.topic_of(memory.get('id')) if topic_labels else None
+        if topic is None or topic not in topic_labels:
+            continue
+        if topic not in topic_nodes:
+            topic_nodes[topic] = len(nodes) + len(topic_nodes)
+        links.append({'source': i, 'target': topic_nodes[topic], 'value': 1})
+    memory_count = len(nodes)
+    for topic, index in topic_nodes.items():
+        nodes.append({
+            'index': index,
+            'id': f"topic-{topic}",
+            'title': topic_labels[topic],
+            'type': 'topic',
+            'x': random.uniform(-5, 5),
+            'y': random.uniform(-5, 5),
+            'color': '#FFCC47'
+        })
+    
+    # Create links between memories that share entities or are close in time
+    for i in range(memory_count):
+        for j in range(i+1, memory_count):
+            memory_i = memories[i]
+            memory_j = memories[j]
+            
+            # Connect if same type, when there are no topics to group by
+            if not topic_nodes and memory_i['type'] == memory_j['type']:
+                links.append({
+                    'source': i,
+                    'target': j,
+                    'value': 1
+                })
+            
+            # Connect if they share entities
+            if ('entities' in memory_i and 'entities' in memory_j 
+                    and memory_i['entities'] and memory_j['entities']):
+                entities_i = [e['text'] if isinstance(e, dict) else e for e in memory_i['entities']]
+                entities_j = [e['text'] if isinstance(e, dict) else e for e in memory_j['entities']]
+                
+                if set(entities_i) & set(entities_j):  # If there's an intersection
+                    links.append({
+                        'source': i,
+                        'target': j,
+                        'value': 2  # Stronger connection for shared entities
+                    })
+    
+    return nodes, links
+
+def analytics_view_model(memories):
+    """Type, sentiment and entity aggregates for the analytics view"""
+    # Content isn't aggregated, so leave it in the content store
+    df = pd.DataFrame([{key: memory[key] for key in memory if key != 'content'} for memory in memories])
+    
+    # Memory types distribution
+    type_counts = None
+    if 'type' in df.columns:
+        type_counts = df['type'].value_counts().reset_index()
+        type_counts.columns = ['Type', 'Count']
+    
+    # Sentiment over time
+    monthly_sentiment = None
+    if 'sentiment' in df.columns and 'date' in df.columns:
+        df['month'] = pd.to_datetime(df['date']).dt.strftime('%B %Y')
+        monthly_sentiment = df.groupby('month')['sentiment'].mean().reset_index()
+    
+    # Entity distribution
+    entity_type_counts = None
+    if 'entities' in df.columns:
+        entity_types = []
+        for memory in memories:
+            if 'entities' in memory and memory['entities']:
+                for entity in memory['entities']:
+                    if isinstance(entity, dict):
+                        entity_types.append(entity.get('type', 'unknown'))
+        
+        entity_type_counts = pd.DataFrame(columns=['Entity Type', 'Count'])
+        if entity_types:
+            # Count by type
+            entity_type_counts = pd.Series(entity_types).value_counts().reset_index()
+            entity_type_counts.columns = ['Entity Type', 'Count']
+    
+    return type_counts, monthly_sentiment, entity_type_counts
+
+def memory_day(value):
+    """Calendar date of a memory's date, parsing it only when it is a string"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.to_datetime(value).date()
+
+def filtered_ordinals(memories, filters, topics=None):
+    """Positions of the memories that pass the sidebar filters"""
+    if not filters:
+        return list(range(len(memories)))
+    
+    start_date, end_date = filters.get('date_range') or (None, None)
+    memory_types = filters.get('memory_types')
+    entity_types = set(filters.get('entity_types') or [])
+    sources = set(filters.get('sources') or [])
+    topic_ids = set(filters.get('topics') or []) if topics is not None else set()
+    
+    ordinals = []
+    for i, memory in enumerate(memories):
+        if memory_types is not None and memory.get('type', 'document') not in memory_types:
+            continue
+        
+        if start_date is not None and memory.get('date') is not None:
+            try:
+                if not start_date <= memory_day(memory['date']) <= end_date:
+                    continue
+            except (ValueError, TypeError):
+                pass
+        
+        if entity_types:
+            memory_entity_types = {entity.get('type', 'unknown') for entity in memory.get('entities') or []
+                                   if isinstance(entity, dict)}
+            if not memory_entity_types & entity_types:
+                continue
+        
+        if sources and memory.get('source') not in sources:
+            continue
+        
+        if topic_ids and topics.topic_of(memory.get('id')) not in topic_ids:
+            continue
+        
+        ordinals.append(i)
+    
+    return ordinals
+
+def filter_memories(memories, filters, topics=None):
+    """Apply the sidebar filters to a list of memories"""
+    if not filters:
+        return memories
+    return [memories[i] for i in filtered_ordinals(memories, filters, topics)]
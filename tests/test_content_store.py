@@ -0,0 +1,58 @@
+from core.content_store import ContentStore, tier_memories, content_excerpt
+
+def make_texts(count=200):
+    return [f"Memory {i}: " + "meeting notes about the quarterly budget " * (i % 7 + 1) for i in range(count)]
+
+def test_texts_read_back_across_flushes(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.bin'), block_size=512)
+    texts = make_texts()
+    refs = []
+    for i, text in enumerate(texts):
+        refs.append(store.put(text))
+        if i % 17 == 0:
+            # Explicit flushes leave small blocks between the full ones
+            store.flush()
+    assert [store.get(ref) for ref in refs] == texts
+    store.flush()
+    store.shrink(0)
+    assert [store.get(ref) for ref in refs] == texts
+    assert len(store) > 1
+    store.close()
+
+def test_blocks_before_and_after_dictionary_read_back(tmp_path):
+    # With zstandard installed, the dictionary is trained part way through
+    store = ContentStore(str(tmp_path / 'content.bin'), block_size=512, dictionary_samples=8 * 1024)
+    texts = make_texts(400)
+    refs = [store.put(text) for text in texts]
+    store.flush()
+    store.shrink(0)
+    assert [store.get(ref) for ref in refs] == texts
+    store.close()
+
+def test_unflushed_text_reads_from_the_open_block(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.bin'), block_size=1 << 20)
+    ref = store.put("still buffered ✓")
+    assert len(store) == 0
+    assert store.get(ref) == "still buffered ✓"
+    store.close()
+
+def test_same_text_under_same_key_is_stored_once(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.bin'), block_size=64)
+    first = store.put("unchanged content", key='a')
+    assert store.put("unchanged content", key='a') == first
+    changed = store.put("changed content", key='a')
+    assert changed != first
+    assert store.get(first) == "unchanged content"
+    assert store.get(changed) == "changed content"
+    store.close()
+
+def test_tiered_memories_keep_full_content(tmp_path):
+    store = ContentStore(str(tmp_path / 'content.bin'), block_size=256)
+    memories = [{'id': i, 'title': f"Note {i}", 'content': text} for i, text in enumerate(make_texts(50))]
+    tiered = tier_memories([dict(memory) for memory in memories], store, excerpt_chars=20)
+    store.flush()
+    for memory, original in zip(tiered, memories):
+        assert memory['content'] == original['content']
+        assert memory['title'] == original['title']
+        assert content_excerpt(memory, 20) == original['content'][:20]
+    store.close()
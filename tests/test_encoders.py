@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from core.encoders import HashEncoder, get_encoder
+
+TEXTS = ["Quarterly budget review", "Photos from the Tokyo trip", ""]
+
+def test_hash_encoder_is_deterministic():
+    first = HashEncoder().encode(TEXTS)
+    second = HashEncoder().encode(TEXTS)
+    assert np.array_equal(first, second)
+
+def test_hash_encoder_shape_and_dtype():
+    vectors = HashEncoder(dimension=64).encode(TEXTS)
+    assert vectors.shape == (len(TEXTS), 64)
+    assert vectors.dtype == np.float32
+    assert HashEncoder().encode([]).shape == (0, 384)
+
+def test_hash_encoder_normalises_vectors():
+    norms = np.linalg.norm(HashEncoder().encode(TEXTS), axis=1)
+    assert np.allclose(norms[:2], 1.0, atol=1e-6)
+    # Text without words has nothing to normalise
+    assert norms[2] == 0.0
+
+def test_hash_encoder_shared_words_are_similar():
+    query, related, unrelated = HashEncoder().encode(["budget review", "quarterly budget review",
+                                                      "photos from tokyo"])
+    assert query @ related > query @ unrelated
+
+def test_get_encoder_hash_backend():
+    encoder = get_encoder("hash")
+    assert isinstance(encoder, HashEncoder)
+    assert encoder.dimension == 384
+
+def test_get_encoder_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        get_encoder("word2vec")
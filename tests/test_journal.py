@@ -0,0 +1,63 @@
+import os
+import glob
+from datetime import datetime
+from core.journal import Journal, read_journal
+from core.segments import SegmentedIndex
+
+def write_entries(path, entries):
+    journal = Journal(path, sync_interval=60, sync_records=1000)
+    for entry in entries:
+        journal.append(entry)
+    journal.close()
+
+def test_entries_read_back_in_order(tmp_path):
+    path = str(tmp_path / 'test.wal')
+    entries = [['add', {'id': 'a', 'date': datetime(2024, 1, 2, 3, 4)}, None], ['delete', 'a']]
+    write_entries(path, entries)
+    assert read_journal(path) == entries
+
+def test_replay_stops_at_torn_tail(tmp_path):
+    path = str(tmp_path / 'test.wal')
+    write_entries(path, [['delete', str(i)] for i in range(3)])
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        # Half of the last record made it to disk
+        f.truncate(size - 5)
+    assert read_journal(path) == [['delete', '0'], ['delete', '1']]
+
+def test_replay_stops_at_bad_checksum(tmp_path):
+    path = str(tmp_path / 'test.wal')
+    write_entries(path, [['delete', str(i)] for i in range(3)])
+    with open(path, 'r+b') as f:
+        f.seek(-2, os.SEEK_END)
+        f.write(b'X')
+    assert read_journal(path) == [['delete', '0'], ['delete', '1']]
+
+def test_sync_makes_appends_readable(tmp_path):
+    path = str(tmp_path / 'test.wal')
+    journal = Journal(path, sync_interval=60, sync_records=1000)
+    journal.append(['delete', 'a'])
+    journal.sync()
+    assert read_journal(path) == [['delete', 'a']]
+    journal.close(remove=True)
+    assert not os.path.exists(path)
+
+def test_index_replays_unflushed_writes(tmp_path):
+    directory = str(tmp_path / 'index')
+    index = SegmentedIndex(directory, background_merge=False)
+    index.add({'id': 'a', 'title': 'Flushed'})
+    index.flush()
+    index.add({'id': 'b', 'title': 'Journaled'})
+    index.add({'id': 'c', 'title': 'Torn'})
+    index.delete('a')
+    index.sync()
+    # Simulate a crash: the journal is left behind and its last record is cut short
+    (journal_path,) = glob.glob(os.path.join(directory, 'journal_*.wal'))
+    with open(journal_path, 'r+b') as f:
+        f.truncate(os.path.getsize(journal_path) - 3)
+
+    recovered = SegmentedIndex(directory, background_merge=False)
+    assert recovered.recovered == 2
+    assert sorted(memory['id'] for memory in recovered.memories()) == ['a', 'b', 'c']
+    assert recovered.get('b')['title'] == 'Journaled'
+    recovered.close()
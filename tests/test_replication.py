@@ -0,0 +1,84 @@
+import os
+import glob
+import pytest
+from core.segments import SegmentedIndex
+from core.replication import ChangeLog, Replica, changeset_path
+
+def open_primary(tmp_path, retain=None):
+    changelog = ChangeLog(str(tmp_path / 'changes'), retain=retain)
+    return SegmentedIndex(str(tmp_path / 'primary'), background_merge=False, changelog=changelog)
+
+def open_replica(tmp_path):
+    index = SegmentedIndex(str(tmp_path / 'replica'), background_merge=False)
+    return index, Replica(index, str(tmp_path / 'changes'))
+
+def snapshot(index):
+    return sorted((memory['id'], memory.get('content')) for memory in index.memories())
+
+def test_replica_applies_adds_updates_and_deletes(tmp_path):
+    primary = open_primary(tmp_path)
+    for i in range(4):
+        primary.add({'id': f"m{i}", 'title': f"Note {i}", 'content': f"text {i}"})
+    primary.flush()
+    index, replica = open_replica(tmp_path)
+    assert replica.sync()['applied'] == 1
+    assert snapshot(index) == snapshot(primary)
+
+    primary.delete('m0')
+    primary.add({'id': 'm1', 'title': 'Note 1', 'content': 'rewritten'})
+    primary.flush()
+    result = replica.sync()
+    assert (result['applied'], result['records'], result['deleted'], result['version']) == (1, 1, 1, 2)
+    assert snapshot(index) == snapshot(primary)
+    assert index.get('m0') is None
+    assert replica.sync()['applied'] == 0
+    index.close()
+    primary.close()
+
+def test_replica_resumes_from_saved_version(tmp_path):
+    primary = open_primary(tmp_path)
+    primary.add({'id': 'a', 'content': 'first'})
+    primary.flush()
+    index, replica = open_replica(tmp_path)
+    replica.sync()
+    index.close()
+
+    primary.add({'id': 'b', 'content': 'second'})
+    primary.flush()
+    index, replica = open_replica(tmp_path)
+    assert replica.pending() == [2]
+    replica.sync()
+    assert snapshot(index) == [('a', 'first'), ('b', 'second')]
+    index.close()
+    primary.close()
+
+def test_corrupt_changeset_is_rejected(tmp_path):
+    primary = open_primary(tmp_path)
+    primary.add({'id': 'a', 'content': 'first'})
+    primary.flush()
+    path = glob.glob(os.path.join(changeset_path(str(tmp_path / 'changes'), 1), 'segment.*'))[0]
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    data[-1] ^= 0xFF
+    # Replaced rather than edited, since change set files are hard links to the primary's
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+
+    index, replica = open_replica(tmp_path)
+    with pytest.raises(ValueError):
+        replica.sync()
+    assert replica.version == 0
+    index.close()
+    primary.close()
+
+def test_replica_behind_pruned_log_must_reseed(tmp_path):
+    primary = open_primary(tmp_path, retain=2)
+    for i in range(4):
+        primary.add({'id': f"m{i}", 'content': f"text {i}"})
+        primary.flush()
+    index, replica = open_replica(tmp_path)
+    with pytest.raises(ValueError):
+        replica.pending()
+    index.close()
+    primary.close()
@@ -0,0 +1,100 @@
+from core.rerank import Reranker, StubCrossEncoder
+from core.serach_engine import search_memories, semantic_top_k
+from core.score_cache import ScoreCache
+
+class CountingEncoder(StubCrossEncoder):
+    """Stub cross-encoder that records how many pairs it scored."""
+
+    def __init__(self, seconds_per_pair=0.0):
+        super().__init__(seconds_per_pair)
+        self.pairs = 0
+
+    def predict(self, pairs, batch_size=8):
+        pairs = list(pairs)
+        self.pairs += len(pairs)
+        return super().predict(pairs, batch_size)
+
+def make_memories(count=30):
+    memories = [{'id': i, 'title': f"Note {i}", 'content': f"Budget filler text number {i}"}
+                for i in range(count)]
+    # The best cross-encoder match has the weakest first-stage score
+    memories[-1]['content'] = "quarterly budget review"
+    return memories
+
+def first_stage(memories):
+    return [(memory, float(len(memories) - i)) for i, memory in enumerate(memories)]
+
+def test_rerank_moves_best_match_first():
+    memories = make_memories(10)
+    reranker = Reranker(CountingEncoder(), top_n=10, batch_size=4, latency_budget=None)
+    reranked = reranker.rerank("quarterly budget review", first_stage(memories))
+    assert reranked[0][0]['id'] == 9
+    assert sorted(memory['id'] for memory, _ in reranked) == list(range(10))
+    assert reranker.stats()['reranked'] == 1
+
+def test_rerank_keeps_tail_in_first_stage_order():
+    memories = make_memories(10)
+    reranker = Reranker(CountingEncoder(), top_n=4, latency_budget=None)
+    reranked = reranker.rerank("quarterly budget review", first_stage(memories))
+    assert [memory['id'] for memory, _ in reranked[4:]] == list(range(4, 10))
+
+def test_rerank_scores_tail_below_head():
+    memories = make_memories(10)
+    reranker = Reranker(CountingEncoder(), top_n=4, latency_budget=None)
+    scores = [score for _, score in reranker.rerank("quarterly budget review", first_stage(memories))]
+    assert scores == sorted(scores, reverse=True)
+    assert max(scores[4:]) < min(scores[:4])
+
+def test_rerank_cache_hits_skip_the_model():
+    memories = make_memories(10)
+    encoder = CountingEncoder()
+    reranker = Reranker(encoder, top_n=10, batch_size=4, latency_budget=None)
+    first = reranker.rerank("budget", first_stage(memories))
+    assert encoder.pairs == 10
+    second = reranker.rerank("budget", first_stage(memories))
+    assert encoder.pairs == 10
+    assert [memory['id'] for memory, _ in first] == [memory['id'] for memory, _ in second]
+    assert reranker.stats()['cache_hit_rate'] == 0.5
+
+def test_rerank_falls_back_when_over_budget():
+    memories = make_memories(10)
+    encoder = CountingEncoder(seconds_per_pair=0.01)
+    reranker = Reranker(encoder, top_n=10, batch_size=4, latency_budget=0.05)
+    scored = first_stage(memories)
+    # The first batch measures the cost; the next one would overrun the budget
+    assert reranker.rerank("quarterly budget review", scored) == scored
+    assert encoder.pairs == 4
+    assert reranker.stats()['fallbacks'] == 1
+    # Scores computed before stopping are cached, so a rerun gets further
+    reranker.rerank("quarterly budget review", scored)
+    assert encoder.pairs > 4
+
+def test_rerank_recovers_after_a_slow_batch():
+    memories = make_memories(10)
+    encoder = CountingEncoder(seconds_per_pair=0.05)
+    reranker = Reranker(encoder, top_n=10, batch_size=4, latency_budget=0.1)
+    scored = first_stage(memories)
+    assert reranker.rerank("quarterly budget review", scored) == scored
+
+    # Once the model is fast again, re-ranking resumes within a few queries
+    encoder.seconds_per_pair = 0.0
+    for attempt in range(10):
+        reranked = reranker.rerank(f"quarterly budget review {attempt}", scored)
+        if reranked != scored:
+            break
+    assert reranked[0][0]['id'] == 9
+    assert reranker.stats()['reranked'] >= 1
+
+def test_search_memories_pages_reranked_order():
+    memories = make_memories(30)
+    reranker = Reranker(CountingEncoder(), top_n=20, batch_size=8, latency_budget=None)
+    query = "quarterly budget review"
+    cache = ScoreCache()
+    full = search_memories(query, memories, top_k=20, cache=cache, reranker=reranker)
+    pages = [search_memories(query, memories, top_k=5, offset=offset, cache=cache, reranker=reranker)
+             for offset in range(0, 20, 5)]
+    assert [memory['id'] for page in pages for memory in page] == [memory['id'] for memory in full]
+    # Every page re-ranks the same candidate pool, so only the first one ran the model
+    assert reranker.encoder.pairs == 20
+    candidates = [memory['id'] for memory, _ in semantic_top_k(query, memories, 20, 0, cache)]
+    assert sorted(memory['id'] for memory in full) == sorted(candidates)
@@ -0,0 +1,90 @@
+import numpy as np
+from core.segments import SegmentedIndex
+
+def make_memory(i, text=None):
+    return {'id': f"m{i}", 'title': f"Note {i}", 'content': text or f"filler text number {i}"}
+
+def open_index(directory, **kwargs):
+    kwargs.setdefault('flush_threshold', 1000)
+    kwargs.setdefault('merge_factor', 2)
+    return SegmentedIndex(str(directory), background_merge=False, **kwargs)
+
+def ids(memories):
+    return sorted(memory['id'] for memory in memories)
+
+def test_flush_keeps_memories_across_reopen(tmp_path):
+    index = open_index(tmp_path)
+    for i in range(5):
+        index.add(make_memory(i))
+    index.flush()
+    index.close()
+
+    index = open_index(tmp_path)
+    assert len(index) == 5
+    assert index.get('m3')['title'] == 'Note 3'
+    assert ids(index.memories()) == [f"m{i}" for i in range(5)]
+    index.close()
+
+def test_tombstones_hide_deleted_memories_in_older_segments(tmp_path):
+    index = open_index(tmp_path, merge_factor=10)
+    for i in range(4):
+        index.add(make_memory(i))
+    index.flush()
+    index.delete('m1')
+    index.add(make_memory(2, "rewritten quarterly budget"))
+    index.flush()
+
+    assert len(index.segments) == 2
+    assert len(index) == 3
+    assert index.get('m1') is None
+    assert index.get('m2')['content'] == "rewritten quarterly budget"
+    assert ids(index.memories()) == ['m0', 'm2', 'm3']
+    assert [memory['id'] for memory, _ in index.keyword_search("budget")] == ['m2']
+    assert ids(memory for memory, _ in index.keyword_search("filler", top_k=10)) == ['m0', 'm3']
+    index.close()
+
+def test_merge_drops_dead_records_and_keeps_deletes(tmp_path):
+    index = open_index(tmp_path)
+    for i in range(6):
+        index.add(make_memory(i))
+    index.flush()
+    index.delete('m0')
+    index.add(make_memory(5, "updated budget"))
+    # The second flush brings two segments of the same tier, which merge
+    index.flush()
+
+    assert len(index.segments) == 1
+    assert len(index.segments[0]) == 5
+    assert len(index) == 5
+    assert index.get('m0') is None
+    assert index.get('m5')['content'] == "updated budget"
+    index.close()
+
+    index = open_index(tmp_path)
+    assert ids(index.memories()) == ['m1', 'm2', 'm3', 'm4', 'm5']
+    index.close()
+
+def test_delete_in_memtable_and_readd(tmp_path):
+    index = open_index(tmp_path, merge_factor=10)
+    index.add(make_memory(1))
+    index.delete('m1')
+    assert len(index) == 0 and index.get('m1') is None
+    index.add(make_memory(1, "back again"))
+    index.flush()
+    assert len(index) == 1
+    assert index.get('m1')['content'] == "back again"
+    index.close()
+
+def test_vector_search_skips_replaced_vectors(tmp_path):
+    index = open_index(tmp_path, merge_factor=10)
+    index.add(make_memory(1), np.array([1.0, 0.0], dtype=np.float32))
+    index.add(make_memory(2), np.array([0.0, 1.0], dtype=np.float32))
+    index.flush()
+    index.add(make_memory(1, "moved"), np.array([-1.0, 0.0], dtype=np.float32))
+    index.flush()
+
+    # The old copy of m1 would match best; only its replacement may come back
+    results = index.vector_search(np.array([1.0, 0.0], dtype=np.float32), top_k=3)
+    assert [(memory['id'], round(score, 3)) for memory, score in results] == [('m2', 0.0), ('m1', -1.0)]
+    assert results[1][0]['content'] == "moved"
+    index.close()
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from core.snapshot import write_snapshot, read_memories, load_snapshot
+
+def make_memories():
+    return [
+        {'id': 'a', 'title': 'Quarterly review', 'content': 'Budget numbers ' * 50,
+         'date': datetime(2024, 3, 1, 9, 30, 15, 250), 'type': 'document', 'file_size': 1234,
+         'sentiment': 0.25, 'image_hash': 2**64 - 1},
+        {'id': 'b', 'title': 'Trip photo', 'content': '',
+         # Values the typed columns can't hold are kept with the extras
+         'date': datetime(2024, 3, 2, tzinfo=timezone.utc), 'file_size': 2**70, 'sentiment': 'positive',
+         'entities': [{'type': 'person', 'text': 'Ada'}, 'Lovelace'],
+         'metadata': {'camera': 'X100', 'iso': 400, 'flash': False, 'lens': None},
+         'taken': datetime(2023, 12, 24, 18, 0), 'rating': 4.5, 'tags': ['family', 'winter']},
+        {'id': 'c', 'title': None, 'content': 'ünïcödé text ✓', 'file_mtime': 1717171717.123456},
+    ]
+
+def test_round_trip_keeps_every_field(tmp_path):
+    memories = make_memories()
+    path = str(tmp_path / 'memories.snap')
+    write_snapshot(memories, path)
+    assert read_memories(path) == memories
+
+def test_round_trip_without_compression(tmp_path):
+    memories = make_memories()
+    path = str(tmp_path / 'memories.snap')
+    write_snapshot(memories, path, compress_content=False)
+    assert read_memories(path) == memories
+
+def test_lazy_records_read_single_fields(tmp_path):
+    memories = make_memories()
+    path = str(tmp_path / 'memories.snap')
+    write_snapshot(memories, path)
+    with load_snapshot(path) as snapshot:
+        assert len(snapshot) == 3
+        record = snapshot[1]
+        assert record['metadata'] == {'camera': 'X100', 'iso': 400, 'flash': False, 'lens': None}
+        assert 'title' in record and 'file_mtime' not in record
+        assert snapshot[2]['file_mtime'] == 1717171717.123456
+
+def test_empty_snapshot(tmp_path):
+    path = str(tmp_path / 'empty.snap')
+    write_snapshot([], path)
+    assert read_memories(path) == []